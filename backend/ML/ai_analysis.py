@@ -1,18 +1,15 @@
 import os
 from dotenv import load_dotenv
-from langchain_community.chat_models import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
+from ML.scheduler import scheduler, estimate_tokens, INTERACTIVE
+from ML.llm_backend import get_chat_model
 
 load_dotenv()
 
-def analyse_improvements(data):
-    # Define OpenAI model
-    llm = ChatOpenAI(
-        temperature=1,
-        openai_api_key=os.getenv("OPENAI_KEY"),
-        model_name="gpt-4o"
-    )
+def analyse_improvements(data, lane=INTERACTIVE):
+    # Define the model (OpenAI or the local fake, see ML.llm_backend)
+    llm = get_chat_model(temperature=1)
     
     # Define the prompt template
     prompt_template = """
@@ -135,7 +132,11 @@ def analyse_improvements(data):
     }
     
     # Run the OpenAI model with the constructed input
-    result = qa.run(improvement_message)
+    result = scheduler.call(
+        lambda: qa.run(improvement_message),
+        estimate_tokens(prompt.format(**improvement_message)),
+        lane=lane
+    )
 
     # Check if the result is too long and was cut off
     if result.endswith("..."):
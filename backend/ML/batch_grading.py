@@ -0,0 +1,215 @@
+import json
+import os
+import uuid
+from dotenv import load_dotenv
+from ML.openAI import (
+    build_grading_messages, get_active_prompt, retrieve_context, source_feedback,
+    parse_grading, record_token_usage, GRADING_RESPONSE_FORMAT
+)
+import metrics
+
+load_dotenv()
+
+# Re-grading requests are sent through an asynchronous batch endpoint instead of one
+# chat completion per attempt. BATCH_BACKEND selects the provider ("openai") or a local
+# file-based stand-in ("local") that grades instantly, for testing.
+BATCH_BACKEND = os.getenv("BATCH_BACKEND", "openai")
+BATCH_DIR = os.getenv("BATCH_DIR", "./ML/batches")  # Where batch input/output files are written
+# Provider limits per batch file are 50k requests and 200 MB; larger gradings are split
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", 50000))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", 190 * 1024 * 1024))
+
+metrics.describe("batch_grading_results_total", "Batch grading results ingested, by outcome.")
+
+
+def _message_to_dict(message):
+    return {"role": "system" if message.type == "system" else "user", "content": message.content}
+
+def build_batch_requests(gradings):
+    """Build one batch request line per grading.
+
+    Args:
+        gradings: List of (custom_id, openAI_response keyword arguments) pairs; the
+            custom_id (e.g. the attempt_id) comes back with the result.
+
+    Returns:
+        A list of request dicts in the chat completions batch input format.
+    """
+    prompt = get_active_prompt()
+    contexts = {}
+    requests = []
+    for custom_id, grading in gradings:
+        # Retrieval is shared between attempts of the same question
+        if grading["question"] not in contexts:
+            contexts[grading["question"]] = retrieve_context(grading["question"])
+
+        feedback = source_feedback(
+            grading["system_name"], grading["system_url"],
+            grading["ideal_system_name"], grading["ideal_system_url"]
+        )
+        messages = build_grading_messages(prompt, contexts[grading["question"]], feedback=feedback, **grading)
+        requests.append({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": "gpt-4o",
+                "temperature": 0.3,
+                "messages": [_message_to_dict(message) for message in messages],
+                "response_format": GRADING_RESPONSE_FORMAT,
+            },
+        })
+    return requests
+
+def split_batch_lines(requests, max_requests=BATCH_MAX_REQUESTS, max_bytes=BATCH_MAX_BYTES):
+    """Encode the requests as JSONL lines, split into batches within the provider's limits."""
+    batches = [[]]
+    size = 0
+    for request in requests:
+        line = json.dumps(request) + "\n"
+        line_bytes = len(line.encode())
+        if batches[-1] and (len(batches[-1]) >= max_requests or size + line_bytes > max_bytes):
+            batches.append([])
+            size = 0
+        batches[-1].append(line)
+        size += line_bytes
+    return batches
+
+def write_batch_file(lines, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.writelines(lines)
+    return path
+
+def parse_batch_output(lines):
+    """Parse batch output lines into ``({custom_id: grading dict}, failed custom_ids)``.
+
+    Results that failed or do not validate are left out of the gradings and listed in
+    failed instead, so they can be resubmitted rather than stored as zero scores.
+    """
+    results = {}
+    failed = []
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        if record.get("error") or response.get("status_code", 200) != 200 or not body.get("choices"):
+            metrics.inc("batch_grading_results_total", outcome="error")
+            failed.append(record["custom_id"])
+            continue
+
+        record_token_usage("batch_grading", {"token_usage": body.get("usage")})
+        grading = parse_grading(body["choices"][0]["message"]["content"] or "")
+        if grading is None:
+            metrics.inc("batch_grading_results_total", outcome="invalid")
+            failed.append(record["custom_id"])
+            continue
+
+        metrics.inc("batch_grading_results_total", outcome="ok")
+        results[record["custom_id"]] = grading
+    return results, failed
+
+
+class OpenAIBatchBackend:
+    """Submits batch files to the OpenAI Batch API."""
+
+    def __init__(self):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=os.getenv("OPENAI_KEY"))
+
+    def submit(self, path):
+        with open(path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+
+    def status(self, batch_id):
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                lines.extend(self.client.files.content(file_id).text.splitlines())
+        return lines
+
+
+class LocalBatchBackend:
+    """File-based stand-in for the batch API.
+
+    A submitted batch is completed immediately with a fixed, valid grading result per
+    request, written next to the input file.
+    """
+
+    def __init__(self, directory=BATCH_DIR):
+        self.directory = directory
+
+    def _path(self, batch_id, kind):
+        return os.path.join(self.directory, f"{batch_id}.{kind}.jsonl")
+
+    def submit(self, path):
+        batch_id = f"local_{uuid.uuid4().hex}"
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path) as f, open(self._path(batch_id, "output"), "w") as out:
+            for line in f:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                content = json.dumps({
+                    "Accuracy": 3, "Comprehension": 3, "Tone": 3,
+                    "Accuracy Feedback": "Graded by the local batch backend.",
+                    "Comprehension Feedback": "Graded by the local batch backend.",
+                    "Tone Feedback": "Graded by the local batch backend.",
+                    "Feedback": "Graded by the local batch backend.",
+                })
+                out.write(json.dumps({
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [{"message": {"role": "assistant", "content": content}}],
+                            "usage": {"prompt_tokens": 0, "completion_tokens": 0},
+                        },
+                    },
+                    "error": None,
+                }) + "\n")
+        return batch_id
+
+    def status(self, batch_id):
+        return "completed" if os.path.exists(self._path(batch_id, "output")) else "failed"
+
+    def results(self, batch_id):
+        with open(self._path(batch_id, "output")) as f:
+            return f.read().splitlines()
+
+
+def get_batch_backend():
+    if BATCH_BACKEND == "local":
+        return LocalBatchBackend()
+    return OpenAIBatchBackend()
+
+def submit_batch(gradings):
+    """Write the grading requests to batch files within the provider's limits and submit
+    them. Returns the batch ids."""
+    backend = get_batch_backend()
+    batch_ids = []
+    for lines in split_batch_lines(build_batch_requests(gradings)):
+        path = write_batch_file(lines, os.path.join(BATCH_DIR, f"{uuid.uuid4().hex}.input.jsonl"))
+        batch_ids.append(backend.submit(path))
+    return batch_ids
+
+def fetch_batch_results(batch_id):
+    """Return ``(status, results, failed)``; results and failed are None until the batch
+    has completed. See parse_batch_output()."""
+    backend = get_batch_backend()
+    batch_status = backend.status(batch_id)
+    if batch_status != "completed":
+        return batch_status, None, None
+    return (batch_status, *parse_batch_output(backend.results(batch_id)))
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import List, Optional
+from dotenv import load_dotenv
+from langchain_community.chat_models import ChatOpenAI
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+load_dotenv()
+
+# LLM_BACKEND selects the chat model used by the ML layer: "openai" (gpt-4o) or "fake", a
+# deterministic local stand-in for load testing. The fake answers after a delay drawn
+# from FAKE_LLM_LATENCY, one of:
+#   constant:<seconds>
+#   uniform:<min>,<max>
+#   normal:<mean>,<stddev>
+#   lognormal:<median>,<sigma>
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "lognormal:1.5,0.4")
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", 0))
+
+# Latencies of all fake clients are drawn from one seeded generator
+_rng = random.Random(FAKE_LLM_SEED)
+_rng_lock = threading.Lock()
+
+
+def parse_latency(spec):
+    """Parse a latency distribution spec into a function that draws a delay in seconds."""
+    kind, _, params = spec.partition(":")
+    try:
+        values = [float(value) for value in params.split(",")] if params else []
+        if kind == "constant" and len(values) == 1:
+            return lambda rng: values[0]
+        if kind == "uniform" and len(values) == 2:
+            return lambda rng: rng.uniform(*values)
+        if kind == "normal" and len(values) == 2:
+            return lambda rng: max(0.0, rng.gauss(*values))
+        if kind == "lognormal" and len(values) == 2:
+            median, sigma = values
+            return lambda rng: rng.lognormvariate(0, sigma) * median
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency distribution: {spec}")
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model for load testing.
+
+    Answers with a JSON object matching ``response_format`` (as used by grading) or, without
+    one, with improvement feedback text. The content depends only on the prompt, so
+    repeated runs give the same scores; only the latency is random.
+    """
+
+    response_format: Optional[dict] = None
+    latency: str = FAKE_LLM_LATENCY
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    def _content(self, prompt):
+        digest = hashlib.sha256(prompt.encode()).digest()
+        if not self.response_format:
+            return (
+                "**Accuracy**\n\nThe latest attempt is more accurate.\n\n___\n\n"
+                "**Comprehension**\n\nThe latest attempt addresses more of the query.\n\n___\n\n"
+                "**Tone**\n\nThe tone is consistently professional.\n\n___\n\n"
+                "**Improvement Feedback**: Keep citing the relevant systems."
+            )
+
+        schema = self.response_format["json_schema"]["schema"]
+        result = {}
+        for i, (name, prop) in enumerate(schema["properties"].items()):
+            if prop["type"] == "integer":
+                result[name] = 1 + digest[i % len(digest)] % 5
+            else:
+                result[name] = f"{name} for this response."
+        return json.dumps(result)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = "".join(str(message.content) for message in messages)
+        content = self._content(prompt)
+
+        draw = parse_latency(self.latency)
+        with _rng_lock:
+            delay = draw(_rng)
+        time.sleep(delay)
+
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=content))],
+            llm_output={
+                "token_usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                    "prompt_tokens_details": {"cached_tokens": 0},
+                },
+                "model_name": "fake",
+            },
+        )
+
+    def _combine_llm_outputs(self, llm_outputs):
+        # generate() reports the summed token usage, as ChatOpenAI does
+        token_usage = {}
+        for output in llm_outputs:
+            for key, value in ((output or {}).get("token_usage") or {}).items():
+                if isinstance(value, int):
+                    token_usage[key] = token_usage.get(key, 0) + value
+        return {"token_usage": token_usage, "model_name": "fake"}
+
+
+def get_chat_model(temperature, response_format=None):
+    """Return the chat model for the configured LLM_BACKEND.
+
+    Args:
+        temperature: Sampling temperature (ignored by the fake).
+        response_format: Optional structured output format passed to the model.
+    """
+    if LLM_BACKEND == "fake":
+        return FakeChatModel(response_format=response_format)
+
+    return ChatOpenAI(
+        temperature=temperature,
+        openai_api_key=os.getenv("OPENAI_KEY"),
+        model_name="gpt-4o",
+        max_retries=0,  # Rate limit retries are handled by the scheduler
+        model_kwargs={"response_format": response_format} if response_format else {}
+    )
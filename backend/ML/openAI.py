@@ -3,16 +3,24 @@ from langchain_community.vectorstores import Chroma # Updated import
 from langchain_core.prompts import PromptTemplate 
 from langchain_community.document_loaders.csv_loader import CSVLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.chat_models import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationalRetrievalChain
+from langchain_core.messages import SystemMessage, HumanMessage
 from sqlalchemy.orm import Session
 from session import SessionFactory
 from models.prompt import PromptModel
+from models.table_version import TableVersionModel
+from schemas.grading import GradingResult, CombinedGradingResult, GRADING_RESPONSE_FORMAT, COMBINED_GRADING_RESPONSE_FORMAT
+import contextvars
 import json
 import os
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import metrics
 from dotenv import load_dotenv
-from fuzzywuzzy import fuzz
+from ML.source_matcher import missing_source_names, missing_source_urls
+from ML.scheduler import scheduler, estimate_tokens, INTERACTIVE, BACKFILL
+from ML.llm_backend import get_chat_model
 
 load_dotenv()
 
@@ -24,6 +32,38 @@ VECTORSTORE_PATH = "./ML/vectorstore"  # Path to save the vectorstore
 # Global retriever
 retriever = None
 
+# Runs the independent stages of a grading call concurrently
+_stage_executor = ThreadPoolExecutor(max_workers=int(os.getenv("GRADING_STAGE_WORKERS", 8)))
+
+# Maximum number of concurrent LLM calls when grading a batch of responses
+BATCH_GRADING_CONCURRENCY = int(os.getenv("BATCH_GRADING_CONCURRENCY", 8))
+
+# Shared grading LLM clients, keyed by whether the call is combined with improvement analysis
+_grading_llms = {}
+_llm_lock = threading.Lock()
+
+# Also check the cited system URLs against the ideal ones when grading
+CHECK_SOURCE_URLS = os.getenv("CHECK_SOURCE_URLS", "false").lower() == "true"
+
+# Compiled active prompt shared by all grading calls, see get_active_prompt()
+PROMPT_CACHE_TTL = float(os.getenv("PROMPT_CACHE_TTL", 30))
+_prompt_cache = {"version": None, "prompt": None, "checked_at": 0.0}
+_prompt_cache_lock = threading.Lock()
+
+# Extra LLM calls allowed when the grading response fails validation
+GRADING_PARSE_RETRIES = int(os.getenv("GRADING_PARSE_RETRIES", 2))
+
+class TimedEmbeddings(HuggingFaceEmbeddings):
+    # Reports the time spent embedding as the "embedding" stage
+
+    def embed_query(self, text):
+        with metrics.span("embedding"):
+            return super().embed_query(text)
+
+    def embed_documents(self, texts):
+        with metrics.span("embedding"):
+            return super().embed_documents(texts)
+
 def load_vectorstore(file_path, vectorstore_path):
     # Load the CSV file
     loader = CSVLoader(file_path=file_path, encoding='utf-8')
@@ -38,7 +78,7 @@ def load_vectorstore(file_path, vectorstore_path):
     model_kwargs = {'device': 'cpu'}
     encode_kwargs = {'normalize_embeddings': False}
     
-    embeddings = HuggingFaceEmbeddings(
+    embeddings = TimedEmbeddings(
         model_name=modelPath,
         model_kwargs=model_kwargs,
         encode_kwargs=encode_kwargs
@@ -56,7 +96,7 @@ def initialize_vectorstore():
     model_kwargs = {'device': 'cpu'}
     encode_kwargs = {'normalize_embeddings': False}
     
-    embeddings = HuggingFaceEmbeddings(
+    embeddings = TimedEmbeddings(
         model_name=modelPath,
         model_kwargs=model_kwargs,
         encode_kwargs=encode_kwargs
@@ -83,7 +123,7 @@ def update_vectorstore():
     model_kwargs = {'device': 'cpu'}
     encode_kwargs = {'normalize_embeddings': False}
     
-    embeddings = HuggingFaceEmbeddings(
+    embeddings = TimedEmbeddings(
         model_name=modelPath,
         model_kwargs=model_kwargs,
         encode_kwargs=encode_kwargs
@@ -103,31 +143,28 @@ def update_vectorstore():
 # Initialize the retriever when the module is imported
 initialize_vectorstore()
 
-def process_response(res):
-    try:
+def parse_grading(res, combined=False):
+    """Parse and validate a grading response.
+
+    Args:
+        res: Raw LLM response.
+        combined: Whether the response should also contain the improvement feedback.
+
+    Returns:
+        Dict of scores and feedback keyed by attempt column, or None if the response is not a
+        valid grading result.
+    """
+    result_model = CombinedGradingResult if combined else GradingResult
+    for text in (res, '{' + res + '}'):
         try:
-            json_object = json.loads(res)
-            format_dict = {
-                'accuracy_score': json_object.get('Accuracy'),
-                'precision_score': json_object.get('Comprehension'),
-                'tone_score': json_object.get('Tone'),
-                'accuracy_feedback': json_object.get('Accuracy Feedback'),
-                'precision_feedback': json_object.get('Comprehension Feedback'),
-                'tone_feedback': json_object.get('Tone Feedback'),
-                'feedback': json_object.get('Feedback')
-            }
-        except:
-            json_object = json.loads('{' + res + '}')
-            format_dict = {
-                'accuracy_score': json_object.get('Accuracy'),
-                'precision_score': json_object.get('Comprehension'),
-                'tone_score': json_object.get('Tone'),
-                'accuracy_feedback': json_object.get('Accuracy Feedback'),
-                'precision_feedback': json_object.get('Comprehension Feedback'),
-                'tone_feedback': json_object.get('Tone Feedback'),
-                'feedback': json_object.get('Feedback')
-            }
-    except:
+            return result_model.model_validate(json.loads(text)).model_dump()
+        except (ValueError, TypeError):
+            continue
+    return None
+
+def process_response(res, combined=False):
+    format_dict = parse_grading(res, combined)
+    if format_dict is None:
         format_dict = {
             'accuracy_score': 0,
             'precision_score': 0,
@@ -137,188 +174,431 @@ def process_response(res):
             'tone_feedback': "No feedback",
             'feedback': "No feedback"
         }
+        if combined:
+            format_dict['improvement_feedback'] = None
 
     return format_dict
 
-def openAI_response(question, response, ideal, ideal_system_name, ideal_system_url, system_name, system_url, prompt_text=None):
+# Stable system prefix shared by every grading call. It holds the instructions, rubric and
+# output format and must not contain any placeholders, so the model provider can reuse its
+# cached prefix across requests. Everything that varies per request goes in the suffix.
+DEFAULT_PROMPT_PREFIX = """
+I will give you a question, a customer service trainee's response to that question, and the ideal response to that question.
+Please assess the trainee's response to the question. Do not actually answer the question, but evaluate the answer only using the context given and the ideal answer.
+Please give the trainee's response a score out of 5 for accuracy, comprehension, and tone. Accuracy refers to if the factually correct answers were provided, comprehension refers to whether the answer has enough details, is concise and demonstrates that the question was fully understood, and tone refers to whether the tone of the answer is respectful and professional.
+Please take note that the ideal response scored 5 for accuracy, comprehension, and tone and use it as a point of reference.
+Please also give some general feedback for improvement.
+Please incorporate the text given under "Accuracy Feedback" at the end of this message in your Accuracy Feedback.
+
+If the trainee's response contains exact dates and monetary figures that are not in the question and do not match the ideal response, please ignore it when grading accuracy. For exact dates and monetary figures that are in the question, the trainee’s response should contain such information, even if they are not in the ideal response.
+
+It is acceptable to give the trainee full marks if they answered similarly to the ideal response after ignoring what should be ignored based on the earlier instructions for exact dates and figures. If you do not have improvements to give, please also give a score of 5. Do not mention the existence of the ideal response when providing your feedback.
+
+Use the following rubric as a guide when evaluating the response:
+
+**Accuracy**
+- **1**: The response contains significant errors and inaccuracies, possibly leading to misinformation or confusion for the customer.
+- **2**: The response has several inaccuracies and lacks attention to detail, which could impact the customer's understanding of the information provided.
+- **3**: The response is mostly accurate but may contain minor errors that do not significantly impact the overall understanding.
+- **4**: The response is accurate with very few, if any, errors, ensuring that the information provided is reliable and correct.
+- **5**: The response is completely accurate and error-free, demonstrating a high level of attention to detail and precision in the information provided.
+
+**Comprehension**
+- **1**: The response demonstrates a lack of understanding of the customer's query, possibly leading to irrelevant or unhelpful information being provided.
+- **2**: The response shows partial understanding of the customer's query, but may miss key points or fail to address the customer's needs comprehensively.
+- **3**: The response demonstrates a good understanding of the customer's query, addressing the main points effectively and providing relevant information.
+- **4**: The response shows a clear understanding of the customer's query, ensuring that all aspects of the customer's query are addressed accurately and comprehensively.
+- **5**: The response demonstrates an exceptional understanding of the customer's query, even in ambiguous situations, providing insightful and comprehensive information that exceeds the customer's expectations.
+
+**Tone**
+- **1**: The tone is inappropriate, unprofessional, or rude, potentially leading to a negative customer experience.
+- **2**: The tone is somewhat inappropriate or lacks professionalism, which may impact the customer's perception of the service.
+- **3**: The tone is polite and professional, but may have some inconsistencies or lack a personal touch, potentially affecting the overall customer experience.
+- **4**: The tone is consistently polite, professional, and engaging, enhancing the customer's experience and demonstrating a high level of customer service.
+- **5**: The tone is consistently polite, professional, and empathetic, creating a positive and supportive customer experience that exceeds expectations.
+
+Please give your response in this JSON format, where score is an integer and all feedbacks are a string:
+"Accuracy": score, "Comprehension": score, "Tone": score, "Accuracy Feedback": accuracy_feedback, "Comprehension Feedback": comprehension_feedback, "Tone Feedback": tone_feedback, "Feedback": feedback_response
+Do not include backticks and do wrap the feedback in quotation marks.
+"""
+
+DEFAULT_PROMPT_SUFFIX = """
+Question: {question}
+Trainee's response: {response}
+Ideal response: {ideal}
+Accuracy Feedback: {feedback}
+"""
+
+# Appended to the system prefix when grading and improvement analysis are done in one call.
+# It is static too, so combined calls share their own cached prefix.
+IMPROVEMENT_INSTRUCTIONS = """
+The trainee's previous attempt at this question, and the scores it received, are also given at the end of this message.
+In addition to grading the latest response, analyse the trainee's improvement from the previous attempt to the latest response in accuracy, comprehension, and tone, using the same rubric and the scores you gave to the latest response. Do not mention the existence of the ideal response when providing this feedback.
+Provide a brief improvement feedback, no need to give any examples, as an additional "Improvement Feedback" string in the JSON, formatted as follows:
+**Accuracy**
+
+Previous Attempt Score: previous_accuracy_score
+Latest Attempt Score: latest_accuracy_score
+[Accuracy feedback text here]
+
+___
+
+**Comprehension**
+
+Previous Attempt Score: previous_comprehension_score
+Latest Attempt Score: latest_comprehension_score
+[Comprehension feedback text here]
+
+___
+
+**Tone**
+
+Previous Attempt Score: previous_tone_score
+Latest Attempt Score: latest_tone_score
+[Tone feedback text here]
+
+___
+
+**Improvement Feedback**: Provide a summary of the overall improvement or regression seen across the two attempts, along with actionable feedback for further improvement.
+"""
+
+PREVIOUS_ATTEMPT_TEMPLATE = """
+
+Previous Attempt:
+Answer: {answer}
+Accuracy Score: {accuracy_score}
+Comprehension Score: {precision_score}
+Tone Score: {tone_score}
+System Name: {system_name}
+System URL: {system_url}
+"""
+
+# Placeholders that openAI_response fills in, and the ones a stored prompt must keep
+PROMPT_VARIABLES = {
+    "question", "response", "ideal", "ideal_system_name", "ideal_system_url",
+    "system_name", "system_url", "feedback"
+}
+REQUIRED_PROMPT_VARIABLES = {"question", "response"}
+
+metrics.describe("llm_calls_total", "Number of LLM calls made, by call type.")
+metrics.describe("llm_prompt_tokens_total", "Prompt tokens sent to the LLM, by call type.")
+metrics.describe("llm_cached_prompt_tokens_total", "Prompt tokens served from the provider's prompt cache, by call type.")
+metrics.describe("llm_completion_tokens_total", "Completion tokens returned by the LLM, by call type.")
+metrics.describe("grading_parse_failures_total", "Grading responses that failed JSON/schema validation.")
+metrics.describe("grading_parse_exhausted_total", "Grading calls that still failed validation after all retries.")
+metrics.describe("batch_grading_failures_total", "Gradings of a batch whose LLM call raised an error.")
+
+
+def _cached_token_ratio():
+    ratios = []
+    for call in ("grading",):
+        prompt_tokens = metrics.get("llm_prompt_tokens_total", call=call)
+        cached_tokens = metrics.get("llm_cached_prompt_tokens_total", call=call)
+        ratios.append(({"call": call}, cached_tokens / prompt_tokens if prompt_tokens else 0))
+    return ratios
+
+metrics.register_gauge(
+    "llm_cached_prompt_token_ratio", _cached_token_ratio,
+    "Share of prompt tokens served from the provider's prompt cache since startup."
+)
+
+def _parse_failure_ratio():
+    calls = metrics.get("llm_calls_total", call="grading")
+    failures = metrics.get("grading_parse_failures_total")
+    return [({}, failures / calls if calls else 0)]
+
+metrics.register_gauge(
+    "grading_parse_failure_ratio", _parse_failure_ratio,
+    "Share of grading LLM calls whose response failed validation since startup."
+)
+
+
+def _template_variables(text):
+    return {field for _, field, _, _ in string.Formatter().parse(text) if field is not None}
+
+def split_prompt(prompt_text):
+    """Split a grading prompt into its static prefix and variable suffix.
+
+    The suffix is the trailing block of lines that each contain a placeholder (blank lines
+    are allowed in between); everything before it is the prefix.
 
-    # Define model
-    llm = ChatOpenAI(
-        temperature=0.3,
-        openai_api_key=os.getenv("OPENAI_KEY"),
-        model_name="gpt-4o"
-    )
+    Raises:
+        ValueError: If the prompt does not have the expected prefix/suffix shape.
+    """
+    lines = prompt_text.rstrip().split("\n")
+    split_at = len(lines)
+    while split_at > 0 and (not lines[split_at - 1].strip() or _template_variables(lines[split_at - 1])):
+        split_at -= 1
+
+    prefix = "\n".join(lines[:split_at])
+    suffix = "\n".join(lines[split_at:]).strip("\n")
+
+    if not prefix.strip():
+        raise ValueError("The prompt must start with instructions that do not contain any placeholders.")
+    if _template_variables(prefix):
+        raise ValueError(
+            "Placeholders such as {question} may only appear in the lines at the end of the prompt, "
+            "after all instructions, rubric and output format."
+        )
 
-    memory = ConversationBufferMemory(memory_key="chat_history", return_messages=False)
+    variables = _template_variables(suffix)
+    unknown = variables - PROMPT_VARIABLES
+    if unknown:
+        raise ValueError(f"Unknown placeholder(s): {', '.join(sorted(unknown))}.")
+    missing = REQUIRED_PROMPT_VARIABLES - variables
+    if missing:
+        raise ValueError(f"Missing required placeholder(s): {', '.join(sorted(missing))}.")
 
-    qa = ConversationalRetrievalChain.from_llm(
-        llm=llm,
-        retriever=retriever,
-        memory=memory
-    )
+    return prefix, suffix
 
-    # Check similarity
-    def are_source_names_correct(trainee_names, ideal_names):
-        similarity_threshold = 70
-        missing_names = []
+def validate_prompt(prompt_text):
+    """Check that a prompt keeps the cache-friendly prefix/suffix layout.
 
-        for ideal_name_original in ideal_names:
-            ideal_name = ideal_name_original.lower()
-            found_match = False
-            for trainee_name_original in trainee_names:
-                trainee_name = trainee_name_original.lower()
-                similarity_score = fuzz.token_sort_ratio(trainee_name, ideal_name)
-                if similarity_score >= similarity_threshold:
-                    found_match = True
-                    break
-
-            if not found_match:
-                missing_names.append(ideal_name_original)
+    Raises:
+        ValueError: If the prompt cannot be split into a static prefix and variable suffix.
+    """
+    prefix, suffix = split_prompt(prompt_text)
+    # Make sure both halves parse as templates
+    PromptTemplate.from_template(prefix).format()
+    PromptTemplate.from_template(suffix)
+
+def retrieve_context(question):
+    # Retrieve FAQ context for the customer's question
+    with metrics.span("retrieval"):
+        docs = retriever.invoke(question)
+    return "\n\n".join(doc.page_content for doc in docs)
+
+def compile_prompt(prompt_text):
+    """Pre-parse a grading prompt.
+
+    Returns:
+        Tuple of the system message text (None for prompts without the prefix/suffix layout)
+        and the PromptTemplate for the user message.
+    """
+    try:
+        prefix, suffix = split_prompt(prompt_text)
+        system_text = PromptTemplate.from_template(prefix).format()
+    except ValueError as e:
+        # Prompts saved before the layout was enforced are sent as a single user message
+        print(f"Prompt does not follow the prefix/suffix layout ({e}), sending it as-is.")
+        system_text, suffix = None, prompt_text
+
+    return system_text, PromptTemplate.from_template(suffix)
+
+def get_active_prompt():
+    """Return the compiled prompt stored in the database, or the default prompt.
+
+    The compiled prompt is cached for the whole process. Prompt routes call
+    invalidate_prompt_cache() on change; changes made through other replicas are picked up by
+    checking the prompt table's version counter (see table_versions.py), which every write
+    increments, at most once every PROMPT_CACHE_TTL seconds.
+    """
+    with _prompt_cache_lock:
+        if _prompt_cache["prompt"] and time.monotonic() - _prompt_cache["checked_at"] < PROMPT_CACHE_TTL:
+            return _prompt_cache["prompt"]
 
-        if missing_names:
-            print(f"Missing ideal names: {missing_names}")
-            return False, missing_names
+    db = SessionFactory()
+    try:
+        version = db.query(TableVersionModel.version, TableVersionModel.updated).filter(
+            TableVersionModel.table_name == PromptModel.__tablename__
+        ).first()
+        version = tuple(version) if version else None
+
+        with _prompt_cache_lock:
+            if _prompt_cache["prompt"] and _prompt_cache["version"] == version:
+                _prompt_cache["checked_at"] = time.monotonic()
+                return _prompt_cache["prompt"]
+
+        db_prompt = db.query(PromptModel).first()
+        if db_prompt and db_prompt.prompt_text.strip():
+            print("Loaded dynamic prompt from database.")
+            prompt = compile_prompt(db_prompt.prompt_text)
         else:
-            print("All trainee source names are correct.")
-            return True, []
+            print("No prompt found in the database, using the hardcoded default prompt.")
+            prompt = compile_prompt(get_default_prompt())
+    except Exception as e:
+        db.rollback()
+        print(f"Error fetching prompt from database: {e}")
+        # Keep serving the last known prompt rather than failing the grading call
+        return _prompt_cache["prompt"] or compile_prompt(get_default_prompt())
+    finally:
+        db.close()  # Ensure the session is closed
+
+    with _prompt_cache_lock:
+        _prompt_cache.update(version=version, prompt=prompt, checked_at=time.monotonic())
+    return prompt
+
+def invalidate_prompt_cache():
+    with _prompt_cache_lock:
+        _prompt_cache.update(version=None, prompt=None, checked_at=0.0)
+
+def build_grading_messages(prompt, context, previous_attempt=None, **variables):
+    """Build the chat messages for a grading call.
+
+    The static prefix goes in the system message so it is identical on every call; the
+    retrieved context and the filled-in suffix go in the user message. When a previous
+    attempt is given, the improvement analysis instructions and that attempt are added too.
+
+    Args:
+        prompt: Compiled prompt from compile_prompt() or get_active_prompt().
+    """
+    system_text, suffix_template = prompt
 
-    # Check if source names are correct
-    trainee_names = system_name.split(", ")
-    ideal_names = ideal_system_name.split(", ")
-    is_correct, missing_names = are_source_names_correct(trainee_names, ideal_names)
+    user_text = f"Context:\n{context}\n\n" + suffix_template.format(**variables)
+
+    if previous_attempt is not None:
+        if system_text:
+            system_text += IMPROVEMENT_INSTRUCTIONS
+        else:
+            user_text += IMPROVEMENT_INSTRUCTIONS
+        user_text += PREVIOUS_ATTEMPT_TEMPLATE.format(**previous_attempt)
+
+    messages = [HumanMessage(content=user_text)]
+    if system_text:
+        messages.insert(0, SystemMessage(content=system_text))
+    return messages
+
+def record_token_usage(call, llm_output):
+    token_usage = (llm_output or {}).get("token_usage") or {}
+    prompt_tokens = token_usage.get("prompt_tokens") or 0
+    cached_tokens = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+
+    metrics.inc("llm_calls_total", call=call)
+    metrics.inc("llm_prompt_tokens_total", prompt_tokens, call=call)
+    metrics.inc("llm_cached_prompt_tokens_total", cached_tokens, call=call)
+    metrics.inc("llm_completion_tokens_total", token_usage.get("completion_tokens") or 0, call=call)
+
+def get_grading_llm(combined=False):
+    # Clients are created once and shared so their HTTP connections stay warm between calls
+    with _llm_lock:
+        if combined not in _grading_llms:
+            _grading_llms[combined] = get_chat_model(
+                temperature=0.3,
+                response_format=COMBINED_GRADING_RESPONSE_FORMAT if combined else GRADING_RESPONSE_FORMAT
+            )
+        return _grading_llms[combined]
+
+def warm_up():
+    """Load everything a grading call needs ahead of the first request."""
+    get_grading_llm()
+    get_grading_llm(combined=True)
+    get_active_prompt()
+    retrieve_context("warm up")
+
+def source_feedback(system_name, system_url, ideal_system_name, ideal_system_url):
+    # Check if source names (and optionally URLs) are correct
+    missing_names = missing_source_names(system_name, ideal_system_name)
+    missing_urls = missing_source_urls(system_url, ideal_system_url, ideal_system_name) if CHECK_SOURCE_URLS else []
 
     # Determine feedback based on correctness
-    if is_correct:
+    if not missing_names and not missing_urls:
         feedback = "The source(s) referenced by the trainee are complete."
     else:
-        feedback = f"The source(s) referenced by the trainee are incomplete. The missing source name(s) are {', '.join(missing_names)}."
+        feedback = "The source(s) referenced by the trainee are incomplete."
+        if missing_names:
+            feedback += f" The missing source name(s) are {', '.join(missing_names)}."
+        if missing_urls:
+            feedback += f" The missing source URL(s) are {', '.join(missing_urls)}."
     print(feedback)
+    return feedback
+
+def _timed(timings, stage, fn, *args):
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000)
+
+def used_tokens(result):
+    # Total tokens of an LLMResult, for settling the scheduler's estimate
+    return ((result.llm_output or {}).get("token_usage") or {}).get("total_tokens")
+
+def openAI_response(question, response, ideal, ideal_system_name, ideal_system_url, system_name, system_url, prompt_text=None, previous_attempt=None, timings=None, context=None, lane=INTERACTIVE):
+    """Grade a trainee's response.
+
+    If ``previous_attempt`` (an attempt dict) is given, the same call also returns the
+    improvement feedback against that attempt under "Improvement Feedback"; parse it with
+    ``process_response(res, combined=True)``.
 
-   # Fetch the prompt from the database
+    If ``timings`` is given, it is filled with the duration of each stage in milliseconds
+    (citation_ms, prompt_ms, retrieval_ms, llm_ms, total_ms) and the number of LLM calls.
+
+    ``context`` skips retrieval and uses the given FAQ context instead. ``lane`` is the
+    scheduler lane of the LLM call (INTERACTIVE or BACKFILL).
+    """
+    start = time.perf_counter()
+    timings = {} if timings is None else timings
+    combined = previous_attempt is not None
+
+    # The citation check, prompt loading and retrieval are independent, so they run
+    # concurrently and the LLM call only waits for the slowest of them
+    citation = _stage_executor.submit(
+        _timed, timings, "citation_ms", source_feedback,
+        system_name, system_url, ideal_system_name, ideal_system_url
+    )
     if prompt_text:
-        # If prompt_text is provided, use it
-        prompt_template = PromptTemplate.from_template(prompt_text)
+        # Use the prompt under comparison
+        prompt = _stage_executor.submit(_timed, timings, "prompt_ms", compile_prompt, prompt_text)
     else:
-        # Step 2: Fetch the prompt from the database
-        db = SessionFactory()
-        try:
-            db_prompt = db.query(PromptModel).first()
-            if db_prompt and db_prompt.prompt_text.strip():
-                prompt_text = db_prompt.prompt_text
-                print(f"Using dynamic prompt from database: {prompt_text}")
-                prompt_template = PromptTemplate.from_template(prompt_text)
-            else:
-                print("No prompt found in the database, falling back to default prompt.")
-                prompt_template = None
-        except Exception as e:
-            db.rollback()
-            print(f"Error fetching prompt from database: {e}")
-            prompt_template = None  # Fallback to default prompt
-        finally:
-            db.close()  # Ensure the session is closed
-
-    # Step 3: Fallback to default prompt if no prompt is found in the database
-    if not prompt_template:
-        print("Using the hardcoded default prompt.")
-        prompt_template = PromptTemplate.from_template(
-            """
-            I will give you a question, a customer service trainee's response to that question, and the ideal response to that question.
-            Please assess the trainee's response to the question. Do not actually answer the question, but evaluate the answer only using the context given and the ideal answer.
-            Please give the trainee's response a score out of 5 for accuracy, comprehension, and tone. Accuracy refers to if the factually correct answers were provided, comprehension refers to whether the answer has enough details, is concise and demonstrates that the question was fully understood, and tone refers to whether the tone of the answer is respectful and professional.
-            Please take note that the ideal response scored 5 for accuracy, comprehension, and tone and use it as a point of reference.
-            Please also give some general feedback for improvement.
-            Please incorporate the following text in your Accuracy Feedback: {feedback}
-
-            If the trainee's response contains exact dates and monetary figures that are not in the question and do not match the ideal response, please ignore it when grading accuracy. For exact dates and monetary figures that are in the question, the trainee’s response should contain such information, even if they are not in the ideal response.
-
-            It is acceptable to give the trainee full marks if they answered similarly to the ideal response after ignoring what should be ignored based on the earlier instructions for exact dates and figures. If you do not have improvements to give, please also give a score of 5. Do not mention the existence of the ideal response when providing your feedback.
-
-            Use the following rubric as a guide when evaluating the response:
-
-            **Accuracy**
-            - **1**: The response contains significant errors and inaccuracies, possibly leading to misinformation or confusion for the customer.
-            - **2**: The response has several inaccuracies and lacks attention to detail, which could impact the customer's understanding of the information provided.
-            - **3**: The response is mostly accurate but may contain minor errors that do not significantly impact the overall understanding.
-            - **4**: The response is accurate with very few, if any, errors, ensuring that the information provided is reliable and correct.
-            - **5**: The response is completely accurate and error-free, demonstrating a high level of attention to detail and precision in the information provided.
-
-            **Comprehension**
-            - **1**: The response demonstrates a lack of understanding of the customer's query, possibly leading to irrelevant or unhelpful information being provided.
-            - **2**: The response shows partial understanding of the customer's query, but may miss key points or fail to address the customer's needs comprehensively.
-            - **3**: The response demonstrates a good understanding of the customer's query, addressing the main points effectively and providing relevant information.
-            - **4**: The response shows a clear understanding of the customer's query, ensuring that all aspects of the customer's query are addressed accurately and comprehensively.
-            - **5**: The response demonstrates an exceptional understanding of the customer's query, even in ambiguous situations, providing insightful and comprehensive information that exceeds the customer's expectations.
-
-            **Tone**
-            - **1**: The tone is inappropriate, unprofessional, or rude, potentially leading to a negative customer experience.
-            - **2**: The tone is somewhat inappropriate or lacks professionalism, which may impact the customer's perception of the service.
-            - **3**: The tone is polite and professional, but may have some inconsistencies or lack a personal touch, potentially affecting the overall customer experience.
-            - **4**: The tone is consistently polite, professional, and engaging, enhancing the customer's experience and demonstrating a high level of customer service.
-            - **5**: The tone is consistently polite, professional, and empathetic, creating a positive and supportive customer experience that exceeds expectations.
-
-            Please give your response in this JSON format, where score is an integer and all feedbacks are a string:
-            "Accuracy": score, "Comprehension": score, "Tone": score, "Accuracy Feedback": accuracy_feedback, "Comprehension Feedback": comprehension_feedback, "Tone Feedback": tone_feedback, "Feedback": feedback_response
-            Do not include backticks and do wrap the feedback in quotation marks.
-
-            Question: {question}
-            Trainee's response: {response}
-            Ideal response: {ideal}
-            Accuracy Feedback: {feedback}
-            """
-        )
+        prompt = _stage_executor.submit(_timed, timings, "prompt_ms", get_active_prompt)
+    if context is None:
+        context = _stage_executor.submit(_timed, timings, "retrieval_ms", retrieve_context, question).result()
 
-
-    result = qa.run({"question": prompt_template.format(
+    messages = build_grading_messages(
+        prompt.result(), context, previous_attempt,
         question=question, response=response, ideal=ideal,
         ideal_system_name=ideal_system_name, ideal_system_url=ideal_system_url,
-        system_name=system_name, system_url=system_url, feedback=feedback
-    )})
+        system_name=system_name, system_url=system_url, feedback=citation.result()
+    )
+
+    # Only the LLM call is repeated when the response fails validation
+    llm = get_grading_llm(combined)
+    estimated_tokens = estimate_tokens("".join(message.content for message in messages))
+    llm_start = time.perf_counter()
+    for attempt in range(GRADING_PARSE_RETRIES + 1):
+        result = scheduler.call(
+            lambda: llm.generate([messages]), estimated_tokens, lane=lane, used_tokens=used_tokens
+        )
+        record_token_usage("grading", result.llm_output)
+        text = result.generations[0][0].text
+        if parse_grading(text, combined) is not None:
+            break
+        metrics.inc("grading_parse_failures_total")
+        print(f"Grading response failed validation (attempt {attempt + 1}): {text}")
+    else:
+        metrics.inc("grading_parse_exhausted_total")
 
-    return result
+    timings["llm_calls"] = attempt + 1
+    timings["llm_ms"] = round((time.perf_counter() - llm_start) * 1000)
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000)
+    return text
 
-def get_default_prompt():
-    return """
-    I will give you a question, a customer service trainee's response to that question, and the ideal response to that question.
-    Please assess the trainee's response to the question. Do not actually answer the question, but evaluate the answer only using the context given and the ideal answer.
-    Please give the trainee's response a score out of 5 for accuracy, comprehension, and tone. Accuracy refers to if the factually correct answers were provided, comprehension refers to whether the answer has enough details, is concise and demonstrates that the question was fully understood, and tone refers to whether the tone of the answer is respectful and professional.
-    Please take note that the ideal response scored 5 for accuracy, comprehension, and tone and use it as a point of reference.
-    Please also give some general feedback for improvement.
-    Please incorporate the following text in your Accuracy Feedback: {feedback}
-
-    If the trainee's response contains exact dates and monetary figures that are not in the question and do not match the ideal response, please ignore it when grading accuracy. For exact dates and monetary figures that are in the question, the trainee’s response should contain such information, even if they are not in the ideal response.
-
-    It is acceptable to give the trainee full marks if they answered similarly to the ideal response after ignoring what should be ignored based on the earlier instructions for exact dates and figures. If you do not have improvements to give, please also give a score of 5. Do not mention the existence of the ideal response when providing your feedback.
-
-    Use the following rubric as a guide when evaluating the response:
-
-    **Accuracy**
-    - **1**: The response contains significant errors and inaccuracies, possibly leading to misinformation or confusion for the customer.
-    - **2**: The response has several inaccuracies and lacks attention to detail, which could impact the customer's understanding of the information provided.
-    - **3**: The response is mostly accurate but may contain minor errors that do not significantly impact the overall understanding.
-    - **4**: The response is accurate with very few, if any, errors, ensuring that the information provided is reliable and correct.
-    - **5**: The response is completely accurate and error-free, demonstrating a high level of attention to detail and precision in the information provided.
-
-    **Comprehension**
-    - **1**: The response demonstrates a lack of understanding of the customer's query, possibly leading to irrelevant or unhelpful information being provided.
-    - **2**: The response shows partial understanding of the customer's query, but may miss key points or fail to address the customer's needs comprehensively.
-    - **3**: The response demonstrates a good understanding of the customer's query, addressing the main points effectively and providing relevant information.
-    - **4**: The response shows a clear understanding of the customer's query, ensuring that all aspects of the customer's query are addressed accurately and comprehensively.
-    - **5**: The response demonstrates an exceptional understanding of the customer's query, even in ambiguous situations, providing insightful and comprehensive information that exceeds the customer's expectations.
-
-    **Tone**
-    - **1**: The tone is inappropriate, unprofessional, or rude, potentially leading to a negative customer experience.
-    - **2**: The tone is somewhat inappropriate or lacks professionalism, which may impact the customer's perception of the service.
-    - **3**: The tone is polite and professional, but may have some inconsistencies or lack a personal touch, potentially affecting the overall customer experience.
-    - **4**: The tone is consistently polite, professional, and engaging, enhancing the customer's experience and demonstrating a high level of customer service.
-    - **5**: The tone is consistently polite, professional, and empathetic, creating a positive and supportive customer experience that exceeds expectations.
-
-    Please give your response in this JSON format, where score is an integer and all feedbacks are a string:
-    "Accuracy": score, "Comprehension": score, "Tone": score, "Accuracy Feedback": accuracy_feedback, "Comprehension Feedback": comprehension_feedback, "Tone Feedback": tone_feedback, "Feedback": feedback_response
-    Do not include backticks and do wrap the feedback in quotation marks.
-
-    Question: {question}
-    Trainee's response: {response}
-    Ideal response: {ideal}
-    Accuracy Feedback: {feedback}
+def openAI_batch_response(gradings, lane=BACKFILL):
+    """Grade many responses, running at most BATCH_GRADING_CONCURRENCY LLM calls at a time.
+
+    ``gradings`` is a list of openAI_response keyword arguments. Retrieval runs once per
+    distinct question and is shared by its responses. Returns ``(response, timings)`` pairs
+    in the order of ``gradings``; ``response`` is None for a grading whose LLM call raised,
+    so one failure does not discard the others.
     """
+    questions = list({grading["question"] for grading in gradings})
+    contexts = dict(zip(questions, _stage_executor.map(retrieve_context, questions)))
+
+    def grade(grading):
+        timings = {}
+        try:
+            response = openAI_response(**grading, timings=timings, context=contexts[grading["question"]], lane=lane)
+        except Exception as e:
+            metrics.inc("batch_grading_failures_total")
+            print(f"Batch grading call failed: {e}")
+            response = None
+        return response, timings
+
+    with ThreadPoolExecutor(max_workers=BATCH_GRADING_CONCURRENCY) as executor:
+        # Executor threads do not inherit context variables; each call runs in a copy of the
+        # caller's context so it is attributed to the request (see metrics.holds_connection)
+        futures = [executor.submit(contextvars.copy_context().run, grade, grading) for grading in gradings]
+        return [future.result() for future in futures]
 
+def get_default_prompt():
+    return DEFAULT_PROMPT_PREFIX + DEFAULT_PROMPT_SUFFIX
@@ -0,0 +1,177 @@
+import os
+import random
+import threading
+import time
+import logging
+from dotenv import load_dotenv
+import metrics
+
+load_dotenv()
+
+# Every LLM call goes through one shared scheduler so that bulk jobs cannot starve live
+# grading or push the account over its rate limits. Calls are admitted by two token
+# buckets (requests/min and tokens/min). Interactive calls always go first; backfill calls
+# (re-grading, bulk scans) wait while any interactive call is waiting and may not use the
+# last LLM_BACKFILL_RESERVE share of either bucket.
+INTERACTIVE = "interactive"
+BACKFILL = "backfill"
+
+LLM_RPM = int(os.getenv("LLM_RPM", 500))
+LLM_TPM = int(os.getenv("LLM_TPM", 30000))
+LLM_BACKFILL_RESERVE = float(os.getenv("LLM_BACKFILL_RESERVE", 0.2))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 1.0))  # seconds
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 30.0))  # seconds
+
+# Rough completion size of a grading call, charged up front and settled on the actual usage
+DEFAULT_COMPLETION_TOKENS = 600
+
+metrics.describe("llm_scheduler_wait_seconds_total", "Time LLM calls spent waiting for rate limit capacity, by lane.")
+metrics.describe("llm_rate_limited_total", "LLM calls rejected by the provider with a rate limit error, by lane.")
+metrics.describe("llm_retries_exhausted_total", "LLM calls that were still rate limited after all retries, by lane.")
+metrics.describe("llm_calls_holding_db_connection_total", "LLM calls made while the request held a pooled DB connection, by lane.")
+
+
+def estimate_tokens(text, completion_tokens=DEFAULT_COMPLETION_TOKENS):
+    # About 4 characters per token for English text
+    return len(text) // 4 + completion_tokens
+
+def is_rate_limit_error(error):
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Bucket:
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        # Seconds until the bucket holds at least ``amount``
+        return max(0.0, (amount - self.level) / self.rate)
+
+
+class LLMScheduler:
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, backfill_reserve=LLM_BACKFILL_RESERVE,
+                 max_retries=LLM_MAX_RETRIES, backoff_base=LLM_BACKOFF_BASE, backoff_max=LLM_BACKOFF_MAX):
+        self.requests = _Bucket(rpm)
+        self.tokens = _Bucket(tpm)
+        self.backfill_reserve = backfill_reserve
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._cond = threading.Condition()
+        self._waiting = {INTERACTIVE: 0, BACKFILL: 0}
+
+    def waiting(self, lane):
+        with self._cond:
+            return self._waiting[lane]
+
+    def acquire(self, tokens, lane=INTERACTIVE):
+        """Block until the call fits in both buckets, then take its capacity.
+
+        Returns the number of tokens charged (capped at the bucket size so a single large
+        call cannot wait forever). A backfill call that does not fit beside the reserve waits
+        for a full bucket instead.
+        """
+        tokens = min(tokens, self.tokens.capacity)
+        reserve = self.backfill_reserve if lane == BACKFILL else 0.0
+        start = time.monotonic()
+
+        with self._cond:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+
+                    # Never more than the buckets hold, or a backfill call would wait forever
+                    needed_requests = min(1 + self.requests.capacity * reserve, self.requests.capacity)
+                    needed_tokens = min(tokens + self.tokens.capacity * reserve, self.tokens.capacity)
+                    if lane == BACKFILL and self._waiting[INTERACTIVE]:
+                        # Woken again when the interactive waiters are admitted
+                        self._cond.wait(timeout=1.0)
+                        continue
+                    if self.requests.level >= needed_requests and self.tokens.level >= needed_tokens:
+                        self.requests.level -= 1
+                        self.tokens.level -= tokens
+                        break
+                    self._cond.wait(timeout=max(
+                        self.requests.wait_time(needed_requests), self.tokens.wait_time(needed_tokens), 0.005
+                    ))
+            finally:
+                self._waiting[lane] -= 1
+                self._cond.notify_all()
+
+        metrics.inc("llm_scheduler_wait_seconds_total", time.monotonic() - start, lane=lane)
+        return tokens
+
+    def settle(self, charged_tokens, used_tokens):
+        # Give back (or take) the difference between the estimate and the actual usage
+        with self._cond:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + charged_tokens - used_tokens)
+            self._cond.notify_all()
+
+    def backoff(self, retry):
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry))
+
+    def call(self, fn, estimated_tokens, lane=INTERACTIVE, used_tokens=None):
+        """Run ``fn()`` once there is capacity, retrying rate limit errors with jittered backoff.
+
+        Args:
+            fn: The LLM call.
+            estimated_tokens: Prompt plus expected completion tokens, see estimate_tokens().
+            lane: INTERACTIVE or BACKFILL.
+            used_tokens: Optional function returning the actual tokens used from fn's result.
+        """
+        # LLM calls take seconds; a request must not keep a pooled connection meanwhile
+        if metrics.holds_connection():
+            metrics.inc("llm_calls_holding_db_connection_total", lane=lane)
+            logging.warning("LLM call made while holding a DB connection; commit or close the session first")
+
+        for retry in range(self.max_retries + 1):
+            charged = self.acquire(estimated_tokens, lane)
+            try:
+                with metrics.span("llm"):
+                    result = fn()
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                metrics.inc("llm_rate_limited_total", lane=lane)
+                if retry == self.max_retries:
+                    metrics.inc("llm_retries_exhausted_total", lane=lane)
+                    raise
+                delay = _retry_after(e) or self.backoff(retry)
+                print(f"LLM call rate limited ({lane}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if used_tokens is not None:
+                used = used_tokens(result)
+                if used:
+                    self.settle(charged, used)
+            return result
+
+
+scheduler = LLMScheduler()
+
+metrics.register_gauge(
+    "llm_scheduler_waiting",
+    lambda: [({"lane": lane}, scheduler.waiting(lane)) for lane in (INTERACTIVE, BACKFILL)],
+    "LLM calls currently waiting for rate limit capacity, by lane."
+)
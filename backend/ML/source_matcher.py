@@ -0,0 +1,108 @@
+import threading
+import time
+from functools import lru_cache
+from rapidfuzz import fuzz, process, utils
+from session import SessionFactory
+from models.system import SystemModel
+
+# Minimum token_sort_ratio for a trainee source name to count as the ideal one
+SIMILARITY_THRESHOLD = 70
+
+# System catalogue (SystemModel rows), reloaded at most every CATALOGUE_TTL seconds
+CATALOGUE_TTL = 300
+_catalogue = {"systems": None, "loaded_at": 0.0}
+_catalogue_lock = threading.Lock()
+
+
+def split_names(names):
+    # Names and URLs are stored as ", "-separated strings
+    if not names:
+        return []
+    return [name.strip() for name in names.split(",") if name.strip()]
+
+def normalise_url(url):
+    url = url.strip().lower()
+    for prefix in ("https://", "http://", "www."):
+        if url.startswith(prefix):
+            url = url[len(prefix):]
+    return url.rstrip("/")
+
+@lru_cache(maxsize=4096)
+def _ideal_names(ideal_system_name):
+    # Cached per question: its ideal names and their pre-processed forms
+    names = tuple(split_names(ideal_system_name))
+    return names, [utils.default_process(name) for name in names]
+
+@lru_cache(maxsize=4096)
+def _ideal_urls(ideal_system_url):
+    urls = tuple(split_names(ideal_system_url))
+    return urls, [normalise_url(url) for url in urls]
+
+def missing_source_names(trainee_system_name, ideal_system_name, threshold=SIMILARITY_THRESHOLD):
+    """Return the ideal source names the trainee did not cite.
+
+    Every ideal name is scored against every trainee name in one vectorised call; an ideal
+    name counts as cited if any trainee name reaches the threshold.
+    """
+    ideal_names, ideal_processed = _ideal_names(ideal_system_name)
+    if not ideal_names:
+        return []
+
+    trainee_processed = [utils.default_process(name) for name in split_names(trainee_system_name)]
+    if not trainee_processed:
+        return list(ideal_names)
+
+    scores = process.cdist(
+        ideal_processed, trainee_processed,
+        scorer=fuzz.token_sort_ratio, score_cutoff=threshold, workers=1
+    )
+    return [name for name, row in zip(ideal_names, scores) if row.max() < threshold]
+
+def missing_source_urls(trainee_system_url, ideal_system_url, ideal_system_name=None):
+    """Return the ideal source URLs the trainee did not cite.
+
+    If the question has no ideal URLs, the catalogue URLs of its ideal system names are used.
+    """
+    ideal_urls, ideal_normalised = _ideal_urls(ideal_system_url)
+    if not ideal_urls and ideal_system_name:
+        ideal_urls = tuple(system["url"] for system in match_catalogue(ideal_system_name) if system)
+        ideal_normalised = [normalise_url(url) for url in ideal_urls]
+
+    trainee_normalised = {normalise_url(url) for url in split_names(trainee_system_url)}
+    return [url for url, normalised in zip(ideal_urls, ideal_normalised) if normalised not in trainee_normalised]
+
+def get_catalogue():
+    """Return the SystemModel catalogue with pre-processed names."""
+    with _catalogue_lock:
+        if _catalogue["systems"] is not None and time.monotonic() - _catalogue["loaded_at"] < CATALOGUE_TTL:
+            return _catalogue["systems"]
+
+    db = SessionFactory()
+    try:
+        systems = [
+            {"name": system.name, "url": system.url, "processed": utils.default_process(system.name)}
+            for system in db.query(SystemModel).all()
+        ]
+    finally:
+        db.close()
+
+    with _catalogue_lock:
+        _catalogue.update(systems=systems, loaded_at=time.monotonic())
+    return systems
+
+def invalidate_catalogue():
+    with _catalogue_lock:
+        _catalogue.update(systems=None, loaded_at=0.0)
+
+def match_catalogue(system_names, threshold=SIMILARITY_THRESHOLD):
+    """Map each name to its closest catalogue system (or None if nothing is close enough)."""
+    names = split_names(system_names)
+    systems = get_catalogue()
+    if not names or not systems:
+        return [None] * len(names)
+
+    scores = process.cdist(
+        [utils.default_process(name) for name in names], [system["processed"] for system in systems],
+        scorer=fuzz.token_sort_ratio, score_cutoff=threshold, workers=1
+    )
+    return [systems[row.argmax()] if row.max() >= threshold else None for row in scores]
@@ -0,0 +1,119 @@
+"""Benchmark handlers on the sync and async database sessions under slow queries.
+
+Runs the app in-process against a fresh SQLite database in which every SQL statement is
+slowed down by --query-delay (a trace callback that sleeps inside the driver), then calls
+two routes that each run three queries per request (including authentication) at
+increasing concurrency:
+
+    sync:  GET /questions/scheme/{scheme_name}  (create_session; queries block the event loop)
+    async: GET /attempt/user/{user_id}           (create_async_session)
+
+Requests/sec of the sync route stays flat as concurrency grows, because the event loop is
+blocked for the duration of every query; the async route scales with concurrency until the
+connection pool is exhausted. Reports requests/sec and p95 latency per route and
+concurrency as JSON.
+
+Run from the backend directory:
+    python -m benchmarks.bench_async_sessions
+    python -m benchmarks.bench_async_sessions --query-delay 0.05 --concurrency 1 8 32
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--requests", type=int, default=64, help="Requests per route and concurrency level")
+parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Concurrent clients")
+parser.add_argument("--query-delay", type=float, default=0.02, help="Seconds added to every SQL statement")
+args = parser.parse_args()
+
+ADMIN_EMAIL = "admin@example.com"
+PASSWORD = "password"
+
+dsn = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'async.db')}"
+os.environ.update({
+    "MYAPI_DATABASE__DSN": dsn,
+    # Enough connections that the async route is limited by the event loop, not the pool
+    "MYAPI_DATABASE__POOL_SIZE": str(max(args.concurrency)),
+    "LLM_BACKEND": "fake",
+    "DEFAULT_ADMIN_EMAIL": ADMIN_EMAIL,
+    "DEFAULT_ADMIN_PASSWORD": PASSWORD,
+})
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("OPENAI_KEY", "unused")
+
+from mock_db.generate_dataset import generate_dataset
+
+# Seeded before the app is imported, which adds the default admin on import
+dataset = generate_dataset(dsn, users=50, schemes=2, questions=20, attempts_per_user=10, admin_email=ADMIN_EMAIL, password=PASSWORD)
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from session import engine, async_engine
+import main
+
+
+def slow_statement(statement):
+    # Called by SQLite in the thread executing the statement
+    time.sleep(args.query_delay)
+
+@event.listens_for(engine, "connect")
+def _slow_sync_connection(dbapi_connection, connection_record):
+    dbapi_connection.set_trace_callback(slow_statement)
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _slow_async_connection(dbapi_connection, connection_record):
+    # aiosqlite runs statements (and so the callback) in its own thread
+    dbapi_connection.await_(dbapi_connection.driver_connection.set_trace_callback(slow_statement))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p / 100))] * 1000, 1)
+
+def run():
+    # Connections opened at import time do not have the delay
+    engine.dispose()
+
+    trainee = dataset["trainees"][0]
+    routes = {
+        "sync": f"/questions/scheme/{trainee['schemes'][0]}",
+        "async": f"/attempt/user/{trainee['uuid']}",
+    }
+    results = {}
+    with TestClient(main.app) as client:
+        token = client.post("/token", data={"username": ADMIN_EMAIL, "password": PASSWORD}).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+        def call(url):
+            start = time.perf_counter()
+            response = client.get(url, headers=headers)
+            return response.status_code < 400, time.perf_counter() - start
+
+        for name, url in routes.items():
+            results[name] = {"url": url, "levels": {}}
+            for concurrency in args.concurrency:
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    outcomes = list(executor.map(call, [url] * args.requests))
+                elapsed = time.perf_counter() - start
+                latencies = [latency for ok, latency in outcomes if ok]
+                results[name]["levels"][concurrency] = {
+                    "errors": len(outcomes) - len(latencies),
+                    "rps": round(len(latencies) / elapsed, 2),
+                    "p95_ms": percentile(latencies, 95) if latencies else None,
+                }
+
+    print(json.dumps({
+        "requests": args.requests,
+        "query_delay": args.query_delay,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(run())
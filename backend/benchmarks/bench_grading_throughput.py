@@ -0,0 +1,122 @@
+"""Benchmark end-to-end grading throughput of POST /attempt with the fake LLM backend.
+
+Runs the FastAPI app in-process against a fresh SQLite database, with LLM_BACKEND=fake so
+no OpenAI calls are made, and submits attempts from concurrent clients. Reports
+throughput and latency percentiles as JSON.
+
+Run from the backend directory:
+    python -m benchmarks.bench_grading_throughput
+    python -m benchmarks.bench_grading_throughput --requests 500 --concurrency 32 --latency constant:0.5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--requests", type=int, default=200, help="Attempts to submit")
+parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+parser.add_argument("--latency", default="lognormal:1.5,0.4", help="Fake LLM latency distribution")
+parser.add_argument("--grading-mode", default="separate", choices=["separate", "combined"])
+args = parser.parse_args()
+
+# Configure the app before it is imported
+db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.update({
+    "MYAPI_DATABASE__DSN": f"sqlite:///{db_path}",
+    "LLM_BACKEND": "fake",
+    "FAKE_LLM_LATENCY": args.latency,
+    "GRADING_MODE": args.grading_mode,
+    "LLM_RPM": "1000000",
+    "LLM_TPM": "1000000000",
+})
+for key, value in {
+    "SECRET_KEY": "benchmark", "DEFAULT_ADMIN_EMAIL": "admin@example.com", "DEFAULT_ADMIN_PASSWORD": "benchmark",
+    "DEFAULT_ADMIN_NAME": "Admin", "DEFAULT_ADMIN_ACCESS_RIGHTS": "admin", "OPENAI_KEY": "unused",
+}.items():
+    os.environ.setdefault(key, value)
+
+from passlib.context import CryptContext
+from fastapi.testclient import TestClient
+from config import Base
+from session import engine, SessionFactory
+from models.user import UserModel
+from models.scheme import SchemeModel
+from models.question import QuestionModel
+
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    db = SessionFactory()
+    admin = db.query(UserModel).filter(UserModel.email == os.environ["DEFAULT_ADMIN_EMAIL"]).first()
+    if admin is None:
+        admin = UserModel(
+            email=os.environ["DEFAULT_ADMIN_EMAIL"], name="Admin", access_rights="admin", dept="Benchmark",
+            hashed_password=CryptContext(schemes=["bcrypt"]).hash(os.environ["DEFAULT_ADMIN_PASSWORD"])
+        )
+        db.add(admin)
+    db.add(SchemeModel(scheme_name="Benchmark"))
+    questions = [
+        QuestionModel(
+            title=f"Question {i}", question_difficulty="Easy", scheme_name="Benchmark",
+            question_details=f"How do I check my account balance? ({i})",
+            ideal="Log in to the member portal and open the account summary.",
+            ideal_system_name="Member Portal, CPF Website FAQ", ideal_system_url="https://example.com/portal"
+        )
+        for i in range(10)
+    ]
+    db.add_all(questions)
+    db.commit()
+    ids = [question.question_id for question in questions]
+    db.close()
+    return ids
+
+def percentile(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p / 100))], 3)
+
+def run():
+    # Seeded before the app is imported, which adds the default admin on import
+    question_ids = seed()
+    import main
+
+    with TestClient(main.app) as client:
+        token = client.post("/token", data={
+            "username": os.environ["DEFAULT_ADMIN_EMAIL"], "password": os.environ["DEFAULT_ADMIN_PASSWORD"]
+        }).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+        def submit(i):
+            start = time.perf_counter()
+            response = client.post("/attempt", headers=headers, json={
+                "user_id": token["uuid"], "question_id": question_ids[i % len(question_ids)],
+                "answer": f"Log in to the portal and check the summary ({i}).",
+                "system_name": "Member Portal", "system_url": "https://example.com/portal",
+            })
+            return response.status_code, time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(submit, range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies = [latency for code, latency in results if code == 201]
+    print(json.dumps({
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "latency": args.latency,
+        "grading_mode": args.grading_mode,
+        "errors": len(results) - len(latencies),
+        "seconds": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50": percentile(latencies, 50) if latencies else None,
+        "p95": percentile(latencies, 95) if latencies else None,
+        "p99": percentile(latencies, 99) if latencies else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(run())
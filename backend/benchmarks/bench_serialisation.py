@@ -0,0 +1,155 @@
+"""Benchmark JSON serialisation of large list responses.
+
+Builds --rows rows (10k by default) of each of three payloads, shaped as the routes return
+them, and serves each from a FastAPI route in three ways:
+
+    jsonable_encoder:  no response model (the routes before), encoded by jsonable_encoder
+                       and rendered with the json module
+    response_model:    the route's Pydantic response model, rendered with the json module
+    orjson:            the response model, rendered with ORJSONResponse (the app default
+                       when orjson is installed)
+
+    questions:         GET /questions/all         QuestionModel.to_dict() with the scheme
+    attempts:          GET /attempt/user/{id}     attempt dicts with question fields
+    manual_feedback:   POST /manual-feedback/scan-create, ManualFeedbackModel objects
+
+Checks that all three return the same JSON and reports the median time per request and
+the response size as JSON. No database is used.
+
+Run from the backend directory:
+    python -m benchmarks.bench_serialisation
+    python -m benchmarks.bench_serialisation --rows 50000 --repeat 3
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--rows", type=int, default=10000, help="Rows per payload")
+parser.add_argument("--repeat", type=int, default=5, help="Requests per payload and variant")
+args = parser.parse_args()
+
+os.environ.setdefault("MYAPI_DATABASE__DSN", "sqlite://")
+
+from typing import List
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy.orm.attributes import set_committed_value
+from models.user import UserModel
+from models.scheme import SchemeModel
+from models.question import QuestionModel
+from models.attempt import AttemptModel
+from models.manual_feedback import ManualFeedbackModel
+from schemas.question import QuestionResponse
+from schemas.attempt import UserAttemptResponse
+from schemas.manual_feedback import ManualFeedbackScanResponse
+
+DETAILS = "I would like to appeal to withdraw from my Retirement account. " * 12
+IDEAL = "We refer to your appeal to withdraw a lump sum from your Retirement Account. " * 30
+
+
+def make_payloads(rows):
+    schemes = [SchemeModel(scheme_name=f"Scheme {i}", scheme_csa_img_path=None, scheme_admin_img_path=None, user_id=None) for i in range(4)]
+    start = datetime(2024, 1, 1)
+    questions = []
+    for i in range(rows):
+        question = QuestionModel(
+            question_id=f"question-{i}", question_difficulty="Medium", question_details=DETAILS, ideal=IDEAL,
+            title=f"Enquiry {i}", scheme_name=schemes[i % len(schemes)].scheme_name,
+            ideal_system_name="Member Portal", ideal_system_url="https://example.com/portal", created=start + timedelta(minutes=i)
+        )
+        # As loaded from the database: without adding the question to scheme.questions
+        set_committed_value(question, "scheme", schemes[i % len(schemes)])
+        questions.append(question.to_dict())
+    attempts = [
+        {
+            **AttemptModel(
+                attempt_id=f"attempt-{i}", user_id="user-0", question_id=f"question-{i // 3}",
+                answer="Please log in to the member portal to view your account summary.", date="2024-11-06 01:51",
+                system_name="Member Portal", system_url="https://example.com/portal",
+                precision_score=3, accuracy_score=4, tone_score=5,
+                accuracy_feedback="The response is mostly accurate.", precision_feedback="The response addresses the main points.",
+                tone_feedback="The tone is polite and professional.", feedback="The sources referenced are complete."
+            ).to_dict(),
+            "question_title": f"Enquiry {i // 3}",
+            "scheme_name": "Scheme 0",
+            "question_details": DETAILS,
+            "attemptCount": i % 3 + 1,
+        }
+        for i in range(rows)
+    ]
+    feedback = {
+        "message": f"{rows} feedback records created.",
+        "created_feedback": [
+            ManualFeedbackModel(
+                manual_feedback_id=f"feedback-{i}", user_id="user-0", question_id=f"question-{i // 3}",
+                attempt_id=f"attempt-{i}", feedback="Insert feedback"
+            )
+            for i in range(rows)
+        ],
+    }
+    return {
+        "questions": (questions, List[QuestionResponse]),
+        "attempts": (attempts, List[UserAttemptResponse]),
+        "manual_feedback": (feedback, ManualFeedbackScanResponse),
+    }
+
+def make_endpoint(payload):
+    # A closure, not a default argument, which FastAPI would treat as a query parameter
+    def endpoint():
+        return payload
+    return endpoint
+
+def make_app(payloads):
+    app = FastAPI()
+    for name, (payload, model) in payloads.items():
+        for variant, options in [
+            ("jsonable_encoder", {"response_class": JSONResponse}),
+            ("response_model", {"response_model": model, "response_class": JSONResponse}),
+            ("orjson", {"response_model": model, "response_class": ORJSONResponse}),
+        ]:
+            app.add_api_route(f"/{name}/{variant}", make_endpoint(payload), methods=["GET"], **options)
+    return app
+
+
+def main():
+    payloads = make_payloads(args.rows)
+    client = TestClient(make_app(payloads))
+
+    results = {}
+    mismatches = 0
+    for name in payloads:
+        results[name] = {}
+        baseline = None
+        for variant in ["jsonable_encoder", "response_model", "orjson"]:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                response = client.get(f"/{name}/{variant}")
+                timings.append(time.perf_counter() - start)
+            body = response.json()
+            if baseline is None:
+                baseline = body
+            elif body != baseline:
+                mismatches += 1
+            results[name][variant] = {
+                "median_ms": round(statistics.median(timings) * 1000, 1),
+                "bytes": len(response.content),
+            }
+
+    print(json.dumps({
+        "rows": args.rows,
+        "repeat": args.repeat,
+        "mismatches": mismatches,
+        "results": results,
+    }, indent=2))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Benchmark the source-name check used when grading.
+
+Compares the original nested fuzzywuzzy loop from openAI_response with
+ML.source_matcher.missing_source_names on realistic system name lists, and checks that both
+report the same missing names.
+
+The original loop needs fuzzywuzzy, which the app no longer uses; install it first:
+    pip install fuzzywuzzy==0.18.0 python-Levenshtein
+
+Run from the backend directory:
+    python -m benchmarks.bench_source_matcher
+"""
+import random
+import timeit
+from fuzzywuzzy import fuzz
+from ML.source_matcher import missing_source_names
+
+SYSTEM_NAMES = [
+    "CPF Website FAQ", "Member Portal", "my cpf digital services", "CRM Case Management",
+    "Retirement Account Calculator", "Housing Grant System", "MediSave Claims Portal",
+    "CareShield Life Portal", "Employer e-Submission", "SingPass Login Records",
+    "Payout Eligibility Tool", "HDB Flat Portal", "Lifelong Income Estimator",
+    "Nomination Records", "Internal Knowledge Base", "Contribution History Report",
+]
+
+
+def original_missing_names(trainee_names, ideal_names):
+    # The implementation previously nested inside openAI_response
+    similarity_threshold = 70
+    missing_names = []
+
+    for ideal_name_original in ideal_names:
+        ideal_name = ideal_name_original.lower()
+        found_match = False
+        for trainee_name_original in trainee_names:
+            trainee_name = trainee_name_original.lower()
+            similarity_score = fuzz.token_sort_ratio(trainee_name, ideal_name)
+            if similarity_score >= similarity_threshold:
+                found_match = True
+                break
+
+        if not found_match:
+            missing_names.append(ideal_name_original)
+
+    return missing_names
+
+
+def make_cases(n_questions=200, n_cases=2000, seed=0):
+    rng = random.Random(seed)
+    ideals = [", ".join(rng.sample(SYSTEM_NAMES, rng.randint(1, 6))) for _ in range(n_questions)]
+    cases = []
+    for _ in range(n_cases):
+        ideal = rng.choice(ideals)
+        trainee = [name.lower() if rng.random() < 0.3 else name for name in rng.sample(SYSTEM_NAMES, rng.randint(1, 6))]
+        cases.append((", ".join(trainee), ideal))
+    return cases
+
+
+def main():
+    cases = make_cases()
+
+    mismatches = sum(
+        set(original_missing_names(trainee.split(", "), ideal.split(", "))) != set(missing_source_names(trainee, ideal))
+        for trainee, ideal in cases
+    )
+    print(f"{len(cases)} cases, {mismatches} with different results")
+
+    def run_original():
+        for trainee, ideal in cases:
+            original_missing_names(trainee.split(", "), ideal.split(", "))
+
+    def run_matcher():
+        for trainee, ideal in cases:
+            missing_source_names(trainee, ideal)
+
+    for name, fn in (("original", run_original), ("source_matcher", run_matcher)):
+        best = min(timeit.repeat(fn, number=1, repeat=5))
+        print(f"{name:>15}: {best / len(cases) * 1e6:8.1f} us per check")
+
+
+if __name__ == "__main__":
+    main()
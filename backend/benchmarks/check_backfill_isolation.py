@@ -0,0 +1,127 @@
+"""Check that trainees can submit attempts while a bulk re-grade is running.
+
+Starts the app under uvicorn with a single worker (as in the Dockerfile) and the fake LLM
+backend, starts PUT /attempt/update_all, which re-grades every attempt on the backfill
+lane, and submits attempts as a trainee while the job runs. Exits non-zero if starting the
+job or any submission made during it is slower than --max-seconds, if the job finishes
+before the submissions do (the check proves nothing then), or if the job fails. Also exits
+non-zero if a backfill call estimated at more than the scheduler's token bucket leaves
+beside the backfill reserve is not admitted within --max-seconds.
+
+Run from the backend directory:
+    python -m benchmarks.check_backfill_isolation
+    python -m benchmarks.check_backfill_isolation --latency constant:0.5 --attempts-per-user 5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import httpx
+from mock_db.generate_dataset import generate_dataset
+from benchmarks.http_benchmark import ADMIN_EMAIL, PASSWORD, free_port, start_server
+from ML.scheduler import LLMScheduler, BACKFILL
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--users", type=int, default=20)
+parser.add_argument("--attempts-per-user", type=int, default=4, help="Attempts re-graded by the job")
+parser.add_argument("--submissions", type=int, default=5, help="Attempts submitted while the job runs")
+parser.add_argument("--latency", default="constant:0.2", help="Fake LLM latency distribution")
+parser.add_argument("--max-seconds", type=float, default=3, help="Slowest allowed submission")
+args = parser.parse_args()
+
+
+def wait_for_job(client, job_id, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.2)
+    return job
+
+
+def large_backfill_call_seconds(timeout):
+    # An estimate above capacity * (1 - reserve) on a full bucket; None if never admitted
+    scheduler = LLMScheduler(rpm=60, tpm=1000, backfill_reserve=0.2)
+    admitted = []
+
+    def acquire():
+        start = time.perf_counter()
+        scheduler.acquire(900, lane=BACKFILL)
+        admitted.append(time.perf_counter() - start)
+
+    thread = threading.Thread(target=acquire, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return admitted[0] if admitted else None
+
+
+def check():
+    large_call_seconds = large_backfill_call_seconds(args.max_seconds)
+
+    dsn = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'backfill.db')}"
+    dataset = generate_dataset(
+        dsn, users=args.users, schemes=1, questions=5, attempts_per_user=args.attempts_per_user,
+        admin_email=ADMIN_EMAIL, password=PASSWORD
+    )
+    trainee = dataset["trainees"][0]
+    question_ids = dataset["question_ids_by_scheme"][trainee["schemes"][0]]
+
+    port = free_port()
+    server = start_server(dsn, port, 1, args.latency)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        with httpx.Client(base_url=base_url, timeout=120) as admin, httpx.Client(base_url=base_url, timeout=120) as client:
+            for http, email in ((admin, ADMIN_EMAIL), (client, trainee["email"])):
+                token = http.post("/token", data={"username": email, "password": PASSWORD}).json()
+                http.headers["Authorization"] = f"Bearer {token['access_token']}"
+
+            start = time.perf_counter()
+            response = admin.put("/attempt/update_all")
+            start_seconds = time.perf_counter() - start
+            job_id = response.json()["job_id"]
+
+            latencies = []
+            codes = []
+            for i in range(args.submissions):
+                start = time.perf_counter()
+                response = client.post("/attempt", json={
+                    "user_id": trainee["uuid"], "question_id": question_ids[i % len(question_ids)],
+                    "answer": f"Log in to the member portal and check the account summary ({i}).",
+                    "system_name": "Member Portal", "system_url": "https://example.com/portal",
+                })
+                latencies.append(time.perf_counter() - start)
+                codes.append(response.status_code)
+            status_after_submissions = admin.get(f"/jobs/{job_id}").json()["status"]
+
+            job = wait_for_job(admin, job_id, timeout=600)
+    finally:
+        server.terminate()
+        server.wait()
+
+    slow = [latency for latency in latencies if latency > args.max_seconds]
+    failed = [code for code in codes if code != 201]
+    overlapped = status_after_submissions in ("queued", "running")
+    print(json.dumps({
+        "large_backfill_call_seconds": round(large_call_seconds, 3) if large_call_seconds is not None else None,
+        "attempts_regraded": dataset["counts"]["attempt"],
+        "latency": args.latency,
+        "start_job_seconds": round(start_seconds, 3),
+        "submission_seconds": [round(latency, 3) for latency in latencies],
+        "failed_submissions": len(failed),
+        "job_status_after_submissions": status_after_submissions,
+        "job": {key: job[key] for key in ("status", "processed", "result", "error")},
+    }, indent=2))
+
+    if not overlapped:
+        print("The job finished before the submissions; raise --attempts-per-user or the latency")
+    if large_call_seconds is None:
+        print(f"A large backfill call was not admitted within {args.max_seconds} s")
+    return 1 if large_call_seconds is None or slow or failed or start_seconds > args.max_seconds or not overlapped or job["status"] != "completed" else 0
+
+
+if __name__ == "__main__":
+    sys.exit(check())
@@ -0,0 +1,199 @@
+"""Check that deleting users, questions and schemes runs a fixed number of queries.
+
+Generates a small dataset (see mock_db/generate_dataset.py) into a fresh SQLite database
+and gives one trainee --attempts extra attempts (10k by default), each with manual
+feedback and grading timings, and an AI improvement per pair of attempts. Then deletes,
+through the app's test client:
+
+    a trainee with their few generated attempts, and the trainee with the extra attempts
+    a question with few attempts, and the question with the most attempts
+    a scheme
+
+Exits non-zero if a delete exceeds its query budget, if the heavy and light deletes of the
+same kind run a different number of queries, or if any row is left referencing a deleted
+user, question, scheme or attempt.
+
+Run from the backend directory:
+    python -m benchmarks.check_cascade_deletes
+    python -m benchmarks.check_cascade_deletes --attempts 50000
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--attempts", type=int, default=10000, help="Extra attempts of the heavy trainee")
+args = parser.parse_args()
+
+ADMIN_EMAIL = "admin@example.com"
+PASSWORD = "password"
+
+dsn = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'cascade.db')}"
+os.environ.update({
+    "MYAPI_DATABASE__DSN": dsn,
+    "LLM_BACKEND": "fake",
+    "FAKE_LLM_LATENCY": "constant:0",
+    "DEFAULT_ADMIN_EMAIL": ADMIN_EMAIL,
+    "DEFAULT_ADMIN_PASSWORD": PASSWORD,
+})
+os.environ.setdefault("SECRET_KEY", "cascade")
+os.environ.setdefault("OPENAI_KEY", "unused")
+
+from sqlalchemy import create_engine, func, select
+from mock_db.generate_dataset import generate_dataset, insert_chunks
+from models.user import UserModel
+from models.scheme import SchemeModel
+from models.question import QuestionModel
+from models.attempt import AttemptModel
+from models.attempt_timing import AttemptTimingModel
+from models.manual_feedback import ManualFeedbackModel
+from models.ai_improvements import AIImprovementsModel
+from models.user_scheme_stats import UserSchemeStatsModel
+from models.association_tables import user_scheme_association
+
+dataset = generate_dataset(dsn, users=40, schemes=4, questions=40, attempts_per_user=5, admin_email=ADMIN_EMAIL, password=PASSWORD)
+
+# Every delete of a kind must run the same number of queries, within its budget. Budgets are
+# the current counts; lower them when a delete is fixed
+DELETE_BUDGETS = {
+    "user": 12,
+    "question": 16,
+    "scheme": 11,
+}
+
+
+def add_attempts(engine, user_id, question_ids, count):
+    attempt_rows, feedback_rows, timing_rows, improvement_rows = [], [], [], []
+    start = datetime.datetime(2025, 1, 1)
+    for i in range(count):
+        attempt_id = str(uuid.uuid4())
+        question_id = question_ids[i % len(question_ids)]
+        attempt_rows.append({
+            "attempt_id": attempt_id, "user_id": user_id, "question_id": question_id,
+            "answer": "Please log in to the member portal to view your account summary.",
+            "date": (start + datetime.timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M'),
+            "system_name": "Member Portal", "system_url": "https://example.com/portal",
+            "precision_score": 3, "accuracy_score": 4, "tone_score": 5,
+            "accuracy_feedback": "The response is mostly accurate.",
+            "precision_feedback": "The response addresses the main points of the query.",
+            "tone_feedback": "The tone is polite and professional.",
+            "feedback": "The source(s) referenced by the trainee are complete.",
+        })
+        feedback_rows.append({
+            "manual_feedback_id": str(uuid.uuid4()), "user_id": user_id, "question_id": question_id,
+            "attempt_id": attempt_id, "feedback": "Insert feedback",
+        })
+        timing_rows.append({"attempt_id": attempt_id, "total_ms": 1000, "llm_calls": 3})
+        if i >= len(question_ids) and i % 2:
+            improvement_rows.append({
+                "ai_improvements_id": str(uuid.uuid4()), "user_id": user_id, "question_id": question_id,
+                "last_attempt_id": attempt_id, "previous_attempt_id": attempt_rows[i - len(question_ids)]["attempt_id"],
+                "updated": attempt_rows[i]["date"],
+                "accuracy_improvement": "The latest attempt is more accurate.",
+                "precision_improvement": "The latest attempt addresses more of the query.",
+                "tone_improvement": "The tone is consistently professional.",
+                "improvement_feedback": "Keep citing the relevant systems.",
+            })
+    with engine.begin() as conn:
+        for table, rows in [
+            (AttemptModel.__table__, attempt_rows),
+            (ManualFeedbackModel.__table__, feedback_rows),
+            (AttemptTimingModel.__table__, timing_rows),
+            (AIImprovementsModel.__table__, improvement_rows),
+        ]:
+            insert_chunks(conn, table, rows, 5000)
+
+def orphans(engine):
+    """Rows referencing a user, question, scheme or attempt that no longer exists."""
+
+    def missing(column, parent):
+        return select(func.count()).where(column.is_not(None), column.not_in(select(parent)))
+
+    checks = {
+        "attempt.user_id": missing(AttemptModel.user_id, UserModel.uuid),
+        "attempt.question_id": missing(AttemptModel.question_id, QuestionModel.question_id),
+        "question.scheme_name": missing(QuestionModel.scheme_name, SchemeModel.scheme_name),
+        "manual_feedback.attempt_id": missing(ManualFeedbackModel.attempt_id, AttemptModel.attempt_id),
+        "attempt_timing.attempt_id": missing(AttemptTimingModel.attempt_id, AttemptModel.attempt_id),
+        "ai_improvements.last_attempt_id": missing(AIImprovementsModel.last_attempt_id, AttemptModel.attempt_id),
+        "ai_improvements.previous_attempt_id": missing(AIImprovementsModel.previous_attempt_id, AttemptModel.attempt_id),
+        "user_scheme_association.user_table_id": missing(user_scheme_association.c.user_table_id, UserModel.uuid),
+        "user_scheme_association.scheme_table_name": missing(user_scheme_association.c.scheme_table_name, SchemeModel.scheme_name),
+        "user_scheme_stats.user_id": missing(UserSchemeStatsModel.user_id, UserModel.uuid),
+        "user_scheme_stats.scheme_name": missing(UserSchemeStatsModel.scheme_name, SchemeModel.scheme_name),
+        "scheme.user_id": missing(SchemeModel.user_id, UserModel.uuid),
+    }
+    with engine.connect() as conn:
+        return {name: count for name, statement in checks.items() if (count := conn.execute(statement).scalar())}
+
+def attempt_counts(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(select(AttemptModel.question_id, func.count()).group_by(AttemptModel.question_id)).all())
+
+
+def check():
+    light, heavy = dataset["trainees"][:2]
+    heavy_questions = [question_id for name in heavy["schemes"] for question_id in dataset["question_ids_by_scheme"][name]]
+
+    engine = create_engine(dsn)
+    add_attempts(engine, heavy["uuid"], heavy_questions, args.attempts)
+
+    # A question the heavy trainee has not attempted, and the one they attempted most
+    counts = attempt_counts(engine)
+    light_question = min((question_id for question_id in counts if question_id not in heavy_questions), key=counts.get)
+    heavy_question = max(heavy_questions, key=lambda question_id: counts.get(question_id, 0))
+    scheme_name = next(name for name in dataset["scheme_names"] if name not in heavy["schemes"])
+
+    from fastapi.testclient import TestClient
+    from session import query_budget, QueryBudgetExceeded
+    import main
+
+    client = TestClient(main.app)
+    token = client.post("/token", data={"username": ADMIN_EMAIL, "password": PASSWORD}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    deletes = [
+        ("question", f"/question/{light_question}", counts[light_question]),
+        ("question", f"/question/{heavy_question}", counts[heavy_question]),
+        ("user", f"/user/{light['uuid']}", None),
+        ("user", f"/user/{heavy['uuid']}", None),
+        ("scheme", f"/scheme/{scheme_name}", None),
+    ]
+
+    failures = 0
+    queries_by_kind = {}
+    for kind, url, attempts in deletes:
+        budget = DELETE_BUDGETS[kind]
+        start = time.perf_counter()
+        try:
+            with query_budget(budget) as stats:
+                response = client.delete(url, headers=headers)
+            result = "ok" if response.status_code < 300 else "FAILED"
+        except QueryBudgetExceeded as e:
+            result = f"OVER BUDGET: {e}"
+        elapsed = time.perf_counter() - start
+        failures += result != "ok"
+        queries_by_kind.setdefault(kind, set()).add(stats.queries)
+        note = f" ({attempts} attempts)" if attempts is not None else ""
+        print(f"{stats.queries:5d} / {budget:<5d} {elapsed * 1000:8.1f} ms DELETE {url}{note} [{response.status_code}] {result}")
+
+    for kind, queries in queries_by_kind.items():
+        if len(queries) > 1:
+            failures += 1
+            print(f"Deleting a {kind} ran {sorted(queries)} queries depending on its attempts")
+
+    left = orphans(engine)
+    for name, count in left.items():
+        failures += 1
+        print(f"{count} rows of {name} reference a deleted row")
+    engine.dispose()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(check())
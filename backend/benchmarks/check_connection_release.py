@@ -0,0 +1,132 @@
+"""Check that attempt grading does not hold pooled DB connections during LLM calls.
+
+Runs the app in-process against a fresh SQLite database with a deliberately small pool
+(no overflow, short checkout timeout) and the fake LLM backend, submits attempts through
+POST /attempt and batches of attempts through POST /attempts/batch from more concurrent
+clients than there are connections, and samples the pool while they run. Exits
+non-zero if any LLM call was made while its request held a connection, if any checkout
+timed out, or if any submission failed. With the connection released before grading the
+pool is only busy for the short reads and writes around each LLM call.
+
+Run from the backend directory:
+    python -m benchmarks.check_connection_release
+    python -m benchmarks.check_connection_release --concurrency 16 --pool-size 2 --latency constant:2
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--requests", type=int, default=48, help="Attempts to submit through /attempt")
+parser.add_argument("--batches", type=int, default=8, help="Batches to submit through /attempts/batch")
+parser.add_argument("--batch-size", type=int, default=4, help="Attempts per batch")
+parser.add_argument("--concurrency", type=int, default=12, help="Concurrent clients")
+parser.add_argument("--pool-size", type=int, default=2, help="Connections in the pool (no overflow)")
+parser.add_argument("--pool-timeout", type=float, default=2, help="Seconds to wait for a connection")
+parser.add_argument("--latency", default="constant:1", help="Fake LLM latency distribution")
+args = parser.parse_args()
+
+ADMIN_EMAIL = "admin@example.com"
+PASSWORD = "password"
+
+dsn = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'connections.db')}"
+os.environ.update({
+    "MYAPI_DATABASE__DSN": dsn,
+    "MYAPI_DATABASE__POOL_SIZE": str(args.pool_size),
+    "MYAPI_DATABASE__MAX_OVERFLOW": "0",
+    "MYAPI_DATABASE__POOL_TIMEOUT": str(args.pool_timeout),
+    "LLM_BACKEND": "fake",
+    "FAKE_LLM_LATENCY": args.latency,
+    "LLM_RPM": "1000000",
+    "LLM_TPM": "1000000000",
+    "DEFAULT_ADMIN_EMAIL": ADMIN_EMAIL,
+    "DEFAULT_ADMIN_PASSWORD": PASSWORD,
+})
+os.environ.setdefault("SECRET_KEY", "connections")
+os.environ.setdefault("OPENAI_KEY", "unused")
+
+from mock_db.generate_dataset import generate_dataset
+
+# Seeded before the app is imported, which adds the default admin on import
+dataset = generate_dataset(dsn, users=20, schemes=1, questions=5, attempts_per_user=0, admin_email=ADMIN_EMAIL, password=PASSWORD)
+
+from fastapi.testclient import TestClient
+import metrics
+from session import engine
+import main
+
+
+class PoolSampler(threading.Thread):
+    # Samples the number of checked out connections until stopped
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.samples.append(engine.pool.checkedout())
+            time.sleep(self.interval)
+
+
+def check():
+    question_ids = dataset["question_ids_by_scheme"][dataset["scheme_names"][0]]
+    client = TestClient(main.app, raise_server_exceptions=False)
+    token = client.post("/token", data={"username": ADMIN_EMAIL, "password": PASSWORD}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    def attempt(i):
+        return {
+            "user_id": token["uuid"], "question_id": question_ids[i % len(question_ids)],
+            "answer": f"Log in to the member portal and check the account summary ({i}).",
+            "system_name": "Member Portal", "system_url": "https://example.com/portal",
+        }
+
+    def submit(request):
+        if request[0] == "/attempt":
+            response = client.post("/attempt", headers=headers, json=attempt(request[1]))
+        else:
+            response = client.post("/attempts/batch", headers=headers, json={
+                "attempts": [attempt(request[1] * args.batch_size + i) for i in range(args.batch_size)]
+            })
+        return request[0], response.status_code
+
+    requests = [("/attempt", i) for i in range(args.requests)] + [("/attempts/batch", i) for i in range(args.batches)]
+    sampler = PoolSampler()
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        codes = list(executor.map(submit, requests))
+    elapsed = time.perf_counter() - start
+    sampler.stopped.set()
+    sampler.join()
+
+    holding = sum(metrics.get("llm_calls_holding_db_connection_total", lane=lane) for lane in ("interactive", "backfill"))
+    timeouts = metrics.get("db_pool_timeouts_total")
+    failed = {route: sum(1 for r, code in codes if r == route and code != 201) for route in ("/attempt", "/attempts/batch")}
+    print(json.dumps({
+        "requests": args.requests,
+        "batches": args.batches,
+        "batch_size": args.batch_size,
+        "concurrency": args.concurrency,
+        "pool_size": args.pool_size,
+        "latency": args.latency,
+        "seconds": round(elapsed, 2),
+        "failed_requests": failed,
+        "pool_timeouts": timeouts,
+        "llm_calls_holding_connection": holding,
+        "mean_checked_out": round(sum(sampler.samples) / max(len(sampler.samples), 1), 3),
+        "max_checked_out": max(sampler.samples, default=0),
+    }, indent=2))
+
+    return 1 if any(failed.values()) or timeouts or holding else 0
+
+
+if __name__ == "__main__":
+    sys.exit(check())
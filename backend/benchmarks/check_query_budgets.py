@@ -0,0 +1,82 @@
+"""Check the number of SQL queries per route against a query budget.
+
+Generates a small fixed dataset (see mock_db/generate_dataset.py) into a fresh SQLite
+database, calls each route below through the app's test client inside
+session.query_budget() and exits non-zero if any route exceeds its budget. Run it before
+merging changes to query-heavy handlers so N+1 regressions are caught early.
+
+Run from the backend directory:
+    python -m benchmarks.check_query_budgets
+    python -m benchmarks.check_query_budgets --measure   # print counts without failing
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--measure", action="store_true", help="Print the query counts without enforcing budgets")
+args = parser.parse_args()
+
+ADMIN_EMAIL = "admin@example.com"
+PASSWORD = "password"
+
+dsn = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'budgets.db')}"
+os.environ.update({
+    "MYAPI_DATABASE__DSN": dsn,
+    "LLM_BACKEND": "fake",
+    "FAKE_LLM_LATENCY": "constant:0",
+    "DEFAULT_ADMIN_EMAIL": ADMIN_EMAIL,
+    "DEFAULT_ADMIN_PASSWORD": PASSWORD,
+})
+os.environ.setdefault("SECRET_KEY", "budgets")
+os.environ.setdefault("OPENAI_KEY", "unused")
+
+from mock_db.generate_dataset import generate_dataset
+
+# Same shape as production, small enough that the check runs in seconds
+dataset = generate_dataset(dsn, users=100, schemes=3, questions=30, attempts_per_user=8, admin_email=ADMIN_EMAIL, password=PASSWORD)
+
+from fastapi.testclient import TestClient
+from session import query_budget, QueryBudgetExceeded
+import main
+
+trainee = dataset["trainees"][0]
+scheme_name = trainee["schemes"][0]
+question_id = dataset["question_ids_by_scheme"][scheme_name][0]
+
+# (method, url, budget). Budgets are the current counts; lower them when a route is fixed
+ROUTE_BUDGETS = [
+    ("GET", "/user", 2),
+    ("GET", f"/user/{trainee['uuid']}/schemes", 9),
+    ("GET", "/scheme", 12),
+    ("GET", "/questions/all", 3),
+    ("GET", f"/questions/scheme/{scheme_name}", 3),
+    ("GET", f"/table/{trainee['uuid']}/{scheme_name}", 4),
+    ("GET", f"/attempt/user/{trainee['uuid']}", 2),
+    ("GET", f"/attempt/average_scores/user/{trainee['uuid']}", 3),
+    ("GET", f"/ai-improvement/{question_id}/{trainee['uuid']}", 4),
+]
+
+
+def main_check():
+    client = TestClient(main.app)
+    token = client.post("/token", data={"username": ADMIN_EMAIL, "password": PASSWORD}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    failures = 0
+    for method, url, budget in ROUTE_BUDGETS:
+        try:
+            with query_budget(budget if not args.measure else sys.maxsize) as stats:
+                response = client.request(method, url, headers=headers)
+            result = "ok"
+        except QueryBudgetExceeded as e:
+            failures += 1
+            result = f"OVER BUDGET: {e}"
+        print(f"{stats.queries:5d} / {budget:<5d} {method} {url} [{response.status_code}] {result}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_check())
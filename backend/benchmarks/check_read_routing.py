@@ -0,0 +1,95 @@
+"""Check read replica routing and the read-your-writes window.
+
+Generates a dataset into a primary SQLite database and copies it to a second file that
+stands in for the read replica (nothing replicates between them, so the replica stays at
+the copy). A trainee then submits an attempt and reads their attempt history:
+
+    right after the submission the read must go to the primary and include the attempt;
+    once the read-your-writes window has passed it must go to the replica, which does not.
+
+Exits non-zero if either read comes from the wrong database. The same check works against
+a MySQL primary and replica by passing --dsn and --read-dsn (with replication stopped).
+
+Run from the backend directory:
+    python -m benchmarks.check_read_routing
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--dsn", help="Primary database (default: a fresh SQLite file)")
+parser.add_argument("--read-dsn", help="Replica database (default: a copy of the SQLite primary)")
+parser.add_argument("--window", type=float, default=1, help="Read-your-writes window in seconds")
+args = parser.parse_args()
+
+ADMIN_EMAIL = "admin@example.com"
+PASSWORD = "password"
+
+directory = tempfile.mkdtemp()
+dsn = args.dsn or f"sqlite:///{os.path.join(directory, 'primary.db')}"
+read_dsn = args.read_dsn or f"sqlite:///{os.path.join(directory, 'replica.db')}"
+os.environ.update({
+    "MYAPI_DATABASE__DSN": dsn,
+    "MYAPI_DATABASE__READ_DSN": read_dsn,
+    "MYAPI_DATABASE__READ_YOUR_WRITES_SECONDS": str(args.window),
+    "LLM_BACKEND": "fake",
+    "FAKE_LLM_LATENCY": "constant:0",
+    "DEFAULT_ADMIN_EMAIL": ADMIN_EMAIL,
+    "DEFAULT_ADMIN_PASSWORD": PASSWORD,
+})
+os.environ.setdefault("SECRET_KEY", "routing")
+os.environ.setdefault("OPENAI_KEY", "unused")
+
+from mock_db.generate_dataset import generate_dataset
+
+# Seeded before the app is imported, which adds the default admin on import
+dataset = generate_dataset(dsn, users=20, schemes=2, questions=10, attempts_per_user=3, admin_email=ADMIN_EMAIL, password=PASSWORD, reset=True)
+if not args.read_dsn:
+    shutil.copy(os.path.join(directory, "primary.db"), os.path.join(directory, "replica.db"))
+
+from fastapi.testclient import TestClient
+import main
+
+
+def check():
+    trainee = dataset["trainees"][0]
+    question_id = dataset["question_ids_by_scheme"][trainee["schemes"][0]][0]
+    client = TestClient(main.app)
+    token = client.post("/token", data={"username": trainee["email"], "password": PASSWORD}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    def attempt_count():
+        return len(client.get(f"/attempt/user/{trainee['uuid']}", headers=headers).json())
+
+    before = attempt_count()
+    response = client.post("/attempt", headers=headers, json={
+        "user_id": trainee["uuid"], "question_id": question_id,
+        "answer": "Log in to the member portal and check the account summary.",
+        "system_name": "Member Portal", "system_url": "https://example.com/portal",
+    })
+    if response.status_code != 201:
+        print(f"POST /attempt failed: {response.status_code} {response.text}")
+        return 1
+
+    after_write = attempt_count()
+    time.sleep(args.window + 0.1)
+    after_window = attempt_count()
+
+    failures = 0
+    for label, count, expected, source in [
+        ("within the window", after_write, before + 1, "primary"),
+        ("after the window", after_window, before, "replica"),
+    ]:
+        ok = count == expected
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL'}: {label}: {count} attempts, expected {expected} (read from the {source})")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(check())
@@ -0,0 +1,127 @@
+"""Check that concurrent writes keep the user_scheme_stats aggregates correct.
+
+Runs the app in-process with the fake LLM backend. Several clients submit attempts for the
+same trainee on the same scheme at once, while another client keeps rebuilding every
+aggregate through POST /attempt/average_scores/rebuild. Both paths refresh the same
+(user, scheme) rows. Exits non-zero if any request fails (e.g. on a duplicate key or a
+deadlock), or if the stored rows afterwards differ from the rows recomputed from the
+attempts.
+
+SQLite serialises writers by itself; the row locks matter on MySQL, so pass its DSN to
+check them there:
+    python -m benchmarks.check_stats_concurrency
+    python -m benchmarks.check_stats_concurrency --dsn mysql+pymysql://root:pw@localhost:3306/stats
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--dsn", help="Database (default: a fresh SQLite file)")
+parser.add_argument("--requests", type=int, default=40, help="Attempts to submit")
+parser.add_argument("--concurrency", type=int, default=8, help="Concurrent submitting clients")
+parser.add_argument("--latency", default="uniform:0,0.05", help="Fake LLM latency distribution")
+args = parser.parse_args()
+
+ADMIN_EMAIL = "admin@example.com"
+PASSWORD = "password"
+
+dsn = args.dsn or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stats.db')}"
+os.environ.update({
+    "MYAPI_DATABASE__DSN": dsn,
+    "LLM_BACKEND": "fake",
+    "FAKE_LLM_LATENCY": args.latency,
+    "LLM_RPM": "1000000",
+    "LLM_TPM": "1000000000",
+    "GRADING_MODE": "separate",
+    "DEFAULT_ADMIN_EMAIL": ADMIN_EMAIL,
+    "DEFAULT_ADMIN_PASSWORD": PASSWORD,
+})
+os.environ.setdefault("SECRET_KEY", "stats")
+os.environ.setdefault("OPENAI_KEY", "unused")
+
+from mock_db.generate_dataset import generate_dataset
+
+# Seeded before the app is imported, which adds the default admin on import
+dataset = generate_dataset(dsn, users=10, schemes=2, questions=10, attempts_per_user=3, admin_email=ADMIN_EMAIL, password=PASSWORD, reset=True)
+
+from fastapi.testclient import TestClient
+from session import SessionFactory
+from models.user_scheme_stats import UserSchemeStatsModel
+from scheme_stats import compute_stats
+import main
+
+
+def stored_and_expected():
+    db = SessionFactory()
+    try:
+        stored = {
+            (row.user_id, row.scheme_name): row.to_dict() for row in db.query(UserSchemeStatsModel)
+        }
+        expected = {(row["user_id"], row["scheme_name"]): row for row in compute_stats(db)}
+    finally:
+        db.close()
+
+    def values(row):
+        return {key: value for key, value in row.items() if key != "updated"}
+
+    return {
+        key: {"stored": values(stored[key]) if key in stored else None, "expected": values(expected[key]) if key in expected else None}
+        for key in stored.keys() | expected.keys()
+        if key not in stored or key not in expected or values(stored[key]) != values(expected[key])
+    }
+
+
+def check():
+    trainee = dataset["trainees"][0]
+    question_ids = dataset["question_ids_by_scheme"][trainee["schemes"][0]]
+    client = TestClient(main.app, raise_server_exceptions=False)
+    tokens = {
+        email: client.post("/token", data={"username": email, "password": PASSWORD}).json()["access_token"]
+        for email in (ADMIN_EMAIL, trainee["email"])
+    }
+
+    def submit(i):
+        return client.post("/attempt", headers={"Authorization": f"Bearer {tokens[trainee['email']]}"}, json={
+            "user_id": trainee["uuid"], "question_id": question_ids[i % len(question_ids)],
+            "answer": f"Log in to the member portal and check the account summary ({i}).",
+            "system_name": "Member Portal", "system_url": "https://example.com/portal",
+        }).status_code
+
+    rebuilds = []
+    stopped = threading.Event()
+
+    def rebuild():
+        while not stopped.is_set():
+            rebuilds.append(client.post(
+                "/attempt/average_scores/rebuild", headers={"Authorization": f"Bearer {tokens[ADMIN_EMAIL]}"}
+            ).status_code)
+
+    rebuilder = threading.Thread(target=rebuild, daemon=True)
+    rebuilder.start()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        codes = list(executor.map(submit, range(args.requests)))
+    stopped.set()
+    rebuilder.join()
+
+    failed_submissions = sum(1 for code in codes if code != 201)
+    failed_rebuilds = sum(1 for code in rebuilds if code != 200)
+    mismatches = stored_and_expected()
+    print(json.dumps({
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "rebuilds": len(rebuilds),
+        "failed_submissions": failed_submissions,
+        "failed_rebuilds": failed_rebuilds,
+        "mismatched_rows": [{"key": list(key), **rows} for key, rows in mismatches.items()],
+    }, indent=2, default=str))
+
+    return 1 if failed_submissions or failed_rebuilds or mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(check())
@@ -0,0 +1,240 @@
+"""End-to-end HTTP benchmark of the backend API.
+
+Seeds a realistic dataset (see mock_db/generate_dataset.py) into a fresh database (SQLite by default, or any DSN such as a
+local MySQL), starts the app under uvicorn with the fake LLM backend, and runs scripted
+trainee and trainer workloads against it over HTTP. Reports throughput and p50/p95/p99
+latency per route as JSON, tagged with the git commit so runs can be compared across
+commits.
+
+Run from the backend directory:
+    python -m benchmarks.http_benchmark
+    python -m benchmarks.http_benchmark --users 5000 --trainees 32 --trainers 4 --duration 120
+    python -m benchmarks.http_benchmark --dsn mysql+pymysql://root:pw@localhost:3306/bench --output results.json
+
+Trainee workload (per virtual user): log in once, then repeatedly view a scheme table,
+submit an attempt, view their history and their average scores.
+Trainer workload: log in once, then repeatedly list users, questions and schemes, and view
+a trainee's averages and AI improvements.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+import httpx
+from mock_db.generate_dataset import generate_dataset
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "benchmark"
+ADMIN_EMAIL = "admin@benchmark.local"
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, client, route, method, url, allow=(), **kwargs):
+        # ``allow`` lists error statuses that are expected answers (e.g. 404 for no data yet)
+        start = time.perf_counter()
+        try:
+            response = client.request(method, url, **kwargs)
+            ok = response.status_code < 400 or response.status_code in allow
+        except httpx.HTTPError:
+            response, ok = None, False
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            if ok:
+                self.latencies[route].append(elapsed)
+            else:
+                self.errors[route] += 1
+        return response
+
+
+def login(recorder, client, email):
+    response = recorder.request(client, "POST /token", "POST", "/token", data={"username": email, "password": PASSWORD})
+    if response is None or response.status_code != 200:
+        return None
+    token = response.json()
+    client.headers["Authorization"] = f"Bearer {token['access_token']}"
+    return token["uuid"]
+
+def trainee_workload(recorder, base_url, trainee, question_ids_by_scheme, deadline, rng):
+    with httpx.Client(base_url=base_url, timeout=120) as client:
+        user_id = login(recorder, client, trainee["email"])
+        if user_id is None:
+            return
+        while time.monotonic() < deadline:
+            scheme_name = rng.choice(trainee["schemes"])
+            recorder.request(client, "GET /table/{user_id}/{scheme_name}", "GET", f"/table/{user_id}/{scheme_name}")
+            recorder.request(client, "POST /attempt", "POST", "/attempt", json={
+                "user_id": user_id,
+                "question_id": rng.choice(question_ids_by_scheme[scheme_name]),
+                "answer": "Please log in to the member portal to view your account summary.",
+                "system_name": "Member Portal",
+                "system_url": "https://example.com/portal",
+            })
+            recorder.request(client, "GET /attempt/user/{user_id}", "GET", f"/attempt/user/{user_id}")
+            recorder.request(client, "GET /attempt/average_scores/user/{user_id}", "GET", f"/attempt/average_scores/user/{user_id}")
+
+def trainer_workload(recorder, base_url, trainees, question_ids_by_scheme, deadline, rng):
+    with httpx.Client(base_url=base_url, timeout=120) as client:
+        if login(recorder, client, ADMIN_EMAIL) is None:
+            return
+        while time.monotonic() < deadline:
+            trainee = rng.choice(trainees)
+            question_id = rng.choice(question_ids_by_scheme[rng.choice(trainee["schemes"])])
+            recorder.request(client, "GET /user", "GET", "/user")
+            recorder.request(client, "GET /questions/all", "GET", "/questions/all")
+            recorder.request(client, "GET /scheme", "GET", "/scheme")
+            recorder.request(client, "GET /attempt/average_scores/user/{user_id}", "GET", f"/attempt/average_scores/user/{trainee['uuid']}")
+            recorder.request(
+                client, "GET /ai-improvement/{question_id}/{user_id}", "GET",
+                f"/ai-improvement/{question_id}/{trainee['uuid']}", allow=(404,)
+            )
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(dsn, port, workers, latency):
+    env = dict(
+        os.environ,
+        MYAPI_DATABASE__DSN=dsn,
+        LLM_BACKEND="fake",
+        FAKE_LLM_LATENCY=latency,
+        LLM_RPM="1000000",
+        LLM_TPM="1000000000",
+        DEFAULT_ADMIN_EMAIL=ADMIN_EMAIL,
+        DEFAULT_ADMIN_PASSWORD=PASSWORD,
+        DEFAULT_ADMIN_NAME="Admin",
+        DEFAULT_ADMIN_ACCESS_RIGHTS="Admin",
+    )
+    env.setdefault("SECRET_KEY", "benchmark")
+    env.setdefault("OPENAI_KEY", "unused")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    # Loading the embedding model can take a while
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start within 300s")
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR, text=True).strip())
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def percentile(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p / 100))] * 1000, 1)
+
+def report(recorder, elapsed):
+    routes = {}
+    for route in sorted(set(recorder.latencies) | set(recorder.errors)):
+        latencies = recorder.latencies[route]
+        routes[route] = {
+            "count": len(latencies),
+            "errors": recorder.errors[route],
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": percentile(latencies, 50) if latencies else None,
+            "p95_ms": percentile(latencies, 95) if latencies else None,
+            "p99_ms": percentile(latencies, 99) if latencies else None,
+        }
+    total = sum(len(latencies) for latencies in recorder.latencies.values())
+    return {"total_requests": total, "total_rps": round(total / elapsed, 2), "routes": routes}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", help="Database to seed and benchmark (default: a fresh SQLite file)")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--schemes", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--attempts-per-user", type=int, default=5)
+    parser.add_argument("--trainees", type=int, default=16, help="Concurrent trainee virtual users")
+    parser.add_argument("--trainers", type=int, default=2, help="Concurrent trainer virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run the workloads")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--latency", default="lognormal:1.5,0.4", help="Fake LLM latency distribution")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    dsn = args.dsn or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark.db')}"
+    seed_start = time.perf_counter()
+    dataset = generate_dataset(
+        dsn, users=args.users, schemes=args.schemes, questions=args.questions,
+        attempts_per_user=args.attempts_per_user, admin_email=ADMIN_EMAIL, password=PASSWORD, seed=args.seed
+    )
+    seed_seconds = time.perf_counter() - seed_start
+    trainees = dataset["trainees"]
+    question_ids_by_scheme = dataset["question_ids_by_scheme"]
+
+    port = free_port()
+    server = start_server(dsn, port, args.workers, args.latency)
+    base_url = f"http://127.0.0.1:{port}"
+    recorder = Recorder()
+    try:
+        start = time.monotonic()
+        deadline = start + args.duration
+        rng = random.Random(args.seed)
+        threads = [
+            threading.Thread(target=trainee_workload, args=(
+                recorder, base_url, trainee, question_ids_by_scheme, deadline, random.Random(rng.random())
+            ))
+            for trainee in rng.sample(trainees, k=min(args.trainees, len(trainees)))
+        ] + [
+            threading.Thread(target=trainer_workload, args=(
+                recorder, base_url, trainees, question_ids_by_scheme, deadline, random.Random(rng.random())
+            ))
+            for _ in range(args.trainers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "config": {**vars(args), "dsn": dsn.split("://")[0]},
+        "seed_seconds": round(seed_seconds, 2),
+        "seconds": round(elapsed, 2),
+        **report(recorder, elapsed),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
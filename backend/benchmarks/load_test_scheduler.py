@@ -0,0 +1,156 @@
+"""Load test the LLM scheduler against a local fake OpenAI-compatible server.
+
+The fake server answers /v1/chat/completions with a valid grading result after a random
+delay and enforces its own requests-per-minute limit with 429 responses, like the real
+API. A backfill job floods the scheduler while trainees submit interactive grading calls
+at a steady rate. The script reports per-lane latency percentiles and 429s, with and
+without the scheduler.
+
+Run from the backend directory:
+    python -m benchmarks.load_test_scheduler
+    python -m benchmarks.load_test_scheduler --server-rpm 120 --backfill 200 --interactive 30
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_community.chat_models import ChatOpenAI
+from langchain_core.messages import HumanMessage, SystemMessage
+from ML.scheduler import LLMScheduler, estimate_tokens, is_rate_limit_error, INTERACTIVE, BACKFILL
+
+GRADING = json.dumps({
+    "Accuracy": 4, "Comprehension": 4, "Tone": 5,
+    "Accuracy Feedback": "ok", "Comprehension Feedback": "ok", "Tone Feedback": "ok", "Feedback": "ok",
+})
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    server_rpm = 60
+    latency = (0.2, 0.6)
+    lock = threading.Lock()
+    window = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+
+        now = time.monotonic()
+        with self.lock:
+            # Sliding one-minute window of accepted requests
+            while self.window and now - self.window[0] > 60:
+                self.window.pop(0)
+            limited = len(self.window) >= self.server_rpm
+            if not limited:
+                self.window.append(now)
+
+        if limited:
+            body = json.dumps({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}})
+            self.send_response(429)
+            self.send_header("retry-after", "1")
+        else:
+            time.sleep(random.uniform(*self.latency))
+            body = json.dumps({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": "gpt-4o",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": GRADING}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1500, "completion_tokens": 120, "total_tokens": 1620},
+            })
+            self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p / 100))], 3)
+
+def run(args, use_scheduler):
+    FakeLLMHandler.server_rpm = args.server_rpm
+    FakeLLMHandler.window = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    llm = ChatOpenAI(
+        openai_api_base=f"http://127.0.0.1:{server.server_port}/v1",
+        openai_api_key="fake",
+        model_name="gpt-4o",
+        max_retries=0
+    )
+    # Leave headroom below the server limit, as one would below the account limit
+    scheduler = LLMScheduler(rpm=int(args.server_rpm * 0.9), tpm=args.tpm, backoff_base=0.5, backoff_max=5)
+    messages = [SystemMessage(content="Grade the response. " * 200), HumanMessage(content="Question: ...")]
+    estimated = estimate_tokens("".join(m.content for m in messages))
+
+    latencies = {INTERACTIVE: [], BACKFILL: []}
+    errors = {INTERACTIVE: 0, BACKFILL: 0}
+    lock = threading.Lock()
+
+    def one_call(lane):
+        start = time.monotonic()
+        try:
+            if use_scheduler:
+                scheduler.call(lambda: llm.generate([messages]), estimated, lane=lane)
+            else:
+                llm.generate([messages])
+        except Exception as e:
+            if not is_rate_limit_error(e):
+                raise
+            with lock:
+                errors[lane] += 1
+            return
+        with lock:
+            latencies[lane].append(time.monotonic() - start)
+
+    threads = [threading.Thread(target=one_call, args=(BACKFILL,)) for _ in range(args.backfill)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    # Trainees keep submitting while the backfill is running
+    for _ in range(args.interactive):
+        time.sleep(args.interactive_interval)
+        thread = threading.Thread(target=one_call, args=(INTERACTIVE,))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+
+    return {
+        "scheduler": use_scheduler,
+        "seconds": round(time.monotonic() - start, 1),
+        **{
+            lane: {
+                "completed": len(latencies[lane]),
+                "rate_limited_failures": errors[lane],
+                "p50": percentile(latencies[lane], 50),
+                "p95": percentile(latencies[lane], 95),
+                "mean": round(statistics.mean(latencies[lane]), 3) if latencies[lane] else None,
+            }
+            for lane in (INTERACTIVE, BACKFILL)
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server-rpm", type=int, default=120, help="Requests per minute the fake server accepts")
+    parser.add_argument("--tpm", type=int, default=1_000_000, help="Tokens per minute given to the scheduler")
+    parser.add_argument("--backfill", type=int, default=150, help="Backfill calls submitted at once")
+    parser.add_argument("--interactive", type=int, default=20, help="Interactive calls submitted during the backfill")
+    parser.add_argument("--interactive-interval", type=float, default=0.5, help="Seconds between interactive calls")
+    parser.add_argument("--skip-baseline", action="store_true", help="Only run with the scheduler")
+    args = parser.parse_args()
+
+    runs = [] if args.skip_baseline else [run(args, use_scheduler=False)]
+    runs.append(run(args, use_scheduler=True))
+    print(json.dumps(runs, indent=2))
+
+
+if __name__ == "__main__":
+    main()
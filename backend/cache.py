@@ -0,0 +1,146 @@
+"""Caches for expensive or hot, read-mostly responses.
+
+Keys are tuples whose first element is a tag naming what the entry holds (e.g. the route);
+write routes drop the entries their changes affect with invalidate(*tags). Values must be
+JSON-serialisable.
+
+A cache lives in process memory (LRU with a TTL) unless CACHE_REDIS_URL is set and the
+redis package is installed. Entries are then shared by every worker, so an invalidation
+reaches all of them; with in-process caches another worker may serve its copy for up to
+the TTL after a write.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+import metrics
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("cache_requests_total", "Cache lookups, by cache and result (hit or miss).")
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries expire ``ttl`` seconds after they were set.
+
+    Entries are per process, so with several workers each keeps its own copy; use it only
+    for data where being up to ``ttl`` seconds stale is acceptable.
+    """
+
+    def __init__(self, name, ttl, max_entries=1024):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            value, expires = self._entries.get(key, (_MISSING, 0.0))
+            if value is not _MISSING:
+                if expires <= now:
+                    del self._entries[key]
+                    value = _MISSING
+                else:
+                    self._entries.move_to_end(key)
+        metrics.inc("cache_requests_total", cache=self.name, result="miss" if value is _MISSING else "hit")
+        return default if value is _MISSING else value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            # Drop the least recently used entries once the cache is full
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] in tags]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """The TTLCache interface on Redis, shared by every worker using the same server.
+
+    Redis errors are logged and treated as misses, so the routes fall back to the database.
+    """
+
+    def __init__(self, name, ttl, client):
+        self.name = name
+        self.ttl = ttl
+        self._client = client
+
+    def _key(self, key):
+        return f"cache:{self.name}:{key[0]}:{json.dumps(key[1:], default=str)}"
+
+    def get(self, key, default=None):
+        try:
+            value = self._client.get(self._key(key))
+        except redis.RedisError as e:
+            logger.warning(f"Cache {self.name} lookup failed: {e}")
+            value = None
+        metrics.inc("cache_requests_total", cache=self.name, result="miss" if value is None else "hit")
+        return default if value is None else json.loads(value)
+
+    def set(self, key, value):
+        try:
+            self._client.set(self._key(key), json.dumps(value, default=str), px=int(self.ttl * 1000))
+        except redis.RedisError as e:
+            logger.warning(f"Cache {self.name} update failed: {e}")
+
+    def _delete_matching(self, pattern):
+        try:
+            keys = list(self._client.scan_iter(match=pattern, count=500))
+            if keys:
+                self._client.delete(*keys)
+        except redis.RedisError as e:
+            # The entries stay until their TTL runs out
+            logger.error(f"Cache {self.name} invalidation failed: {e}")
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self._delete_matching(f"cache:{self.name}:{tag}:*")
+
+    def clear(self):
+        self._delete_matching(f"cache:{self.name}:*")
+
+
+# e.g. redis://localhost:6379/0; unset keeps every cache in process. The same client also
+# shares session.py's read-your-writes markers between workers.
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+redis_client = None
+if CACHE_REDIS_URL:
+    if redis is None:
+        logger.warning("CACHE_REDIS_URL is set but the redis package is not installed, caching in process")
+    else:
+        redis_client = redis.Redis.from_url(CACHE_REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+def make_cache(name, ttl, max_entries=1024):
+    if redis_client is not None:
+        return RedisCache(name, ttl, redis_client)
+    return TTLCache(name, ttl, max_entries)
+
+
+# Cohort analytics aggregate every member of a department, so results are reused briefly
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", 60))
+analytics_cache = make_cache("analytics", ANALYTICS_CACHE_TTL)
+
+# Scheme, question and system catalogues read by every trainee, invalidated by the admin
+# routes that edit them
+CATALOGUE_CACHE_TTL = float(os.getenv("CATALOGUE_CACHE_TTL", 300))
+catalogue_cache = make_cache("catalogue", CATALOGUE_CACHE_TTL)
@@ -0,0 +1,89 @@
+"""Set-based deletion of users, questions and schemes with every row that references them.
+
+Each function removes the dependent rows with one DELETE ... WHERE ... IN (subquery) per
+table, children before parents so foreign keys hold throughout, so it runs a fixed number
+of statements however many attempts are involved. They run in the caller's transaction;
+the caller commits, or rolls back to keep everything.
+
+The statements skip synchronising the session (a SELECT of every matched row), so objects
+of the deleted rows already loaded in the session are stale afterwards.
+"""
+from sqlalchemy import delete, distinct, or_, select, update
+from sqlalchemy.orm import Session
+from models.user import UserModel
+from models.scheme import SchemeModel
+from models.question import QuestionModel
+from models.attempt import AttemptModel
+from models.attempt_timing import AttemptTimingModel
+from models.manual_feedback import ManualFeedbackModel
+from models.ai_improvements import AIImprovementsModel
+from models.association_tables import user_scheme_association
+from scheme_stats import lock_stats, refresh_stats, delete_stats
+
+
+def _execute(db: Session, statement):
+    return db.execute(statement.execution_options(synchronize_session=False))
+
+def delete_attempts(db: Session, criterion):
+    """Delete the attempts matching ``criterion`` with their feedback, timings and AI improvements.
+
+    Returns:
+        The number of attempts deleted.
+    """
+
+    # MySQL cannot delete from a table it selects from, so attempts are matched directly
+    attempt_ids = select(AttemptModel.attempt_id).where(criterion)
+    _execute(db, delete(ManualFeedbackModel).where(ManualFeedbackModel.attempt_id.in_(attempt_ids)))
+    _execute(db, delete(AttemptTimingModel).where(AttemptTimingModel.attempt_id.in_(attempt_ids)))
+    _execute(db, delete(AIImprovementsModel).where(or_(
+        AIImprovementsModel.last_attempt_id.in_(attempt_ids),
+        AIImprovementsModel.previous_attempt_id.in_(attempt_ids)
+    )))
+    return _execute(db, delete(AttemptModel).where(criterion)).rowcount
+
+def delete_user_cascade(db: Session, user_id):
+    """Delete a user with their attempts, scheme memberships and score aggregates.
+
+    Returns:
+        The number of attempts deleted.
+    """
+
+    lock_stats(db, [user_id])
+    attempts = delete_attempts(db, AttemptModel.user_id == user_id)
+    _execute(db, delete(user_scheme_association).where(user_scheme_association.c.user_table_id == user_id))
+    _execute(db, update(SchemeModel).where(SchemeModel.user_id == user_id).values(user_id=None))
+    delete_stats(db, user_id=user_id)
+    _execute(db, delete(UserModel).where(UserModel.uuid == user_id))
+    return attempts
+
+def delete_question_cascade(db: Session, question_id):
+    """Delete a question with its attempts, and update the aggregates of the users who attempted it.
+
+    Returns:
+        The number of attempts deleted.
+    """
+
+    user_ids = db.execute(select(distinct(AttemptModel.user_id)).where(AttemptModel.question_id == question_id)).scalars().all()
+    lock_stats(db, user_ids)
+    scheme_name = db.execute(select(QuestionModel.scheme_name).where(QuestionModel.question_id == question_id)).scalar()
+
+    attempts = delete_attempts(db, AttemptModel.question_id == question_id)
+    _execute(db, delete(QuestionModel).where(QuestionModel.question_id == question_id))
+    if user_ids:
+        refresh_stats(db, user_ids=user_ids, scheme_names=[scheme_name])
+    return attempts
+
+def delete_scheme_cascade(db: Session, scheme_name):
+    """Delete a scheme with its questions, their attempts, its memberships and aggregates.
+
+    Returns:
+        The number of attempts deleted.
+    """
+
+    question_ids = select(QuestionModel.question_id).where(QuestionModel.scheme_name == scheme_name)
+    attempts = delete_attempts(db, AttemptModel.question_id.in_(question_ids))
+    _execute(db, delete(QuestionModel).where(QuestionModel.scheme_name == scheme_name))
+    _execute(db, delete(user_scheme_association).where(user_scheme_association.c.scheme_table_name == scheme_name))
+    delete_stats(db, scheme_name=scheme_name)
+    _execute(db, delete(SchemeModel).where(SchemeModel.scheme_name == scheme_name))
+    return attempts
@@ -0,0 +1,48 @@
+"""Background jobs for bulk LLM work such as re-grading every attempt.
+
+Bulk routes make one blocking LLM call after another on the BACKFILL lane, which waits
+in the scheduler whenever interactive calls are queued. Run on the event loop, that wait
+would stop every other request, including the interactive ones it yields to. A route
+instead creates a job and schedules run_job() as a BackgroundTask; Starlette runs it in
+its thread pool after the 202 response is sent. Jobs are stored in the database, so any
+worker can answer GET /jobs/{job_id}.
+"""
+import json
+import logging
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from models.job import JobModel
+from session import open_session
+
+
+def create_job(db: Session, kind, user_id=None):
+    """Add a queued job and commit it. Returns the job id."""
+
+    job = JobModel(kind=kind, created_by=user_id)
+    db.add(job)
+    db.commit()
+    return job.job_id
+
+def _update_job(job_id, **values):
+    with open_session() as db:
+        db.execute(update(JobModel).where(JobModel.job_id == job_id).values(**values))
+
+def report_progress(job_id, processed):
+    _update_job(job_id, processed=processed)
+
+def run_job(job_id, work, *args):
+    """Run ``work(job_id, *args)`` and store its JSON-serialisable result on the job.
+
+    ``work`` opens its own sessions, as the request's session is closed by the time the
+    job runs, and may call report_progress() as it goes.
+    """
+
+    _update_job(job_id, status="running")
+    try:
+        result = work(job_id, *args)
+    except Exception as e:
+        logging.exception(f"Job {job_id} failed")
+        _update_job(job_id, status="failed", error=str(e), finished=datetime.now())
+    else:
+        _update_job(job_id, status="completed", result=json.dumps(result, default=str), finished=datetime.now())
@@ -0,0 +1,116 @@
+"""Helpers for the cursor-paginated /list routes.
+
+Each route selects only the requested ``fields`` of its model, applies its filters and
+pages with a keyset cursor: rows are ordered by the sort column and the primary key, and
+the cursor holds both values of the last row returned, so every page is one indexed range
+query however deep the client pages. Rows whose (nullable) sort column is NULL come last
+whichever the direction, ordered by the primary key.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import DateTime, and_, or_
+
+MAX_LIMIT = 500
+
+
+def parse_fields(fields, allowed, default):
+    """Return the requested field names (comma separated), or ``default`` if none are given.
+
+    Raises:
+        HTTPException: A field is not in ``allowed``.
+    """
+
+    if not fields:
+        return list(default)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return requested
+
+def parse_sort(sort, allowed, default):
+    """Return (field, descending) for ``sort`` such as "name" or "-name".
+
+    Raises:
+        HTTPException: The field is not in ``allowed``.
+    """
+
+    sort = sort or default
+    field = sort.lstrip("-")
+    if field not in allowed:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {field}. Allowed: {', '.join(allowed)}")
+    return field, sort.startswith("-")
+
+def search(columns, q):
+    # Case-insensitive substring match on any of the columns; % and _ in q match themselves
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = f"%{escaped}%"
+    return or_(*[column.ilike(pattern, escape="\\") for column in columns])
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("wrong number of values")
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) and value is not None else value
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate(statement, sort_column, key_column, descending=False, cursor=None, limit=50):
+    """Order ``statement`` by (sort_column, key_column) and restrict it to the page after ``cursor``.
+
+    The statement must select both columns, labelled "sort_value" and "key_value". One row
+    more than ``limit`` is fetched to tell whether there is a next page, see page_items().
+
+    Raises:
+        HTTPException: Bad limit or cursor.
+    """
+
+    if not 1 <= limit <= MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_LIMIT}")
+
+    nullable = getattr(sort_column.expression, "nullable", False)
+    if cursor:
+        sort_value, key_value = decode_cursor(cursor, [sort_column, key_column])
+        after_key = key_column < key_value if descending else key_column > key_value
+        if sort_value is None:
+            # Past the non-NULL rows: only NULL rows after the key are left
+            after = and_(sort_column.is_(None), after_key)
+        else:
+            after_sort = sort_column < sort_value if descending else sort_column > sort_value
+            after = or_(after_sort, and_(sort_column == sort_value, after_key))
+            if nullable:
+                # Comparisons with NULL are never true, so add the NULL rows at the end
+                after = or_(after, sort_column.is_(None))
+        statement = statement.where(after)
+
+    order = [sort_column.desc(), key_column.desc()] if descending else [sort_column.asc(), key_column.asc()]
+    if nullable:
+        order.insert(0, sort_column.is_(None))
+    return statement.order_by(*order).limit(limit + 1)
+
+def page_items(rows, fields, limit):
+    """Return the response of a page: the requested fields of each row and the next cursor.
+
+    The items are in the order of ``rows``, so callers can zip them to add computed fields.
+    """
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].sort_value, rows[-1].key_value])
+    return {
+        "items": [{field: row._mapping[field] for field in fields} for row in rows],
+        "next_cursor": next_cursor,
+    }
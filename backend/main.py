@@ -2,9 +2,10 @@ import warnings
 warnings.filterwarnings("ignore", message=".*error reading bcrypt version.*")
 warnings.filterwarnings("ignore", category=FutureWarning, message=".*`clean_up_tokenization_spaces`.*")
 import logging
-from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Request, Form, Response, APIRouter
+from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Request, Form, Response, APIRouter, BackgroundTasks
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.user import UserModel
 from models.attempt import AttemptModel
 from models.scheme import SchemeModel
@@ -15,24 +16,40 @@ from models.association_tables import user_scheme_association
 from models.prompt import PromptModel
 from models.prompt_history import PromptHistoryModel
 from models.system import SystemModel
+from models.attempt_timing import AttemptTimingModel
+from models.user_scheme_stats import UserSchemeStatsModel
 from schemas.prompt import PromptBase
-from session import create_session, engine, open_session
-from schemas.attempt import AttemptCreate, AttemptResponse, AttemptBase
+from session import create_session, create_async_session, read_session, async_read_session, record_write, engine, open_session, report_queries, SQL_QUERY_DEBUG
+from schemas.attempt import AttemptCreate, AttemptBatchCreate, AttemptRegradeBatch, AttemptResponse, AttemptBase, UserAttemptResponse
 from schemas.user import UserBase, UserInput, UserResponseSchema
 from schemas.scheme import SchemeBase, SchemeInput
-from schemas.question import QuestionBase
-from schemas.manual_feedback import ManualFeedbackBase
+from schemas.question import QuestionBase, QuestionResponse
+from schemas.manual_feedback import ManualFeedbackBase, ManualFeedbackScanResponse
 from schemas.ai_improvements import AIImprovementsBase
 from schemas.table import TableBase
 from schemas.system import SystemCreate, SystemUpdate, System
 from schemas.compare_prompt import ComparePromptRequest
 from config import Base, config
-from sqlalchemy import func, distinct
+from sqlalchemy import func, distinct, select
 from fastapi.middleware.cors import CORSMiddleware
-from ML.openAI import process_response, openAI_response, get_default_prompt, update_vectorstore, DYNAMIC_CSV_PATH
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
+from ML.openAI import process_response, parse_grading, openAI_response, openAI_batch_response, get_default_prompt, validate_prompt, invalidate_prompt_cache, update_vectorstore, warm_up, DYNAMIC_CSV_PATH
 from ML.ai_analysis import analyse_improvements
+from ML.source_matcher import invalidate_catalogue
+from ML.batch_grading import submit_batch, fetch_batch_results
+from ML.scheduler import BACKFILL
+from scheme_stats import lock_stats, refresh_stats, delete_stats, rename_scheme_stats, cohort_stats_query, cohort_row_to_dict
+from jobs import create_job, run_job, report_progress
+from models.job import JobModel
+from cascade import delete_user_cascade, delete_question_cascade, delete_scheme_cascade
+from cache import analytics_cache, catalogue_cache
+from listing import parse_fields, parse_sort, search, paginate, page_items
+from table_versions import ensure_versions, table_etag, etag_matches
+import json
 import uuid
 import os
+import time
 from dotenv import load_dotenv
 from passlib.context import CryptContext
 from jose import JWTError, jwt
@@ -41,8 +58,10 @@ import boto3
 import pandas as pd
 from io import StringIO
 from models.token import Token  # Import the Token model
-from fastapi.responses import JSONResponse
-from typing import List
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
+from typing import AsyncIterator, Iterator, List
+import metrics
 
 # Import OAuth2PasswordBearer
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
@@ -51,7 +70,14 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# orjson is optional; it serialises large responses several times faster than the json module
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
+
+app = FastAPI(default_response_class=DefaultResponse)
 
 origins = ["https://admin.ccutrainingsimulator.com", "https://csa.ccutrainingsimulator.com", "https://trainer.ccutrainingsimulator.com", "http://localhost:3001", "http://localhost:3000", "http://localhost:3003"]
 
@@ -63,6 +89,59 @@ app.add_middleware(
     allow_headers=["Authorization"],
 )
 
+# Compress responses of at least COMPRESSION_MINIMUM_SIZE bytes: with brotli when brotli-asgi
+# is installed (gzip for clients that do not accept it), otherwise with gzip
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1000))
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
+metrics.describe_histogram("http_request_duration_seconds", "HTTP request duration, by method, route and status.")
+metrics.describe_histogram(
+    "http_request_db_queries", "Database queries per HTTP request, by method and route.",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+metrics.describe("http_requests_in_flight", "HTTP requests currently being handled.")
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    # Everything that runs for this request (e.g. DB queries) reports into these stats
+    stats = metrics.RequestStats()
+    token = metrics.request_stats.set(stats)
+    metrics.add("http_requests_in_flight", 1)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        if SQL_QUERY_DEBUG:
+            response.headers["X-Query-Count"] = str(stats.queries)
+        return response
+    finally:
+        # Label by route template rather than path so ids don't create new series
+        route = request.scope.get("route")
+        labels = {"method": request.method, "route": route.path if route else "unmatched"}
+        metrics.observe("http_request_duration_seconds", time.perf_counter() - start, status=str(status_code), **labels)
+        metrics.observe("http_request_db_queries", stats.queries, **labels)
+        report_queries(stats, labels["route"])
+        metrics.add("http_requests_in_flight", -1)
+        metrics.request_stats.reset(token)
+
+@app.middleware("http")
+async def track_writes(request: Request, call_next):
+    # Routes the user's reads to the primary for a while after a successful write, see
+    # session.reads_from_primary()
+    response = await call_next(request)
+    authorization = request.headers.get("Authorization", "")
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400 and authorization.startswith("Bearer "):
+        try:
+            record_write(get_token_user_id(authorization[len("Bearer "):]))
+        except HTTPException:
+            pass
+    return response
+
 # AWS S3 configuration
 BUCKET_NAME = os.getenv("AWS_BUCKET_NAME")
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
@@ -79,6 +158,10 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 90
 
+# "separate" grades an attempt and analyses improvement in two LLM calls,
+# "combined" does both in the grading call
+GRADING_MODE = os.getenv("GRADING_MODE", "separate")
+
 # OAuth2 configuration
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -95,15 +178,22 @@ def create_access_token(data: dict):
 
 # Verify password
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    with metrics.span("bcrypt"):
+        return pwd_context.verify(plain_password, hashed_password)
+
+# Hash password
+def get_password_hash(password):
+    with metrics.span("bcrypt"):
+        return pwd_context.hash(password)
 
 # Get current user
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(create_session)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def get_token_user_id(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -111,11 +201,49 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
+    return user_id
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(create_session)):
+    user_id = get_token_user_id(token)
     user = db.query(UserModel).filter(UserModel.uuid == user_id).first()
     if user is None:
         raise credentials_exception
     return user
 
+# Sessions for the read-only dashboard routes, on the read replica unless the user wrote recently
+def get_read_session(token: str = Depends(oauth2_scheme)) -> Iterator[Session]:
+    with read_session(get_token_user_id(token)) as session:
+        yield session
+
+async def get_async_read_session(token: str = Depends(oauth2_scheme)) -> AsyncIterator[AsyncSession]:
+    async with async_read_session(get_token_user_id(token)) as session:
+        yield session
+
+# Conditional GET for routes that only read VERSIONED_TABLES: returns the 304 response when
+# the client's If-None-Match still matches, else sets the ETag on the route's response
+def not_modified(request: Request, response: Response, db: Session, table_names, *extra):
+    etag = table_etag(db, table_names, *extra)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# Drop the cached catalogue responses a content edit changes, after it is committed
+def invalidate_scheme_cache():
+    catalogue_cache.invalidate("public_scheme", "distinct_scheme", "questions_scheme")
+
+def invalidate_question_cache():
+    catalogue_cache.invalidate("public_scheme", "questions_scheme")
+
+# For handlers on the async session, so authentication does not block the event loop either
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(create_async_session)):
+    user_id = get_token_user_id(token)
+    user = (await db.execute(select(UserModel).where(UserModel.uuid == user_id))).scalars().first()
+    if user is None:
+        raise credentials_exception
+    return user
+
 # Login route to get JWT token
 @app.post("/token", response_model=Token)
 async def login_for_access_token(db: Session = Depends(create_session), form_data: OAuth2PasswordRequestForm = Depends()):
@@ -211,6 +339,7 @@ async def upload_questions_csv(
         db.add(new_question)
 
     db.commit()
+    invalidate_scheme_cache()
 
     return {"message": "CSV data has been successfully uploaded and processed."}
 
@@ -218,6 +347,10 @@ async def upload_questions_csv(
 async def redirect_to_docs():
     return RedirectResponse(url="/docs")
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Updated /default-systems endpoint
 @app.get("/default-systems", status_code=200)
 async def get_default_systems(current_user: UserModel = Depends(get_current_user)):
@@ -240,7 +373,7 @@ def add_default_user(db: Session = Depends(create_session)):
     with open_session() as db:
         db_user = db.query(UserModel).filter(UserModel.email == default_email).first()
         if not db_user:
-            hashed_password = pwd_context.hash(default_password)
+            hashed_password = get_password_hash(default_password)
             default_user = UserModel(
                 email=default_email,
                 hashed_password=hashed_password,
@@ -255,6 +388,26 @@ def add_default_user(db: Session = Depends(create_session)):
 
 add_default_user()
 
+# Version counters for the ETags of the read routes
+with open_session() as db:
+    ensure_versions(db)
+    db.commit()
+
+# Fill the score aggregates of a database whose attempts predate the user_scheme_stats table
+try:
+    with open_session() as db:
+        lock_stats(db)
+        if db.query(UserSchemeStatsModel).first() is None and db.query(AttemptModel).first() is not None:
+            logging.info(f"Built {refresh_stats(db)} user scheme stats rows")
+except Exception as e:
+    logging.warning(f"Building user scheme stats failed, run python -m scheme_stats: {e}")
+
+# Build the LLM clients and load the prompt and retriever before the first grading request
+try:
+    warm_up()
+except Exception as e:
+    logging.warning(f"Grading warm-up failed: {e}")
+
 ### USER ROUTES ###
 
 @app.get("/user/me", response_model=UserResponseSchema, status_code=status.HTTP_200_OK)
@@ -285,7 +438,7 @@ async def get_current_user_details(
 
 @app.get("/user", status_code=status.HTTP_201_CREATED)
 async def get_all_users(
-    db: Session = Depends(create_session),
+    db: Session = Depends(get_read_session),
     current_user: UserModel = Depends(get_current_user)
 ):
     users = db.query(UserModel).options(joinedload(UserModel.scheme)).all()
@@ -345,7 +498,7 @@ async def update_user(
     db_user.dept=user.dept
     
     if user.password:  
-        db_user.hashed_password = pwd_context.hash(user.password)
+        db_user.hashed_password = get_password_hash(user.password)
 
     db.commit()
     db.refresh(db_user)
@@ -368,56 +521,14 @@ async def delete_user(
 
     try:
         logging.info(f"Starting deletion for user: {user_id}")
+        attempts = delete_user_cascade(db, user_id)
+        db.commit()
 
-        # Fetch all attempts made by the user
-        user_attempts = db.query(AttemptModel).filter(AttemptModel.user_id == user_id).all()
-
-        # If no attempts, delete the user immediately
-        if not user_attempts:
-            logging.info(f"No attempts found for user {user_id}. Deleting user immediately.")
-            # Remove user from all schemes
-            db.query(user_scheme_association).filter(
-                user_scheme_association.c.user_table_id == user_id
-            ).delete(synchronize_session=False)
-            logging.info(f"Removed user {user_id} from all schemes")
-
-            # Delete the user
-            db.delete(db_user)
-            db.commit()
+        if not attempts:
             logging.info(f"User {user_id} deleted successfully without any associated attempts")
-
             return JSONResponse(content={'message': 'User without attempts deleted'}, status_code=201)
 
-        # Delete related manual feedback and AI improvements
-        for attempt in user_attempts:
-            # Delete manual feedback associated with the attempt
-            db.query(ManualFeedbackModel).filter(
-                ManualFeedbackModel.attempt_id == attempt.attempt_id
-            ).delete(synchronize_session=False)
-            logging.info(f"Deleted manual feedbacks for attempt {attempt.attempt_id}")
-
-            # Delete AI improvement records associated with the question and user
-            db.query(AIImprovementsModel).filter(
-                AIImprovementsModel.question_id == attempt.question_id,
-                AIImprovementsModel.user_id == user_id
-            ).delete(synchronize_session=False)
-            logging.info(f"Deleted AI improvements for attempt {attempt.attempt_id}")
-
-            # Delete the attempt
-            logging.info(f"Deleting attempt: {attempt.attempt_id}")
-            db.delete(attempt)
-
-        # Remove user from all schemes
-        db.query(user_scheme_association).filter(
-            user_scheme_association.c.user_table_id == user_id
-        ).delete(synchronize_session=False)
-        logging.info(f"Removed user {user_id} from all schemes")
-
-        # Finally, delete the user
-        db.delete(db_user)
-        db.commit()
-        logging.info(f"User {user_id} and associated data deleted successfully")
-
+        logging.info(f"User {user_id} and {attempts} attempts with their associated data deleted successfully")
         return JSONResponse(content={'message': 'User and associated data deleted'}, status_code=201)
 
     except Exception as e:
@@ -440,7 +551,7 @@ async def create_user(
     if user.access_rights.lower() == "admin" and current_user.access_rights.lower()  != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only admins can create other admins")
 
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = get_password_hash(user.password)
     db_user = UserModel(
         email=user.email,
         hashed_password=hashed_password,
@@ -583,6 +694,7 @@ async def add_new_scheme(
         )
         db.add(new_scheme)
         db.commit()
+        invalidate_scheme_cache()
 
         return {
             "message": "Scheme added successfully",
@@ -612,6 +724,7 @@ def add_new_scheme_sync(scheme_name: str, file_url: str, db: Session, current_us
         )
         db.add(new_scheme)
         db.commit()
+        invalidate_scheme_cache()
         return {
             "message": "Scheme added successfully",
             "filename": file_url.split('/')[-1],
@@ -660,17 +773,30 @@ async def get_distinct_scheme_names(
     db: Session = Depends(create_session), 
     current_user: UserModel = Depends(get_current_user)
 ):
+    # Keyed by the table versions, so a scheme written through another worker is not
+    # served from this worker's copy
+    key = ("distinct_scheme", table_etag(db, ["scheme"]))
+    scheme_name_list = catalogue_cache.get(key)
+    if scheme_name_list is not None:
+        return scheme_name_list
+
     schemes = db.query(distinct(SchemeModel.scheme_name)).all()
     if not schemes:
         raise HTTPException(status_code=404, detail="No scheme names found")
     scheme_name_list = [scheme_name[0] for scheme_name in schemes]
+    catalogue_cache.set(key, scheme_name_list)
     return scheme_name_list
 
 @app.get("/scheme", status_code=status.HTTP_201_CREATED)
 async def get_all_schemes(
+    request: Request,
+    response: Response,
     db: Session = Depends(create_session), 
     current_user: UserModel = Depends(get_current_user)
 ):
+    cached = not_modified(request, response, db, ["scheme", "question", "user_scheme_association"])
+    if cached:
+        return cached
     db_schemes = db.query(distinct(SchemeModel.scheme_name)).all()
     if not db_schemes:
         return []
@@ -695,6 +821,12 @@ public_router = APIRouter(
 async def get_public_schemes(
     db: Session = Depends(create_session)
 ):
+    # Keyed by the table versions, see get_distinct_scheme_names()
+    key = ("public_scheme", table_etag(db, ["scheme", "question"]))
+    scheme_list = catalogue_cache.get(key)
+    if scheme_list is not None:
+        return scheme_list
+
     db_schemes = db.query(SchemeModel).all()  # Fetch all schemes
     if not db_schemes:
         return []
@@ -713,6 +845,7 @@ async def get_public_schemes(
         }
         scheme_list.append(scheme_dict)
     
+    catalogue_cache.set(key, scheme_list)
     return scheme_list
 
 # Include the public_router
@@ -728,16 +861,11 @@ async def delete_scheme(
     if not db_scheme:
         raise HTTPException(status_code=404, detail="Scheme not found")
     
-    # Delete related attempts and questions
-    db.query(AttemptModel).filter(AttemptModel.question_id.in_(
-        db.query(QuestionModel.question_id).filter(QuestionModel.scheme_name == scheme_name)
-    )).delete(synchronize_session=False)
-
-    db.query(QuestionModel).filter(QuestionModel.scheme_name == scheme_name).delete(synchronize_session=False)
-    
-    # Delete scheme itself
-    db.delete(db_scheme)
+    # Delete its questions and their attempts, feedback and AI improvements, then the scheme
+    attempts = delete_scheme_cascade(db, scheme_name)
     db.commit()
+    logging.info(f"Deleted scheme {scheme_name} with {attempts} attempts")
+    invalidate_scheme_cache()
 
     return JSONResponse(content={"message": f"Scheme '{scheme_name}' deleted successfully along with related questions and attempts."}, status_code=200)
 
@@ -785,16 +913,20 @@ async def update_scheme_name(
         db.query(QuestionModel).filter(QuestionModel.scheme_name == old_scheme_name).update(
             {"scheme_name": new_scheme_name}
         )
+        rename_scheme_stats(db, old_scheme_name, new_scheme_name)
         db.commit()
 
         # Delete the old scheme
         db.query(SchemeModel).filter(SchemeModel.scheme_name == old_scheme_name).delete()
         db.commit()
+        invalidate_scheme_cache()
 
         return {"message": f"Scheme name updated successfully from '{old_scheme_name}' to '{new_scheme_name}'."}
     
     except Exception as e:
         db.rollback()
+        # The steps before the failure are committed
+        invalidate_scheme_cache()
         print(f"Error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error updating scheme name: {str(e)}")
     
@@ -836,6 +968,7 @@ async def revert_scheme_name(
         db.query(QuestionModel).filter(QuestionModel.scheme_name == current_scheme_name).update(
             {"scheme_name": original_scheme_name}
         )
+        rename_scheme_stats(db, current_scheme_name, original_scheme_name)
 
         # Commit the changes to the `question` table
         db.commit()
@@ -843,11 +976,14 @@ async def revert_scheme_name(
         # Finally, delete the current scheme
         db.query(SchemeModel).filter(SchemeModel.scheme_name == current_scheme_name).delete()
         db.commit()
+        invalidate_scheme_cache()
 
         return {"message": f"Scheme name reverted successfully from '{current_scheme_name}' to '{original_scheme_name}'."}
     
     except Exception as e:
         db.rollback()
+        # The steps before the failure are committed
+        invalidate_scheme_cache()
         print(f"Error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error reverting scheme name: {str(e)}")
 
@@ -855,15 +991,28 @@ async def revert_scheme_name(
 @app.get("/questions/scheme/{scheme_name}", status_code=status.HTTP_201_CREATED)
 async def get_questions_by_scheme_name(
     scheme_name: str, 
+    request: Request,
+    response: Response,
     db: Session = Depends(create_session), 
     current_user: UserModel = Depends(get_current_user)
 ):
+    cached = not_modified(request, response, db, ["question"])
+    if cached:
+        return cached
+    # Keyed by the ETag too, so a worker never pairs a stale cached body with a new ETag
+    key = ("questions_scheme", scheme_name, response.headers["ETag"])
+    questions = catalogue_cache.get(key)
+    if questions is not None:
+        return questions
+
     db_question = db.query(QuestionModel).filter(QuestionModel.scheme_name == scheme_name)\
                 .order_by(QuestionModel.created.asc()).all()
                 
     if not db_question:
         raise HTTPException(status_code=404, detail="No questions found for the given scheme")
-    return db_question
+    questions = jsonable_encoder(db_question)
+    catalogue_cache.set(key, questions)
+    return questions
 
 @app.get("/question/{question_id}", status_code=status.HTTP_201_CREATED)
 async def get_questions_by_question_id(
@@ -891,30 +1040,12 @@ async def delete_question(
         raise HTTPException(status_code=404, detail="Question not found")
 
     try:
-        # Find all attempts associated with the question
-        user_attempts = db.query(AttemptModel).filter(AttemptModel.question_id == question_id).all()
-
-        for attempt in user_attempts:
-            # Delete manual feedback associated with the attempt
-            db.query(ManualFeedbackModel).filter(
-                ManualFeedbackModel.attempt_id == attempt.attempt_id
-            ).delete(synchronize_session=False)
-            logging.info(f"Deleted manual feedbacks for attempt: {attempt.attempt_id}")
-
-            # Delete AI improvements associated with the attempt
-            db.query(AIImprovementsModel).filter(
-                AIImprovementsModel.question_id == attempt.question_id
-            ).delete(synchronize_session=False)
-            logging.info(f"Deleted AI improvements for attempt: {attempt.attempt_id}")
-
-            # Delete the attempt itself
-            logging.info(f"Deleting attempt: {attempt.attempt_id}")
-            db.delete(attempt)
-
-        # Delete the question itself
-        logging.info(f"Deleting question: {question_id}")
-        db.delete(db_question)
+        # A new transaction, so the refreshed stats include attempts committed since the lookup
+        db.commit()
+        attempts = delete_question_cascade(db, question_id)
         db.commit()
+        logging.info(f"Deleted question {question_id} with {attempts} attempts")
+        invalidate_question_cache()
 
         return JSONResponse(content={"message": "Question and all associated data deleted successfully."}, status_code=201)
     
@@ -923,12 +1054,12 @@ async def delete_question(
         logging.error(f"Failed to delete question {question_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Unable to delete question. {e}")
 
-@app.get("/questions/all", status_code=status.HTTP_201_CREATED)
+@app.get("/questions/all", response_model=List[QuestionResponse], status_code=status.HTTP_201_CREATED)
 async def get_all_questions(
-    db: Session = Depends(create_session), 
+    db: Session = Depends(get_read_session), 
     current_user: UserModel = Depends(get_current_user)
 ):
-    db_questions = db.query(QuestionModel).order_by(QuestionModel.created.asc()).all()
+    db_questions = db.query(QuestionModel).options(selectinload(QuestionModel.scheme)).order_by(QuestionModel.created.asc()).all()
     return [question.to_dict() for question in db_questions]
 
 @app.post("/question", status_code=status.HTTP_201_CREATED)
@@ -944,7 +1075,8 @@ async def add_question_to_scheme(
             raise HTTPException(status_code=404, detail="Question is already in the database")
         db_question = QuestionModel(**question.dict())
         db.add(db_question)
-        db.commit()    
+        db.commit()
+        invalidate_question_cache()
         return db_question.question_id
     else:
         raise HTTPException(status_code=404, detail="Scheme not found")
@@ -972,6 +1104,7 @@ async def update_question(
     # Commit the changes to the database
     db.commit()
     db.refresh(db_question)
+    invalidate_question_cache()
 
     return {"message": "Question updated successfully", "question_id": question_id, "updated_question": db_question}
     
@@ -980,24 +1113,38 @@ async def update_question(
 async def get_table_details_of_user_for_scheme(
     scheme_name: str, 
     user_id: str, 
-    db: Session = Depends(create_session), 
-    current_user: UserModel = Depends(get_current_user)
+    db: AsyncSession = Depends(create_async_session), 
+    current_user: UserModel = Depends(get_current_user_async)
 ):
     question_list = []
-    db_questions = db.query(QuestionModel).filter(QuestionModel.scheme_name == scheme_name).order_by(QuestionModel.created.asc()).all()
+    db_questions = (await db.execute(
+        select(QuestionModel)
+        .options(selectinload(QuestionModel.scheme))  # to_dict() includes the scheme
+        .where(QuestionModel.scheme_name == scheme_name)
+        .order_by(QuestionModel.created.asc())
+    )).scalars().all()
     
     if not db_questions:
         raise HTTPException(status_code=404, detail="No questions found for the given scheme")
 
+    # Latest attempt of the user for each question of the scheme, in one query
+    latest_attempts = {}
+    for question_id, attempt_id in await db.execute(
+        select(AttemptModel.question_id, AttemptModel.attempt_id)
+        .join(QuestionModel, QuestionModel.question_id == AttemptModel.question_id)
+        .where(AttemptModel.user_id == user_id, QuestionModel.scheme_name == scheme_name)
+        .order_by(AttemptModel.date.asc())
+    ):
+        latest_attempts[question_id] = attempt_id
+
     for db_question in db_questions:
         question_dict = db_question.to_dict()
-        db_attempt = db.query(AttemptModel).filter(AttemptModel.user_id == user_id).filter(AttemptModel.question_id == db_question.question_id).order_by(AttemptModel.date.desc()).first()
+        db_attempt = latest_attempts.get(db_question.question_id)
   
         if db_attempt is None:
             db_attempt = ""
             status = 'uncompleted'
         else:
-            db_attempt = db_attempt.to_dict()['attempt_id']
             status = 'completed'
             
         question_dict.update({"status": status, "attempt": db_attempt})
@@ -1028,13 +1175,18 @@ async def read_attempt(
         attempt_dict['scheme_name'] = str(scheme_name[0])
     return attempt_dict
 
-@app.get("/attempt/user/{user_id}", status_code=status.HTTP_200_OK)
+@app.get("/attempt/user/{user_id}", response_model=List[UserAttemptResponse], status_code=status.HTTP_200_OK)
 async def get_user_attempts(
     user_id: str, 
-    db: Session = Depends(create_session), 
-    current_user: UserModel = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_session), 
+    current_user: UserModel = Depends(get_current_user_async)
 ):
-    db_attempts = db.query(AttemptModel).filter(AttemptModel.user_id == user_id).order_by(AttemptModel.date.asc()).all()
+    db_attempts = (await db.execute(
+        select(AttemptModel, QuestionModel.title, QuestionModel.scheme_name, QuestionModel.question_details)
+        .join(QuestionModel, QuestionModel.question_id == AttemptModel.question_id)
+        .where(AttemptModel.user_id == user_id)
+        .order_by(AttemptModel.date.asc())
+    )).all()
     
     if not db_attempts:
         raise HTTPException(status_code=404, detail="Attempts not found")
@@ -1043,26 +1195,21 @@ async def get_user_attempts(
     attempts_by_question = {}
 
     # Group attempts by question_id
-    for db_attempt in db_attempts:
-        question_id = db_attempt.question_id
+    for row in db_attempts:
+        question_id = row.AttemptModel.question_id
         if question_id not in attempts_by_question:
             attempts_by_question[question_id] = []
-        attempts_by_question[question_id].append(db_attempt)
+        attempts_by_question[question_id].append(row)
 
     attempts_list = []
 
     # Assign attempt count based on the order of date for each question
     for question_id, attempt_list in attempts_by_question.items():
         # Sort by date for each question
-        sorted_attempts = sorted(attempt_list, key=lambda x: x.date)
+        sorted_attempts = sorted(attempt_list, key=lambda x: x.AttemptModel.date)
 
         # Iterate through sorted attempts and assign an attempt count
-        for idx, db_attempt in enumerate(sorted_attempts):
-            db_question = db.query(QuestionModel).filter(QuestionModel.question_id == db_attempt.question_id).first()
-            question_title = db_question.title
-            scheme_name = db_question.scheme_name
-            question_details = db_question.question_details
-
+        for idx, (db_attempt, question_title, scheme_name, question_details) in enumerate(sorted_attempts):
             # Convert attempt to dictionary and update it with additional fields
             attempt_dict = db_attempt.to_dict()
             attempt_dict.update({
@@ -1093,26 +1240,51 @@ async def create_attempt(
         raise HTTPException(status_code=404, detail="Question does not exist")
     
     logging.info("Question details retrieved successfully")
-    
-    response = openAI_response(
+
+    # In combined mode the improvement analysis against the user's latest attempt
+    # is returned by the grading call itself
+    previous_attempt = None
+    if GRADING_MODE == "combined":
+        previous_attempt = db.query(AttemptModel).filter(
+            AttemptModel.question_id == inputs['question_id'],
+            AttemptModel.user_id == current_user.uuid
+        ).order_by(AttemptModel.date.desc()).first()
+
+    # End the read transaction so the connection goes back to the pool while grading;
+    # the loaded objects stay usable as the session does not expire them on commit
+    db.commit()
+
+    # Grade in a worker thread so the event loop keeps serving other requests
+    timings = {}
+    response = await run_in_threadpool(
+        openAI_response,
         question=db_question.question_details, 
         response=inputs['answer'],
         ideal=db_question.ideal,
         ideal_system_name=db_question.ideal_system_name,
         ideal_system_url=db_question.ideal_system_url,
         system_name=inputs['system_name'],
-        system_url=inputs['system_url']
+        system_url=inputs['system_url'],
+        previous_attempt=previous_attempt.to_dict() if previous_attempt else None,
+        timings=timings
     )
     
     logging.info("Response from openAI_response obtained")
     
-    response_data = process_response(response)
+    response_data = process_response(response, combined=previous_attempt is not None)
+    improvement_feedback = response_data.pop('improvement_feedback', None)
     inputs.update(response_data)
     
-    db_attempt = AttemptModel(**inputs)
+    # Serialise with other writes to the user's stats before inserting the attempt
+    lock_stats(db, [inputs['user_id']])
+    db_attempt = AttemptModel(attempt_id=str(uuid.uuid4()), **inputs)
     db.add(db_attempt)
+    db.add(AttemptTimingModel(attempt_id=db_attempt.attempt_id, **timings))
+    db.flush()
+    refresh_stats(db, user_ids=[inputs['user_id']], scheme_names=[db_question.scheme_name])
     db.commit()
     logging.info("Attempt created successfully")
+    logging.info(f"Grading timings: {timings}")
 
     await create_manual_feedback( 
         user_id=current_user.uuid, 
@@ -1121,6 +1293,19 @@ async def create_attempt(
         db=db
     )
 
+    if GRADING_MODE == "combined":
+        if previous_attempt is None or improvement_feedback is None:
+            return {"attempt_id": db_attempt.attempt_id, "ai_improvement_id": None}
+        ai_improvement = save_ai_improvement(
+            db=db,
+            question_id=inputs['question_id'],
+            user_id=current_user.uuid,
+            last_attempt=db_attempt,
+            previous_attempt=previous_attempt,
+            improvement_feedback=improvement_feedback
+        )
+        return {"attempt_id": db_attempt.attempt_id, "ai_improvement_id": ai_improvement.ai_improvements_id}
+
     # Fetch all previous attempts related to the question, excluding the current one
     previous_attempts = db.query(AttemptModel).filter(
         AttemptModel.question_id == inputs['question_id'],
@@ -1156,29 +1341,103 @@ async def create_attempt(
             logging.warning("Skipping AI improvement update due to not enough attempts.")
             return {"attempt_id": db_attempt.attempt_id, "ai_improvement_id": None}
         return {"attempt_id": db_attempt.attempt_id, "ai_improvement_id": ai_improvement.ai_improvements_id}
-    
-@app.put("/attempt/update_all", status_code=status.HTTP_200_OK)
-async def update_all_attempts(
-    db: Session = Depends(create_session), 
+
+@app.post("/attempts/batch", status_code=status.HTTP_201_CREATED)
+async def create_attempts_batch(
+    schema: AttemptBatchCreate,
+    db: Session = Depends(create_session),
     current_user: UserModel = Depends(get_current_user)
 ):
-    logging.info("Starting update_all_attempts function")
+    """
+    Grades many attempts at once (e.g. a cohort's answers to one question) and stores
+    them, with their manual feedback records, in a single transaction. Attempts whose
+    grading call failed are not stored; their attempt_ids entries are None and their
+    positions in the batch are returned as failed.
+    """
+    if current_user.access_rights.lower() != "admin" and current_user.access_rights.lower() != "trainer":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+    if not schema.attempts:
+        raise HTTPException(status_code=400, detail="No attempts given")
+
+    records = [attempt.dict() for attempt in schema.attempts]
+    user_ids = {record['user_id'] for record in records}
+    question_ids = {record['question_id'] for record in records}
+
+    found_users = {user_id for (user_id,) in db.query(UserModel.uuid).filter(UserModel.uuid.in_(user_ids))}
+    if found_users != user_ids:
+        raise HTTPException(status_code=404, detail=f"Users not found: {', '.join(sorted(user_ids - found_users))}")
+    db_questions = {
+        question.question_id: question
+        for question in db.query(QuestionModel).filter(QuestionModel.question_id.in_(question_ids))
+    }
+    if db_questions.keys() != question_ids:
+        raise HTTPException(status_code=404, detail=f"Questions not found: {', '.join(sorted(question_ids - db_questions.keys()))}")
+
+    gradings = [
+        {
+            "question": db_questions[record['question_id']].question_details,
+            "response": record['answer'],
+            "ideal": db_questions[record['question_id']].ideal,
+            "ideal_system_name": db_questions[record['question_id']].ideal_system_name,
+            "ideal_system_url": db_questions[record['question_id']].ideal_system_url,
+            "system_name": record['system_name'],
+            "system_url": record['system_url'],
+        }
+        for record in records
+    ]
+    # End the read transaction so the connection goes back to the pool while grading;
+    # the loaded questions stay usable as the session does not expire them on commit
+    db.commit()
 
-    # Fetch all attempts
-    db_attempts = db.query(AttemptModel).all()
-    if not db_attempts:
-        raise HTTPException(status_code=404, detail="No attempts found")
+    logging.info(f"Grading batch of {len(gradings)} attempts for {len(question_ids)} question(s)")
+    results = await run_in_threadpool(openAI_batch_response, gradings)
+
+    failed = [index for index, (response, timings) in enumerate(results) if response is None]
+    if len(failed) == len(records):
+        raise HTTPException(status_code=502, detail="Grading failed for every attempt in the batch")
+
+    db_rows = []
+    attempt_ids = []
+    for record, (response, timings) in zip(records, results):
+        if response is None:
+            attempt_ids.append(None)
+            continue
+        record.update(process_response(response))
+        attempt_id = str(uuid.uuid4())
+        attempt_ids.append(attempt_id)
+        db_rows.append(AttemptModel(attempt_id=attempt_id, **record))
+        db_rows.append(ManualFeedbackModel(
+            user_id=record['user_id'],
+            question_id=record['question_id'],
+            attempt_id=attempt_id,
+            feedback="Insert feedback"
+        ))
+        db_rows.append(AttemptTimingModel(attempt_id=attempt_id, **timings))
+
+    lock_stats(db, user_ids)
+    db.add_all(db_rows)
+    db.flush()
+    refresh_stats(db, user_ids=user_ids, scheme_names={question.scheme_name for question in db_questions.values()})
+    db.commit()
+    logging.info(f"Batch of {len(attempt_ids) - len(failed)} attempts created successfully, {len(failed)} failed")
 
-    # Iterate over each attempt and update with new AI response
-    for db_attempt in db_attempts:
-        try:
-            # Fetch the corresponding question details
-            db_question = db.query(QuestionModel).filter(QuestionModel.question_id == db_attempt.question_id).first()
-            if not db_question:
-                logging.warning(f"Question with ID {db_attempt.question_id} not found. Skipping attempt ID {db_attempt.attempt_id}.")
-                continue
+    return {"attempt_ids": attempt_ids, "failed": failed}
+    
+def regrade_all_attempts(job_id):
+    """Re-grade every attempt on the BACKFILL lane; run as a background job.
+
+    No connection is held during the LLM calls. Attempts whose grading still fails
+    validation keep their current grade and are returned as failed_attempt_ids.
+    """
+    with open_session() as db:
+        rows = db.query(AttemptModel, QuestionModel).join(
+            QuestionModel, QuestionModel.question_id == AttemptModel.question_id
+        ).all()
 
-            # Get the new AI response
+    updated = 0
+    failed = []
+    for processed, (db_attempt, db_question) in enumerate(rows, start=1):
+        try:
             response = openAI_response(
                 question=db_question.question_details, 
                 response=db_attempt.answer,  # using the existing answer in the attempt
@@ -1186,60 +1445,171 @@ async def update_all_attempts(
                 ideal_system_name=db_question.ideal_system_name,
                 ideal_system_url=db_question.ideal_system_url,
                 system_name=db_attempt.system_name,
-                system_url=db_attempt.system_url
+                system_url=db_attempt.system_url,
+                lane=BACKFILL
             )
+            response_data = parse_grading(response)
+            if response_data is None:
+                failed.append(db_attempt.attempt_id)
+                continue
 
-            # Process the response and update the attempt
-            response_data = process_response(response)
-            for key, value in response_data.items():
-                setattr(db_attempt, key, value)
-
-            db.commit()
+            with open_session() as db:
+                db.query(AttemptModel).filter(AttemptModel.attempt_id == db_attempt.attempt_id).update(
+                    response_data, synchronize_session=False
+                )
+            updated += 1
             logging.info(f"Successfully updated attempt ID {db_attempt.attempt_id}")
 
         except Exception as e:
             logging.error(f"Error updating attempt ID {db_attempt.attempt_id}: {str(e)}")
-            db.rollback()  # Rollback the session if any exception occurs
+            failed.append(db_attempt.attempt_id)
+        finally:
+            if processed % 50 == 0:
+                report_progress(job_id, processed)
 
-    return {"message": "All attempts have been updated with the new AI response"}
+    with open_session() as db:
+        lock_stats(db)
+        refresh_stats(db)
+    report_progress(job_id, len(rows))
 
-@app.get("/attempt/average_scores/user/{user_id}", status_code=200)
-async def get_user_average_scores(
-    user_id: str, 
+    return {"updated": updated, "failed": len(failed), "failed_attempt_ids": failed}
+
+@app.put("/attempt/update_all", status_code=status.HTTP_202_ACCEPTED)
+async def update_all_attempts(
+    background_tasks: BackgroundTasks,
     db: Session = Depends(create_session), 
     current_user: UserModel = Depends(get_current_user)
 ):
-    # Subquery to find the attempts with the maximum sum of scores for each question
-    attempts_with_max_sum_scores_subquery = (
-        db.query(
-            QuestionModel.scheme_name,
-            AttemptModel.question_id,
-            func.max(AttemptModel.precision_score + AttemptModel.accuracy_score + AttemptModel.tone_score).label("max_sum_scores")
-        )
-        .join(AttemptModel, AttemptModel.question_id == QuestionModel.question_id)
-        .filter(AttemptModel.user_id == user_id)  # Filter attempts by user_id
-        .group_by(QuestionModel.scheme_name, AttemptModel.question_id)
-        .subquery()
+    """
+    Starts a re-grade of every attempt in the background. Poll GET /jobs/{job_id} for its
+    progress and result.
+    """
+    logging.info("Starting update_all_attempts job")
+
+    if not db.query(AttemptModel.attempt_id).first():
+        raise HTTPException(status_code=404, detail="No attempts found")
+
+    job_id = create_job(db, "update_all_attempts", current_user.uuid)
+    background_tasks.add_task(run_job, job_id, regrade_all_attempts)
+
+    return {"message": "Re-grading of all attempts started", "job_id": job_id}
+
+@app.get("/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_job(
+    job_id: str,
+    db: Session = Depends(create_session), 
+    current_user: UserModel = Depends(get_current_user)
+):
+    job = db.query(JobModel).filter(JobModel.job_id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job = job.to_dict()
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+@app.post("/attempt/update_all/batch", status_code=status.HTTP_202_ACCEPTED)
+async def submit_update_all_batch(
+    schema: AttemptRegradeBatch = AttemptRegradeBatch(),
+    db: Session = Depends(create_session), 
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Submits a re-grade of every attempt, or of the given attempt_ids (e.g. those that failed
+    in an earlier batch), to the asynchronous batch endpoint. Large re-grades are split over
+    several batches; ingest each with POST /attempt/update_all/batch/{batch_id} once it has
+    completed.
+    """
+    if current_user.access_rights.lower() != "admin" and current_user.access_rights.lower() != "trainer":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+
+    query = db.query(AttemptModel, QuestionModel).join(
+        QuestionModel, QuestionModel.question_id == AttemptModel.question_id
     )
+    if schema.attempt_ids is not None:
+        query = query.filter(AttemptModel.attempt_id.in_(schema.attempt_ids))
+    rows = query.all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="No attempts found")
 
-    # Query to get the average scores based on the attempts with the maximum sum of scores for each question and scheme
-    avg_scores_query = (
-        db.query(
-            QuestionModel.scheme_name,
-            func.avg(AttemptModel.precision_score).label("precision_score_avg"),
-            func.avg(AttemptModel.accuracy_score).label("accuracy_score_avg"),
-            func.avg(AttemptModel.tone_score).label("tone_score_avg")
-        )
-        .join(AttemptModel, AttemptModel.question_id == QuestionModel.question_id)
-        .filter(
-            QuestionModel.scheme_name == attempts_with_max_sum_scores_subquery.c.scheme_name,
-            AttemptModel.question_id == attempts_with_max_sum_scores_subquery.c.question_id,
-            AttemptModel.precision_score + AttemptModel.accuracy_score + AttemptModel.tone_score == attempts_with_max_sum_scores_subquery.c.max_sum_scores,
-            AttemptModel.user_id == user_id  # Filter attempts by user_id
+    gradings = [
+        (db_attempt.attempt_id, {
+            "question": db_question.question_details,
+            "response": db_attempt.answer,
+            "ideal": db_question.ideal,
+            "ideal_system_name": db_question.ideal_system_name,
+            "ideal_system_url": db_question.ideal_system_url,
+            "system_name": db_attempt.system_name,
+            "system_url": db_attempt.system_url,
+        })
+        for db_attempt, db_question in rows
+    ]
+    # Release the connection while the batch files are built and uploaded
+    db.commit()
+    batch_ids = await run_in_threadpool(submit_batch, gradings)
+    logging.info(f"Submitted re-grading batches {', '.join(batch_ids)} with {len(gradings)} attempts")
+
+    return {"batch_ids": batch_ids, "count": len(gradings)}
+
+@app.post("/attempt/update_all/batch/{batch_id}", status_code=status.HTTP_200_OK)
+async def ingest_update_all_batch(
+    batch_id: str,
+    db: Session = Depends(create_session), 
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Stores the gradings of a completed re-grading batch. Attempts whose result failed or did
+    not validate keep their current grade and are returned under failed_attempt_ids, to be
+    resubmitted with POST /attempt/update_all/batch.
+    """
+    if current_user.access_rights.lower() != "admin" and current_user.access_rights.lower() != "trainer":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+
+    batch_status, results, failed = await run_in_threadpool(fetch_batch_results, batch_id)
+    if results is None:
+        return JSONResponse(content={"batch_id": batch_id, "status": batch_status}, status_code=202)
+
+    # Start a new transaction that locks every user's stats before reading the attempts
+    db.commit()
+    lock_stats(db)
+
+    # Attempts deleted since the batch was submitted are skipped
+    existing = {
+        attempt_id for (attempt_id,) in
+        db.query(AttemptModel.attempt_id).filter(AttemptModel.attempt_id.in_([*results.keys(), *failed]))
+    }
+    db.bulk_update_mappings(AttemptModel, [
+        {"attempt_id": attempt_id, **response_data}
+        for attempt_id, response_data in results.items() if attempt_id in existing
+    ])
+    refresh_stats(db)
+    db.commit()
+
+    updated = len(existing & results.keys())
+    failed = sorted(attempt_id for attempt_id in failed if attempt_id in existing)
+    logging.info(f"Ingested re-grading batch {batch_id}: {updated} attempts updated, {len(failed)} failed")
+    if failed:
+        logging.warning(f"Re-grading batch {batch_id} has {len(failed)} failed results; resubmit failed_attempt_ids")
+
+    return {"batch_id": batch_id, "status": batch_status, "updated": updated, "failed": len(failed), "failed_attempt_ids": failed}
+
+@app.get("/attempt/average_scores/user/{user_id}", status_code=200)
+async def get_user_average_scores(
+    user_id: str, 
+    db: AsyncSession = Depends(get_async_read_session), 
+    current_user: UserModel = Depends(get_current_user_async)
+):
+    # Best-attempt averages per scheme, kept up to date by scheme_stats.refresh_stats()
+    avg_scores_query = (await db.execute(
+        select(
+            UserSchemeStatsModel.scheme_name,
+            UserSchemeStatsModel.precision_score_avg,
+            UserSchemeStatsModel.accuracy_score_avg,
+            UserSchemeStatsModel.tone_score_avg
         )
-        .group_by(QuestionModel.scheme_name)
-        .all()
-    )
+        .where(UserSchemeStatsModel.user_id == user_id)
+        .order_by(UserSchemeStatsModel.scheme_name)
+    )).all()
 
     scheme_average_scores = []
     total_precision_score_avg = 0
@@ -1274,13 +1644,12 @@ async def get_user_average_scores(
     })
     
     # Add schemes with no attempts
-    distinct_schemes = (
-        db.query(SchemeModel.scheme_name)
+    distinct_schemes = (await db.execute(
+        select(SchemeModel.scheme_name)
         .join(user_scheme_association, user_scheme_association.c.scheme_table_name == SchemeModel.scheme_name)
         .filter(user_scheme_association.c.user_table_id == user_id)
         .distinct()
-        .all()
-    )
+    )).all()
     for scheme in distinct_schemes:
         scheme_name = scheme[0]
         if scheme_name not in [s["scheme_name"] for s in scheme_average_scores]:
@@ -1293,12 +1662,76 @@ async def get_user_average_scores(
 
     return scheme_average_scores
 
+@app.post("/attempt/average_scores/rebuild", status_code=status.HTTP_200_OK)
+async def rebuild_average_scores(
+    db: Session = Depends(create_session),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Recomputes every user's per-scheme score aggregates from their attempts.
+    """
+    if current_user.access_rights.lower() != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+
+    # Start a new transaction that locks every user's stats before reading the attempts
+    db.commit()
+    lock_stats(db)
+    count = refresh_stats(db)
+    db.commit()
+    logging.info(f"Rebuilt {count} user scheme stats rows")
+
+    return {"rows": count}
+
+## ANALYTICS ROUTES ##
+@app.get("/analytics/cohort", status_code=status.HTTP_200_OK)
+async def get_cohort_analytics(
+    dept: str = None,
+    scheme_name: str = None,
+    limit: int = 50,
+    offset: int = 0,
+    db: AsyncSession = Depends(get_async_read_session),
+    current_user: UserModel = Depends(get_current_user_async)
+):
+    """
+    Score distributions, percentiles and completion rates of every (department, scheme)
+    cohort, optionally filtered to one department or scheme. Results are cached for
+    ANALYTICS_CACHE_TTL seconds.
+    """
+    if current_user.access_rights.lower() != "admin" and current_user.access_rights.lower() != "trainer":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
+    if not 1 <= limit <= 500 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500 and offset at least 0")
+
+    key = ("cohort", dept, scheme_name, limit, offset)
+    result = analytics_cache.get(key)
+    if result is not None:
+        return result
+
+    query = cohort_stats_query(dept=dept, scheme_name=scheme_name)
+    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar_one()
+    rows = (await db.execute(query.limit(limit).offset(offset))).all()
+
+    result = {
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "cohorts": [cohort_row_to_dict(row) for row in rows],
+    }
+    analytics_cache.set(key, result)
+    return result
+
 # Fetch the latest attempt and compare old feedback with new feedback after processing the new prompt
 @app.post("/attempt/compare-latest-feedback", status_code=status.HTTP_200_OK)
 async def compare_latest_feedback(
     request: ComparePromptRequest,  # Use the Pydantic model to parse the request body
     db: Session = Depends(create_session)
 ):
+    # Reject prompts that would break the cacheable prefix/suffix layout
+    try:
+        validate_prompt(request.prompt_text)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid prompt: {e}")
+
     logging.info("Fetching the latest attempt from the database")
 
     # Step 1: Fetch the latest attempt across the entire database
@@ -1327,8 +1760,11 @@ async def compare_latest_feedback(
 
     logging.info(f"Found question: {question.title}")
 
-    # Step 4: Use the same answer and re-run it with the new prompt to get new feedback
-    new_response = openAI_response(
+    # Step 4: Use the same answer and re-run it with the new prompt to get new feedback,
+    # without holding the connection while the LLM runs
+    db.commit()
+    new_response = await run_in_threadpool(
+        openAI_response,
         question=question.question_details,
         response=latest_attempt.answer,  # The same answer from the latest attempt
         ideal=question.ideal,
@@ -1402,7 +1838,7 @@ async def create_manual_feedback(
 
     return manual_feedback
 
-@app.post("/manual-feedback/scan-create", status_code=status.HTTP_201_CREATED)
+@app.post("/manual-feedback/scan-create", response_model=ManualFeedbackScanResponse, status_code=status.HTTP_201_CREATED)
 async def scan_and_create_feedback(
     db: Session = Depends(create_session),
     current_user: UserModel = Depends(get_current_user)
@@ -1479,6 +1915,34 @@ async def get_feedback(
     }
 
 ## AI IMPROVEMENT ROUTES ##
+def save_ai_improvement(db: Session, question_id: str, user_id: str, last_attempt: AttemptModel, previous_attempt: AttemptModel, improvement_feedback: str):
+    """
+    Create or update the user's AI improvement record for a question from feedback that has
+    already been generated.
+    """
+    ai_improvement_record = db.query(AIImprovementsModel).filter(
+        AIImprovementsModel.question_id == question_id,
+        AIImprovementsModel.user_id == user_id
+    ).first()
+
+    if not ai_improvement_record:
+        ai_improvement_record = AIImprovementsModel(question_id=question_id, user_id=user_id)
+        db.add(ai_improvement_record)
+
+    ai_improvement_record.last_attempt_id = last_attempt.attempt_id
+    ai_improvement_record.previous_attempt_id = previous_attempt.attempt_id
+    ai_improvement_record.accuracy_improvement = last_attempt.accuracy_score - previous_attempt.accuracy_score
+    ai_improvement_record.precision_improvement = last_attempt.precision_score - previous_attempt.precision_score
+    ai_improvement_record.tone_improvement = last_attempt.tone_score - previous_attempt.tone_score
+    ai_improvement_record.improvement_feedback = improvement_feedback
+    ai_improvement_record.updated = datetime.now()
+
+    db.commit()
+    db.refresh(ai_improvement_record)
+    logging.info(f"AI improvement saved for question_id: {question_id} and user_id: {user_id}")
+
+    return ai_improvement_record
+
 @app.post("/ai-improvement/create/{question_id}", status_code=status.HTTP_201_CREATED)
 async def create_ai_improvement(
     question_id: str,
@@ -1521,7 +1985,9 @@ async def create_ai_improvement(
             "previous_attempt": second_last_attempt.to_dict()
         }
 
-        improvement_feedback = analyse_improvements(improvement_data)
+        # Release the connection while the analysis runs
+        db.commit()
+        improvement_feedback = await run_in_threadpool(analyse_improvements, improvement_data)
 
         new_ai_improvement = AIImprovementsModel(
             question_id=question_id,
@@ -1589,8 +2055,6 @@ async def update_ai_improvement(
             "previous_attempt": second_last_attempt.to_dict()
         }
 
-        improvement_feedback = analyse_improvements(improvement_data)
-
         # Check if an AI improvement record already exists for the user and question
         ai_improvement_record = db.query(AIImprovementsModel).filter(
             AIImprovementsModel.question_id == question_id,
@@ -1608,6 +2072,10 @@ async def update_ai_improvement(
             )
             return ai_improvement_record
 
+        # Release the connection while the analysis runs
+        db.commit()
+        improvement_feedback = await run_in_threadpool(analyse_improvements, improvement_data)
+
         # Update the existing AI improvement record
         ai_improvement_record.accuracy_improvement = accuracy_improvement
         ai_improvement_record.precision_improvement = precision_improvement
@@ -1714,8 +2182,9 @@ async def retroactively_create_ai_improvements(
             "previous_attempt": second_last_attempt.to_dict()
         }
 
-        # Call the external AI analysis function to generate feedback
-        improvement_feedback = analyse_improvements(improvement_data)
+        # Call the external AI analysis function to generate feedback, releasing the connection first
+        db.commit()
+        improvement_feedback = await run_in_threadpool(analyse_improvements, improvement_data, lane=BACKFILL)
 
         # Create AI improvement record
         ai_improvement = AIImprovementsModel(
@@ -1774,8 +2243,9 @@ async def retroactively_update_ai_improvements(
             "previous_attempt": second_last_attempt.to_dict()
         }
 
-        # Call the external AI analysis function to generate feedback
-        improvement_feedback = analyse_improvements(improvement_data)
+        # Call the external AI analysis function to generate feedback, releasing the connection first
+        db.commit()
+        improvement_feedback = await run_in_threadpool(analyse_improvements, improvement_data, lane=BACKFILL)
 
         # Check if an AI improvement record already exists
         ai_improvement = db.query(AIImprovementsModel).filter(AIImprovementsModel.question_id == question_id).first()
@@ -1801,66 +2271,47 @@ async def retroactively_update_ai_improvements(
     else:
         raise HTTPException(status_code=400, detail="Not enough attempts to generate improvements.")
     
-@app.post("/ai-improvement/scan-create")
-async def scan_create_ai_improvements(
-    db: Session = Depends(create_session),
-    current_user: UserModel = Depends(get_current_user)
-):
-    logging.info("Starting scan to retroactively create AI improvements")
+def scan_create_improvements(job_id):
+    """Create the missing AI improvements of every user and question with at least two
+    attempts, on the BACKFILL lane; run as a background job."""
 
-    # Fetch all questions and users
-    all_users = db.query(UserModel).all()
-    all_questions = db.query(QuestionModel).all()
+    with open_session() as db:
+        existing = set(db.query(AIImprovementsModel.user_id, AIImprovementsModel.question_id).all())
+        questions = {question.question_id: question for question in db.query(QuestionModel)}
+        attempts_by_key = {}
+        for attempt in db.query(AttemptModel).order_by(AttemptModel.date.desc()):
+            attempts_by_key.setdefault((attempt.user_id, attempt.question_id), []).append(attempt)
 
     improvements_created = 0
+    for processed, ((user_id, question_id), attempts) in enumerate(attempts_by_key.items(), start=1):
+        # Only proceed if there are at least two attempts and no improvement yet
+        question = questions.get(question_id)
+        if len(attempts) < 2 or question is None or (user_id, question_id) in existing:
+            continue
 
-    for user in all_users:
-        for question in all_questions:
-            # Fetch all attempts by the user for the current question
-            attempts = db.query(AttemptModel).filter(
-                AttemptModel.user_id == user.uuid,
-                AttemptModel.question_id == question.question_id
-            ).order_by(AttemptModel.date.desc()).all()
-
-            # Only proceed if there are at least two attempts
-            if len(attempts) < 2:
-                logging.info(f"Skipping question {question.question_id} for user {user.uuid}, not enough attempts.")
-                continue
-
-            last_attempt = attempts[0]
-            second_last_attempt = attempts[1]
+        last_attempt = attempts[0]
+        second_last_attempt = attempts[1]
 
-            # Check if an AI improvement already exists
-            existing_improvement = db.query(AIImprovementsModel).filter(
-                AIImprovementsModel.question_id == question.question_id,
-                AIImprovementsModel.user_id == user.uuid
-            ).first()
+        # Calculate improvements based on accuracy, precision, and tone
+        accuracy_improvement = last_attempt.accuracy_score - second_last_attempt.accuracy_score
+        precision_improvement = last_attempt.precision_score - second_last_attempt.precision_score
+        tone_improvement = last_attempt.tone_score - second_last_attempt.tone_score
 
-            if existing_improvement:
-                logging.info(f"Skipping question {question.question_id} for user {user.uuid}, improvement already exists.")
-                continue
+        improvement_data = {
+            "question": question.question_details,
+            "ideal": question.ideal,
+            "ideal_system_name": question.ideal_system_name,
+            "ideal_system_url": question.ideal_system_url,
+            "last_attempt": last_attempt.to_dict(),
+            "previous_attempt": second_last_attempt.to_dict()
+        }
+        improvement_feedback = analyse_improvements(improvement_data, lane=BACKFILL)
 
-            # Calculate improvements based on accuracy, precision, and tone
-            accuracy_improvement = last_attempt.accuracy_score - second_last_attempt.accuracy_score
-            precision_improvement = last_attempt.precision_score - second_last_attempt.precision_score
-            tone_improvement = last_attempt.tone_score - second_last_attempt.tone_score
-
-            improvement_data = {
-                "question": question.question_details,
-                "ideal": question.ideal,
-                "ideal_system_name": question.ideal_system_name,
-                "ideal_system_url": question.ideal_system_url,
-                "last_attempt": last_attempt.to_dict(),
-                "previous_attempt": second_last_attempt.to_dict()
-            }
-
-            # Call the external AI analysis function to generate feedback
-            improvement_feedback = analyse_improvements(improvement_data)
-
-            # Create AI improvement record
-            ai_improvement = AIImprovementsModel(
-                question_id=question.question_id,
-                user_id=user.uuid,
+        # Create AI improvement record
+        with open_session() as db:
+            db.add(AIImprovementsModel(
+                question_id=question_id,
+                user_id=user_id,
                 last_attempt_id=last_attempt.attempt_id,
                 previous_attempt_id=second_last_attempt.attempt_id,
                 accuracy_improvement=accuracy_improvement,
@@ -1868,14 +2319,30 @@ async def scan_create_ai_improvements(
                 tone_improvement=tone_improvement,
                 updated=datetime.now(),
                 improvement_feedback=improvement_feedback
-            )
+            ))
+        improvements_created += 1
+        report_progress(job_id, processed)
+        logging.info(f"AI Improvement created for question_id: {question_id}, user_id: {user_id}")
+    report_progress(job_id, len(attempts_by_key))
 
-            db.add(ai_improvement)
-            db.commit()
-            improvements_created += 1
-            logging.info(f"AI Improvement created for question_id: {question.question_id}, user_id: {user.uuid}")
+    return {"message": f"{improvements_created} AI improvements created.", "created": improvements_created}
+
+@app.post("/ai-improvement/scan-create", status_code=status.HTTP_202_ACCEPTED)
+async def scan_create_ai_improvements(
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(create_session),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """
+    Starts a scan creating the missing AI improvements in the background. Poll
+    GET /jobs/{job_id} for its progress and result.
+    """
+    logging.info("Starting scan to retroactively create AI improvements")
+
+    job_id = create_job(db, "scan_create_ai_improvements", current_user.uuid)
+    background_tasks.add_task(run_job, job_id, scan_create_improvements)
 
-    return {"message": f"{improvements_created} AI improvements created."}
+    return {"message": "AI improvement scan started", "job_id": job_id}
 
 ## DYNAMIC PROMPT ROUTES ##
 @app.put("/prompt", status_code=status.HTTP_200_OK)
@@ -1884,6 +2351,12 @@ async def create_or_update_prompt(
     db: Session = Depends(create_session),
     current_user: UserModel = Depends(get_current_user)
 ):
+    # Reject prompts that would break the cacheable prefix/suffix layout
+    try:
+        validate_prompt(prompt.prompt_text)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid prompt: {e}")
+
     # Fetch the existing prompt
     existing_prompt = db.query(PromptModel).first()
     if existing_prompt:
@@ -1924,6 +2397,9 @@ async def create_or_update_prompt(
         message = "Prompt updated successfully"
         prompt_data = new_prompt.to_dict()
 
+    db.commit()
+    invalidate_prompt_cache()
+
     return {"message": message, "prompt": prompt_data}
 
 @app.delete("/prompt", status_code=status.HTTP_200_OK)
@@ -1942,6 +2418,7 @@ async def delete_prompt(
         # Delete the prompt
         db.delete(existing_prompt)
         db.commit()
+        invalidate_prompt_cache()
         return {"message": "Reverted to default prompt."}
     else:
         return {"message": "Already using default prompt."}
@@ -1987,6 +2464,7 @@ async def rollback_prompt(
 
     db.commit()
     db.refresh(current_prompt)
+    invalidate_prompt_cache()
 
     return {
         "message": "Prompt rolled back successfully",
@@ -2005,6 +2483,8 @@ async def get_prompt_version_count(
 
 @app.get("/prompt/current", status_code=status.HTTP_200_OK)
 async def get_current_prompt(
+    request: Request,
+    response: Response,
     db: Session = Depends(create_session),
     current_user: UserModel = Depends(get_current_user)
 ):
@@ -2012,6 +2492,11 @@ async def get_current_prompt(
     if not current_user:
         raise HTTPException(status_code=401, detail="Authentication required")
 
+    # The default prompt comes from the code, so a deploy that changes it changes the ETag
+    cached = not_modified(request, response, db, ["prompt"], get_default_prompt())
+    if cached:
+        return cached
+
     # Fetch the current prompt
     existing_prompt = db.query(PromptModel).first()
     if existing_prompt and existing_prompt.prompt_text.strip():
@@ -2069,10 +2554,19 @@ async def revert_faq_csv(
 ## SYSTEM NAMES AND URL ROUTES ##
 @app.get("/systems", response_model=List[System], status_code=status.HTTP_200_OK)
 async def get_systems(
+    request: Request,
+    response: Response,
     db: Session = Depends(create_session),
     current_user: UserModel = Depends(get_current_user)
 ):
-    systems = db.query(SystemModel).all()
+    cached = not_modified(request, response, db, ["systems"])
+    if cached:
+        return cached
+    key = ("systems", response.headers["ETag"])
+    systems = catalogue_cache.get(key)
+    if systems is None:
+        systems = [system.to_dict() for system in db.query(SystemModel).all()]
+        catalogue_cache.set(key, systems)
     return systems
 
 @app.post("/systems", response_model=System, status_code=status.HTTP_201_CREATED)
@@ -2085,6 +2579,8 @@ async def add_system(
     db.add(new_system)
     db.commit()
     db.refresh(new_system)
+    invalidate_catalogue()
+    catalogue_cache.invalidate("systems")
     return new_system
 
 @app.put("/systems/{system_id}", response_model=System, status_code=status.HTTP_200_OK)
@@ -2101,6 +2597,8 @@ async def update_system(
     db_system.url = system.url
     db.commit()
     db.refresh(db_system)
+    invalidate_catalogue()
+    catalogue_cache.invalidate("systems")
     return db_system
 
 @app.delete("/systems/{system_id}", status_code=status.HTTP_200_OK)
@@ -2114,8 +2612,186 @@ async def delete_system(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="System not found")
     db.delete(db_system)
     db.commit()
+    invalidate_catalogue()
+    catalogue_cache.invalidate("systems")
     return {"message": "System deleted successfully"}
 
+## LIST ROUTES ##
+# Lean versions of GET /user, /questions/all, /systems and /scheme for the admin dashboard.
+# ?fields= picks the columns returned (only those are selected), filters and ?sort= (prefix
+# "-" for descending) run in SQL, and ?cursor= takes the next_cursor of the previous page.
+list_router = APIRouter(
+    prefix="/list",
+    tags=["List Routes"]
+)
+
+@list_router.get("/users", status_code=status.HTTP_200_OK)
+async def list_users(
+    fields: str = None,
+    dept: str = None,
+    access_rights: str = None,
+    scheme_name: str = None,
+    q: str = None,
+    sort: str = "name",
+    cursor: str = None,
+    limit: int = 50,
+    db: AsyncSession = Depends(get_async_read_session),
+    current_user: UserModel = Depends(get_current_user_async)
+):
+    columns = {
+        "uuid": UserModel.uuid,
+        "email": UserModel.email,
+        "name": UserModel.name,
+        "access_rights": UserModel.access_rights,
+        "dept": UserModel.dept,
+    }
+    fields = parse_fields(fields, [*columns, "schemes"], list(columns))
+    sort_field, descending = parse_sort(sort, ["name", "email", "dept", "access_rights"], "name")
+    column_fields = [field for field in fields if field in columns]
+
+    statement = select(
+        *[columns[field].label(field) for field in column_fields],
+        columns[sort_field].label("sort_value"),
+        UserModel.uuid.label("key_value")
+    )
+    if dept is not None:
+        statement = statement.where(UserModel.dept == dept)
+    if access_rights is not None:
+        statement = statement.where(UserModel.access_rights == access_rights)
+    if scheme_name is not None:
+        statement = statement.where(UserModel.uuid.in_(
+            select(user_scheme_association.c.user_table_id).where(user_scheme_association.c.scheme_table_name == scheme_name)
+        ))
+    if q:
+        statement = statement.where(search([UserModel.name, UserModel.email], q))
+
+    rows = (await db.execute(paginate(statement, columns[sort_field], UserModel.uuid, descending, cursor, limit))).all()
+    page = page_items(rows, column_fields, limit)
+
+    if "schemes" in fields:
+        # One query for the schemes of every user on the page
+        schemes = {row.key_value: [] for row in rows}
+        memberships = await db.execute(
+            select(user_scheme_association.c.user_table_id, user_scheme_association.c.scheme_table_name)
+            .where(user_scheme_association.c.user_table_id.in_(list(schemes)))
+            .order_by(user_scheme_association.c.scheme_table_name)
+        )
+        for user_id, user_scheme_name in memberships:
+            schemes[user_id].append(user_scheme_name)
+        for item, row in zip(page["items"], rows):
+            item["schemes"] = schemes[row.key_value]
+
+    return page
+
+@list_router.get("/questions", status_code=status.HTTP_200_OK)
+async def list_questions(
+    fields: str = None,
+    scheme_name: str = None,
+    question_difficulty: str = None,
+    q: str = None,
+    sort: str = "created",
+    cursor: str = None,
+    limit: int = 50,
+    db: AsyncSession = Depends(get_async_read_session),
+    current_user: UserModel = Depends(get_current_user_async)
+):
+    columns = {
+        "question_id": QuestionModel.question_id,
+        "title": QuestionModel.title,
+        "question_difficulty": QuestionModel.question_difficulty,
+        "scheme_name": QuestionModel.scheme_name,
+        "created": QuestionModel.created,
+        "question_details": QuestionModel.question_details,
+        "ideal": QuestionModel.ideal,
+        "ideal_system_name": QuestionModel.ideal_system_name,
+        "ideal_system_url": QuestionModel.ideal_system_url,
+    }
+    # The long question_details and ideal texts only when asked for
+    fields = parse_fields(fields, list(columns), ["question_id", "title", "question_difficulty", "scheme_name", "created"])
+    sort_field, descending = parse_sort(sort, ["created", "title", "question_difficulty", "scheme_name"], "created")
+
+    statement = select(
+        *[columns[field].label(field) for field in fields],
+        columns[sort_field].label("sort_value"),
+        QuestionModel.question_id.label("key_value")
+    )
+    if scheme_name is not None:
+        statement = statement.where(QuestionModel.scheme_name == scheme_name)
+    if question_difficulty is not None:
+        statement = statement.where(QuestionModel.question_difficulty == question_difficulty)
+    if q:
+        statement = statement.where(search([QuestionModel.title], q))
+
+    rows = (await db.execute(paginate(statement, columns[sort_field], QuestionModel.question_id, descending, cursor, limit))).all()
+    return page_items(rows, fields, limit)
+
+@list_router.get("/systems", status_code=status.HTTP_200_OK)
+async def list_systems(
+    fields: str = None,
+    q: str = None,
+    sort: str = "id",
+    cursor: str = None,
+    limit: int = 50,
+    db: AsyncSession = Depends(get_async_read_session),
+    current_user: UserModel = Depends(get_current_user_async)
+):
+    columns = {
+        "id": SystemModel.id,
+        "name": SystemModel.name,
+        "url": SystemModel.url,
+    }
+    fields = parse_fields(fields, list(columns), list(columns))
+    sort_field, descending = parse_sort(sort, ["id", "name"], "id")
+
+    statement = select(
+        *[columns[field].label(field) for field in fields],
+        columns[sort_field].label("sort_value"),
+        SystemModel.id.label("key_value")
+    )
+    if q:
+        statement = statement.where(search([SystemModel.name, SystemModel.url], q))
+
+    rows = (await db.execute(paginate(statement, columns[sort_field], SystemModel.id, descending, cursor, limit))).all()
+    return page_items(rows, fields, limit)
+
+@list_router.get("/schemes", status_code=status.HTTP_200_OK)
+async def list_schemes(
+    fields: str = None,
+    q: str = None,
+    sort: str = "scheme_name",
+    cursor: str = None,
+    limit: int = 50,
+    db: AsyncSession = Depends(get_async_read_session),
+    current_user: UserModel = Depends(get_current_user_async)
+):
+    columns = {
+        "scheme_name": SchemeModel.scheme_name,
+        "scheme_csa_img_path": SchemeModel.scheme_csa_img_path,
+        "scheme_admin_img_path": SchemeModel.scheme_admin_img_path,
+        # Counted in the same query instead of loading every question
+        "number_of_questions": (
+            select(func.count(QuestionModel.question_id))
+            .where(QuestionModel.scheme_name == SchemeModel.scheme_name)
+            .scalar_subquery()
+        ),
+    }
+    fields = parse_fields(fields, list(columns), list(columns))
+    sort_field, descending = parse_sort(sort, ["scheme_name"], "scheme_name")
+
+    statement = select(
+        *[columns[field].label(field) for field in fields],
+        columns[sort_field].label("sort_value"),
+        SchemeModel.scheme_name.label("key_value")
+    )
+    if q:
+        statement = statement.where(search([SchemeModel.scheme_name], q))
+
+    rows = (await db.execute(paginate(statement, columns[sort_field], SchemeModel.scheme_name, descending, cursor, limit))).all()
+    return page_items(rows, fields, limit)
+
+# Include the list_router
+app.include_router(list_router)
+
 ## S3 BUCKET ROUTES ##
 def get_s3_image_urls(bucket_name, prefix):
     try:
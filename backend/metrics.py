@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# In-process metrics registry, rendered in the Prometheus text exposition format on /metrics.
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_gauge_values = {}
+_histograms = {}
+_buckets = {}
+_help = {}
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class RequestStats:
+    """Per-request counters, shared by everything that runs on behalf of one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.statements = Counter()  # Executions per SQL statement (its shape, without parameters)
+        self.connections = 0  # Pooled connections currently checked out
+
+
+# Set by the request timing middleware; None outside of a request
+request_stats: ContextVar = ContextVar("request_stats", default=None)
+
+
+def holds_connection():
+    """Whether the current request has a pooled DB connection checked out."""
+
+    stats = request_stats.get()
+    return stats is not None and stats.connections > 0
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def describe(name, text):
+    _help[name] = text
+
+
+def inc(name, value=1, **labels):
+    """Increment a counter.
+
+    Args:
+        name: Metric name.
+        value: Amount to add.
+        labels: Metric labels.
+    """
+
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def get(name, **labels):
+    """Return the current value of a counter (0 if it was never incremented)."""
+
+    with _lock:
+        return _counters.get(_key(name, labels), 0)
+
+
+def add(name, value, **labels):
+    """Add to a gauge (use a negative value to subtract)."""
+
+    key = _key(name, labels)
+    with _lock:
+        _gauge_values[key] = _gauge_values.get(key, 0) + value
+
+
+def describe_histogram(name, text, buckets=DEFAULT_BUCKETS):
+    _help[name] = text
+    _buckets[name] = tuple(buckets)
+
+
+def observe(name, value, **labels):
+    """Record a value in a histogram."""
+
+    buckets = _buckets.get(name, DEFAULT_BUCKETS)
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the duration of the block, in seconds, in a histogram."""
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def span(stage):
+    """Time a stage of request handling (DB, retrieval, embedding, LLM, bcrypt, ...)."""
+
+    return timer("stage_duration_seconds", stage=stage)
+
+
+def register_gauge(name, fn, text=None):
+    """Register a gauge whose value is computed by ``fn`` when metrics are rendered.
+
+    ``fn`` returns a list of ``(labels, value)`` pairs.
+    """
+
+    _gauges[name] = fn
+    if text:
+        _help[name] = text
+
+
+def render():
+    """Render all metrics in the Prometheus text format."""
+
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        gauge_values = sorted(_gauge_values.items())
+        histograms = sorted(
+            (key, {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]})
+            for key, h in _histograms.items()
+        )
+
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    seen = set()
+    for (name, labels), value in gauge_values:
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for name, fn in sorted(_gauges.items()):
+        if name in _help:
+            lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in fn():
+            lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {value}")
+
+    seen = set()
+    for (name, labels), histogram in histograms:
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+        for bound, count in zip(_buckets.get(name, DEFAULT_BUCKETS), histogram["buckets"]):
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+        lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+    return "\n".join(lines) + "\n"
+
+
+# Shared by all spans
+describe_histogram("stage_duration_seconds", "Duration of request handling stages, by stage.")
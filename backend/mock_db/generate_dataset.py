@@ -0,0 +1,243 @@
+"""Generate a synthetic dataset directly in the database.
+
+Unlike mock_db.py, which creates a handful of records one HTTP call at a time, this writes
+users, schemes, questions, scheme memberships, attempts, manual feedback and AI improvement
+rows with chunked SQLAlchemy bulk inserts, then builds the user_scheme_stats aggregates, so
+production-scale data can be reproduced locally in seconds. Question texts are taken from
+questions.csv.
+
+Run from the backend directory:
+    python -m mock_db.generate_dataset --dsn sqlite:///mock.db --users 10000 --questions 500 --attempts-per-user 5
+    python -m mock_db.generate_dataset --dsn mysql+pymysql://root:pw@localhost:3306/testing --reset
+
+Every user's password is --password (one bcrypt hash is shared by all users).
+"""
+import argparse
+import datetime
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+import pandas as pd
+from passlib.context import CryptContext
+from sqlalchemy import create_engine
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+DEPARTMENTS = ["CCU", "CSD", "RDD", "HSD", "EMD"]
+SCHEMES = ["Retirement", "Housing", "Healthcare", "Workfare", "Education", "Insurance", "Savings", "Employment"]
+SYSTEMS = [
+    ("CPF Website FAQ", "https://www.cpf.gov.sg/member/faq"),
+    ("Member Portal", "https://www.cpf.gov.sg/member"),
+    ("CRM Case Management", "https://crm.example.com"),
+    ("Retirement Account Calculator", "https://www.cpf.gov.sg/member/tools-and-services/calculators"),
+]
+
+
+def load_question_texts():
+    # (enquiry, reply) pairs from the sample questions
+    data = pd.read_csv(os.path.join(DIRECTORY, "questions.csv"), encoding="latin1").dropna()
+    return list(zip(data["Enquiry"], data["Reply"])) or [("How do I check my balance?", "Log in to the member portal.")]
+
+def insert_chunks(conn, table, rows, chunk_size):
+    for start in range(0, len(rows), chunk_size):
+        conn.execute(table.insert(), rows[start:start + chunk_size])
+
+def generate_dataset(dsn, users=1000, schemes=5, questions=100, attempts_per_user=5, schemes_per_user=2,
+                     admin_email="admin@example.com", password="password", reset=False, seed=0, chunk_size=5000):
+    """Create the schema and insert a synthetic dataset.
+
+    Args:
+        dsn: Target database.
+        users: Number of users; every 50th is a trainer, the rest are trainees. An admin
+            with ``admin_email`` is added on top.
+        schemes: Number of schemes.
+        questions: Number of questions, spread evenly over the schemes.
+        attempts_per_user: Attempts per trainee, on questions of the trainee's schemes.
+        schemes_per_user: Schemes each trainee is a member of.
+        reset: Drop all tables first.
+
+    Returns:
+        A dict with the generated ``trainees`` (uuid, email and schemes), ``scheme_names``,
+        ``question_ids_by_scheme`` and the row ``counts`` per table.
+    """
+    # The app's config reads the DSN at import time
+    os.environ["MYAPI_DATABASE__DSN"] = dsn
+    from config import Base
+    from models.user import UserModel
+    from models.scheme import SchemeModel
+    from models.question import QuestionModel
+    from models.attempt import AttemptModel
+    from models.manual_feedback import ManualFeedbackModel
+    from models.ai_improvements import AIImprovementsModel
+    from models.association_tables import user_scheme_association
+    from models.user_scheme_stats import UserSchemeStatsModel
+    from scheme_stats import refresh_stats
+    from sqlalchemy.orm import Session
+    import models.prompt, models.prompt_history, models.system, models.attempt_timing
+
+    rng = random.Random(seed)
+    engine = create_engine(dsn)
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    # Hashing is deliberately slow, so every user shares one hash
+    hashed_password = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(password)
+
+    scheme_names = [SCHEMES[i] if i < len(SCHEMES) else f"Scheme {i}" for i in range(schemes)]
+    user_rows = [{
+        "uuid": str(uuid.uuid4()), "email": admin_email, "name": "Admin", "access_rights": "Admin",
+        "hashed_password": hashed_password, "dept": DEPARTMENTS[0],
+    }]
+    for i in range(users):
+        trainer = i % 50 == 0
+        user_rows.append({
+            "uuid": str(uuid.uuid4()),
+            "email": f"{'trainer' if trainer else 'trainee'}{i}@example.com",
+            "name": f"{'Trainer' if trainer else 'Trainee'} {i}",
+            "access_rights": "Trainer" if trainer else "Trainee",
+            "hashed_password": hashed_password,
+            "dept": rng.choice(DEPARTMENTS),
+        })
+
+    texts = load_question_texts()
+    question_rows = []
+    question_ids_by_scheme = defaultdict(list)
+    created = datetime.datetime(2024, 1, 1)
+    for i in range(questions):
+        scheme_name = scheme_names[i % len(scheme_names)]
+        enquiry, reply = texts[i % len(texts)]
+        system_name, system_url = rng.choice(SYSTEMS)
+        question_id = str(uuid.uuid4())
+        question_rows.append({
+            "question_id": question_id,
+            "title": f"{scheme_name} enquiry {i}",
+            "question_difficulty": rng.choice(["Easy", "Medium", "Hard"]),
+            "question_details": enquiry[:3000],
+            "ideal": reply[:3000],
+            "scheme_name": scheme_name,
+            "ideal_system_name": system_name,
+            "ideal_system_url": system_url,
+            "created": created + datetime.timedelta(minutes=i),
+        })
+        question_ids_by_scheme[scheme_name].append(question_id)
+
+    trainees = []
+    association_rows = []
+    attempt_rows = []
+    feedback_rows = []
+    improvement_rows = []
+    start_date = datetime.datetime(2024, 6, 1)
+    for user in user_rows:
+        if user["access_rights"] != "Trainee":
+            continue
+        user_schemes = rng.sample(scheme_names, k=min(schemes_per_user, len(scheme_names)))
+        trainees.append({"uuid": user["uuid"], "email": user["email"], "schemes": user_schemes})
+        association_rows.extend({"user_table_id": user["uuid"], "scheme_table_name": name} for name in user_schemes)
+
+        candidates = [question_id for name in user_schemes for question_id in question_ids_by_scheme[name]]
+        if not candidates:
+            continue
+        attempts_by_question = defaultdict(list)
+        for _ in range(attempts_per_user):
+            question_id = rng.choice(candidates)
+            system_name, system_url = rng.choice(SYSTEMS)
+            attempt = {
+                "attempt_id": str(uuid.uuid4()),
+                "user_id": user["uuid"],
+                "question_id": question_id,
+                "answer": "Please log in to the member portal to view your account summary.",
+                "date": (start_date + datetime.timedelta(minutes=rng.randrange(500000))).strftime('%Y-%m-%d %H:%M'),
+                "system_name": system_name,
+                "system_url": system_url,
+                "precision_score": rng.randint(1, 5),
+                "accuracy_score": rng.randint(1, 5),
+                "tone_score": rng.randint(1, 5),
+                "accuracy_feedback": "The response is mostly accurate.",
+                "precision_feedback": "The response addresses the main points of the query.",
+                "tone_feedback": "The tone is polite and professional.",
+                "feedback": "The source(s) referenced by the trainee are complete.",
+            }
+            attempt_rows.append(attempt)
+            attempts_by_question[question_id].append(attempt)
+            feedback_rows.append({
+                "manual_feedback_id": str(uuid.uuid4()),
+                "user_id": user["uuid"],
+                "question_id": question_id,
+                "attempt_id": attempt["attempt_id"],
+                "feedback": "Insert feedback",
+            })
+
+        # One AI improvement per question attempted more than once, on the latest two attempts
+        for question_id, attempts in attempts_by_question.items():
+            if len(attempts) < 2:
+                continue
+            previous, last = sorted(attempts, key=lambda attempt: attempt["date"])[-2:]
+            improvement_rows.append({
+                "ai_improvements_id": str(uuid.uuid4()),
+                "user_id": user["uuid"],
+                "question_id": question_id,
+                "last_attempt_id": last["attempt_id"],
+                "previous_attempt_id": previous["attempt_id"],
+                "updated": last["date"],
+                "accuracy_improvement": "The latest attempt is more accurate.",
+                "precision_improvement": "The latest attempt addresses more of the query.",
+                "tone_improvement": "The tone is consistently professional.",
+                "improvement_feedback": "Keep citing the relevant systems.",
+            })
+
+    tables = [
+        (UserModel.__table__, user_rows),
+        (SchemeModel.__table__, [{"scheme_name": name} for name in scheme_names]),
+        (QuestionModel.__table__, question_rows),
+        (user_scheme_association, association_rows),
+        (AttemptModel.__table__, attempt_rows),
+        (ManualFeedbackModel.__table__, feedback_rows),
+        (AIImprovementsModel.__table__, improvement_rows),
+    ]
+    with engine.begin() as conn:
+        for table, rows in tables:
+            insert_chunks(conn, table, rows, chunk_size)
+    with Session(engine) as db:
+        stats_rows = refresh_stats(db)
+        db.commit()
+    engine.dispose()
+
+    return {
+        "trainees": trainees,
+        "scheme_names": scheme_names,
+        "question_ids_by_scheme": dict(question_ids_by_scheme),
+        "counts": {**{table.name: len(rows) for table, rows in tables}, UserSchemeStatsModel.__tablename__: stats_rows},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=os.getenv("MYAPI_DATABASE__DSN"), help="Target database (default: MYAPI_DATABASE__DSN)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--schemes", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--attempts-per-user", type=int, default=5)
+    parser.add_argument("--schemes-per-user", type=int, default=2)
+    parser.add_argument("--admin-email", default="admin@example.com")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--reset", action="store_true", help="Drop all tables first")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if not args.dsn:
+        parser.error("--dsn or MYAPI_DATABASE__DSN is required")
+
+    start = time.perf_counter()
+    dataset = generate_dataset(
+        args.dsn, users=args.users, schemes=args.schemes, questions=args.questions,
+        attempts_per_user=args.attempts_per_user, schemes_per_user=args.schemes_per_user,
+        admin_email=args.admin_email, password=args.password, reset=args.reset, seed=args.seed
+    )
+    for table, count in dataset["counts"].items():
+        print(f"{table}: {count}")
+    print(f"Generated in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
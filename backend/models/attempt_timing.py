@@ -0,0 +1,26 @@
+from sqlalchemy import Integer, Column, ForeignKey, String
+from sqlalchemy.orm import Mapped
+from config import Base
+
+class AttemptTimingModel(Base):
+    __tablename__ = "attempt_timing"
+    attempt_id: Mapped[str] = Column(String(255), ForeignKey("attempt.attempt_id"), primary_key=True)
+
+    # Duration of each grading stage in milliseconds
+    citation_ms: Mapped[int] = Column(Integer, nullable=True)
+    prompt_ms: Mapped[int] = Column(Integer, nullable=True)
+    retrieval_ms: Mapped[int] = Column(Integer, nullable=True)
+    llm_ms: Mapped[int] = Column(Integer, nullable=True)
+    total_ms: Mapped[int] = Column(Integer, nullable=True)
+    llm_calls: Mapped[int] = Column(Integer, nullable=True)
+
+    def to_dict(self):
+        return {
+            "attempt_id": self.attempt_id,
+            "citation_ms": self.citation_ms,
+            "prompt_ms": self.prompt_ms,
+            "retrieval_ms": self.retrieval_ms,
+            "llm_ms": self.llm_ms,
+            "total_ms": self.total_ms,
+            "llm_calls": self.llm_calls,
+        }
@@ -0,0 +1,35 @@
+from sqlalchemy import Integer, Column, String, Text, DateTime
+from sqlalchemy.orm import Mapped
+from config import Base
+from datetime import datetime
+import uuid
+
+def generate_uuid():
+    return str(uuid.uuid4())
+
+class JobModel(Base):
+    """A bulk job run in the background (see jobs.py), polled through GET /jobs/{job_id}."""
+    __tablename__ = "job"
+    job_id: Mapped[str] = Column(String(255), primary_key=True, default=generate_uuid)
+    kind: Mapped[str] = Column(String(255), nullable=False)
+    # queued, running, completed or failed
+    status: Mapped[str] = Column(String(32), nullable=False, default="queued")
+    created_by: Mapped[str] = Column(String(255), nullable=True)
+    processed: Mapped[int] = Column(Integer, nullable=False, default=0)
+    result: Mapped[str] = Column(Text, nullable=True)  # JSON
+    error: Mapped[str] = Column(Text, nullable=True)
+    created: Mapped[datetime] = Column(DateTime, nullable=False, default=datetime.now)
+    finished: Mapped[datetime] = Column(DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_by": self.created_by,
+            "processed": self.processed,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
@@ -0,0 +1,18 @@
+from sqlalchemy import Integer, Column, String, DateTime
+from sqlalchemy.orm import Mapped
+from config import Base
+
+class TableVersionModel(Base):
+    """Change counter of a table, bumped by table_versions.py whenever a session writes to it."""
+    __tablename__ = "table_version"
+    table_name: Mapped[str] = Column(String(255), primary_key=True)
+    version: Mapped[int] = Column(Integer, nullable=False, default=0)
+    # When the row was created or last bumped, so a recreated database gets new ETags
+    updated: Mapped[DateTime] = Column(DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            "table_name": self.table_name,
+            "version": self.version,
+            "updated": self.updated,
+        }
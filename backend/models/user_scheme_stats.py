@@ -0,0 +1,34 @@
+from sqlalchemy import Integer, Column, String, DateTime, Double
+from sqlalchemy.orm import Mapped
+from config import Base
+
+class UserSchemeStatsModel(Base):
+    """Score aggregates of a user's attempts on one scheme, maintained by scheme_stats.py.
+
+    Derived data, so there are no foreign keys: rows are refreshed or removed along with
+    the attempts, users and schemes they summarise.
+    """
+    __tablename__ = "user_scheme_stats"
+    user_id: Mapped[str] = Column(String(255), primary_key=True)
+    scheme_name: Mapped[str] = Column(String(255), primary_key=True)
+
+    # Averages over the best attempt (highest total score) of each attempted question
+    precision_score_avg: Mapped[float] = Column(Double, nullable=False)
+    accuracy_score_avg: Mapped[float] = Column(Double, nullable=False)
+    tone_score_avg: Mapped[float] = Column(Double, nullable=False)
+
+    questions_attempted: Mapped[int] = Column(Integer, nullable=False)
+    attempts: Mapped[int] = Column(Integer, nullable=False)
+    updated: Mapped[DateTime] = Column(DateTime, nullable=False)
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "scheme_name": self.scheme_name,
+            "precision_score_avg": self.precision_score_avg,
+            "accuracy_score_avg": self.accuracy_score_avg,
+            "tone_score_avg": self.tone_score_avg,
+            "questions_attempted": self.questions_attempted,
+            "attempts": self.attempts,
+            "updated": self.updated,
+        }
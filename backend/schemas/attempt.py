@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 # Base model for input (create/update attempt)
 class AttemptBase(BaseModel):
@@ -13,6 +13,14 @@ class AttemptBase(BaseModel):
 class AttemptCreate(AttemptBase):
     pass
 
+# Model for grading many attempts in one request
+class AttemptBatchCreate(BaseModel):
+    attempts: List[AttemptCreate]
+
+# Model for re-grading through the batch endpoint; all attempts when attempt_ids is None
+class AttemptRegradeBatch(BaseModel):
+    attempt_ids: Optional[List[str]] = None
+
 # Model for responses, including additional fields returned from the database
 class AttemptResponse(AttemptBase):
     attempt_id: str  # Attempt ID returned from the database
@@ -23,4 +31,11 @@ class AttemptResponse(AttemptBase):
     accuracy_feedback: Optional[str] = None  # Optional fields for feedback
     precision_feedback: Optional[str] = None
     tone_feedback: Optional[str] = None
-    feedback: Optional[str] = None
\ No newline at end of file
+    feedback: Optional[str] = None
+
+# Model for a user's attempt history, with the question and the attempt's number on it
+class UserAttemptResponse(AttemptResponse):
+    question_title: str
+    scheme_name: str
+    question_details: str
+    attemptCount: int
@@ -0,0 +1,59 @@
+from pydantic import BaseModel, ConfigDict, Field
+
+# Scores and feedback returned by the grading LLM call
+class GradingResult(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    accuracy_score: int = Field(alias="Accuracy", ge=0, le=5)
+    precision_score: int = Field(alias="Comprehension", ge=0, le=5)
+    tone_score: int = Field(alias="Tone", ge=0, le=5)
+    accuracy_feedback: str = Field(alias="Accuracy Feedback")
+    precision_feedback: str = Field(alias="Comprehension Feedback")
+    tone_feedback: str = Field(alias="Tone Feedback")
+    feedback: str = Field(alias="Feedback")
+
+# Grading result that also carries the improvement analysis against the previous attempt
+class CombinedGradingResult(GradingResult):
+    improvement_feedback: str = Field(alias="Improvement Feedback")
+
+# JSON schema sent to the model so it can only answer with a GradingResult object
+GRADING_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "grading_result",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "Accuracy": {"type": "integer"},
+                "Comprehension": {"type": "integer"},
+                "Tone": {"type": "integer"},
+                "Accuracy Feedback": {"type": "string"},
+                "Comprehension Feedback": {"type": "string"},
+                "Tone Feedback": {"type": "string"},
+                "Feedback": {"type": "string"},
+            },
+            "required": [
+                "Accuracy", "Comprehension", "Tone",
+                "Accuracy Feedback", "Comprehension Feedback", "Tone Feedback", "Feedback"
+            ],
+            "additionalProperties": False,
+        },
+    },
+}
+
+COMBINED_GRADING_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "combined_grading_result",
+        "strict": True,
+        "schema": {
+            **GRADING_RESPONSE_FORMAT["json_schema"]["schema"],
+            "properties": {
+                **GRADING_RESPONSE_FORMAT["json_schema"]["schema"]["properties"],
+                "Improvement Feedback": {"type": "string"},
+            },
+            "required": GRADING_RESPONSE_FORMAT["json_schema"]["schema"]["required"] + ["Improvement Feedback"],
+        },
+    },
+}
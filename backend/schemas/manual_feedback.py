@@ -1,6 +1,20 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
 
 # Base model for input
 class ManualFeedbackBase(BaseModel):
-    feedback: str
\ No newline at end of file
+    feedback: str
+
+# Model for responses, read from ManualFeedbackModel objects
+class ManualFeedbackResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    manual_feedback_id: str
+    attempt_id: str
+    user_id: str
+    question_id: str
+    feedback: str
+
+class ManualFeedbackScanResponse(BaseModel):
+    message: str
+    created_feedback: List[ManualFeedbackResponse]
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
+from datetime import datetime
 
 class QuestionBase(BaseModel):
     title: str 
@@ -8,4 +10,23 @@ class QuestionBase(BaseModel):
     scheme_name: str
     ideal_system_name: str
     ideal_system_url: str
-    
\ No newline at end of file
+
+class QuestionSchemeResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    scheme_name: str
+    scheme_csa_img_path: Optional[str] = None
+    scheme_admin_img_path: Optional[str] = None
+    user_id: Optional[str] = None
+
+# Model for responses listing questions (QuestionModel.to_dict() puts the scheme in scheme_name)
+class QuestionResponse(BaseModel):
+    question_id: str
+    question_difficulty: str
+    question_details: str
+    ideal: str
+    title: str
+    scheme_name: QuestionSchemeResponse
+    ideal_system_name: Optional[str] = None
+    ideal_system_url: Optional[str] = None
+    created: Optional[datetime] = None
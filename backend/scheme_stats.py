@@ -0,0 +1,280 @@
+"""Maintain the user_scheme_stats table of per-user, per-scheme score aggregates.
+
+The dashboards read these rows instead of aggregating every attempt on each request, and
+the cohort analytics aggregate them per department and scheme. The rows of a (user,
+scheme) pair are recomputed from that user's attempts on the scheme in the same
+transaction that changes them.
+
+Refreshes of the same user are serialised by lock_stats(), which locks the users' rows.
+Without it, two transactions adding attempts for one user could both delete and re-insert
+the user's rows (a duplicate key error or deadlock on MySQL), or one could overwrite the
+other's rows with aggregates that miss its attempt. Transactions that write attempts call
+lock_stats() before anything else, so the locks come before the shared lock an attempt
+insert takes on its user row (upgrading that would deadlock), and on MySQL's repeatable
+read the refresh sees the attempts committed by the previous lock holder.
+
+Rebuild every row (e.g. after a deploy or a bulk import) from the backend directory:
+    python -m scheme_stats
+"""
+from datetime import datetime
+from sqlalchemy import and_, case, delete, distinct, func, insert, select, update
+from sqlalchemy.orm import Session
+from models.attempt import AttemptModel
+from models.question import QuestionModel
+from models.user import UserModel
+from models.association_tables import user_scheme_association
+from models.user_scheme_stats import UserSchemeStatsModel
+
+SCORE_SUM = AttemptModel.precision_score + AttemptModel.accuracy_score + AttemptModel.tone_score
+
+
+def compute_stats(db: Session, user_ids=None, scheme_names=None):
+    """Aggregate the attempts of the given users on the given schemes (all if None).
+
+    Returns:
+        A list of user_scheme_stats rows as dicts, one per (user, scheme) with attempts.
+    """
+
+    filters = []
+    if user_ids is not None:
+        filters.append(AttemptModel.user_id.in_(user_ids))
+    if scheme_names is not None:
+        filters.append(QuestionModel.scheme_name.in_(scheme_names))
+
+    # Highest total score of each user on each question
+    best_scores = (
+        select(
+            AttemptModel.user_id,
+            QuestionModel.scheme_name,
+            AttemptModel.question_id,
+            func.max(SCORE_SUM).label("max_sum_scores")
+        )
+        .join(QuestionModel, QuestionModel.question_id == AttemptModel.question_id)
+        .where(*filters)
+        .group_by(AttemptModel.user_id, QuestionModel.scheme_name, AttemptModel.question_id)
+        .subquery()
+    )
+    # Averaged over the attempts with that score (ties all count, as they always have)
+    averages = db.execute(
+        select(
+            best_scores.c.user_id,
+            best_scores.c.scheme_name,
+            func.avg(AttemptModel.precision_score),
+            func.avg(AttemptModel.accuracy_score),
+            func.avg(AttemptModel.tone_score)
+        )
+        .join(AttemptModel, and_(
+            AttemptModel.user_id == best_scores.c.user_id,
+            AttemptModel.question_id == best_scores.c.question_id,
+            SCORE_SUM == best_scores.c.max_sum_scores
+        ))
+        .group_by(best_scores.c.user_id, best_scores.c.scheme_name)
+    ).all()
+    counts = {
+        (user_id, scheme_name): (attempts, questions_attempted)
+        for user_id, scheme_name, attempts, questions_attempted in db.execute(
+            select(
+                AttemptModel.user_id,
+                QuestionModel.scheme_name,
+                func.count(AttemptModel.attempt_id),
+                func.count(distinct(AttemptModel.question_id))
+            )
+            .join(QuestionModel, QuestionModel.question_id == AttemptModel.question_id)
+            .where(*filters)
+            .group_by(AttemptModel.user_id, QuestionModel.scheme_name)
+        )
+    }
+
+    now = datetime.now()
+    return [
+        {
+            "user_id": user_id,
+            "scheme_name": scheme_name,
+            "precision_score_avg": float(precision_score_avg),
+            "accuracy_score_avg": float(accuracy_score_avg),
+            "tone_score_avg": float(tone_score_avg),
+            "attempts": counts[(user_id, scheme_name)][0],
+            "questions_attempted": counts[(user_id, scheme_name)][1],
+            "updated": now,
+        }
+        for user_id, scheme_name, precision_score_avg, accuracy_score_avg, tone_score_avg in averages
+    ]
+
+def lock_stats(db: Session, user_ids=None):
+    """Lock the given users' rows (all if None) until the transaction ends.
+
+    Call it at the start of a transaction that writes attempts of these users and refreshes
+    their stats, before its first read or write. The rows are locked in uuid order, so two
+    transactions locking overlapping users cannot deadlock on them. Locking a row the
+    transaction already holds is a no-op. SQLite ignores FOR UPDATE and serialises writing
+    transactions by itself.
+    """
+
+    statement = select(UserModel.uuid).order_by(UserModel.uuid).with_for_update()
+    if user_ids is not None:
+        statement = statement.where(UserModel.uuid.in_(sorted(set(user_ids))))
+    db.execute(statement).all()
+
+def refresh_stats(db: Session, user_ids=None, scheme_names=None):
+    """Recompute the rows of the given users on the given schemes (all if None).
+
+    Runs in the caller's transaction; call lock_stats() for the same users at its start,
+    flush pending attempt changes before the refresh and commit after. The users are
+    locked here too, so refreshes are serialised even when a caller has not.
+
+    Returns:
+        The number of rows written.
+    """
+
+    lock_stats(db, user_ids)
+    rows = compute_stats(db, user_ids, scheme_names)
+
+    statement = delete(UserSchemeStatsModel)
+    if user_ids is not None:
+        statement = statement.where(UserSchemeStatsModel.user_id.in_(user_ids))
+    if scheme_names is not None:
+        statement = statement.where(UserSchemeStatsModel.scheme_name.in_(scheme_names))
+    db.execute(statement)
+    if rows:
+        db.execute(insert(UserSchemeStatsModel), rows)
+
+    return len(rows)
+
+def delete_stats(db: Session, user_id=None, scheme_name=None):
+    statement = delete(UserSchemeStatsModel)
+    if user_id is not None:
+        statement = statement.where(UserSchemeStatsModel.user_id == user_id)
+    if scheme_name is not None:
+        statement = statement.where(UserSchemeStatsModel.scheme_name == scheme_name)
+    db.execute(statement)
+
+def rename_scheme_stats(db: Session, old_scheme_name, new_scheme_name):
+    db.execute(
+        update(UserSchemeStatsModel)
+        .where(UserSchemeStatsModel.scheme_name == old_scheme_name)
+        .values(scheme_name=new_scheme_name)
+    )
+
+
+COHORT_PERCENTILES = (25, 50, 75, 90)
+
+
+def cohort_stats_query(dept=None, scheme_name=None):
+    """Score distribution and completion of each (department, scheme) cohort.
+
+    A cohort is the members of a scheme (user_scheme_association) in one department. Scores
+    are each member's best-attempt averages from user_scheme_stats; a member's overall score
+    is the mean of their precision, accuracy and tone averages. Percentiles use the nearest
+    rank over the members who attempted the scheme.
+
+    Returns:
+        A select() of one row per cohort, ordered by department and scheme.
+    """
+
+    overall = (
+        UserSchemeStatsModel.precision_score_avg + UserSchemeStatsModel.accuracy_score_avg + UserSchemeStatsModel.tone_score_avg
+    ) / 3.0
+    cohort = (UserModel.dept, user_scheme_association.c.scheme_table_name)
+    filters = []
+    if dept is not None:
+        filters.append(UserModel.dept == dept)
+    if scheme_name is not None:
+        filters.append(user_scheme_association.c.scheme_table_name == scheme_name)
+
+    members = (
+        select(
+            UserModel.dept,
+            user_scheme_association.c.scheme_table_name.label("scheme_name"),
+            UserSchemeStatsModel.user_id.label("attempted_user_id"),
+            UserSchemeStatsModel.precision_score_avg,
+            UserSchemeStatsModel.accuracy_score_avg,
+            UserSchemeStatsModel.tone_score_avg,
+            UserSchemeStatsModel.questions_attempted,
+            overall.label("overall"),
+            # Members without attempts sort last, so ranks 1..n cover the n who attempted
+            func.row_number().over(
+                partition_by=cohort,
+                order_by=(case((UserSchemeStatsModel.user_id.is_(None), 1), else_=0), overall)
+            ).label("rank"),
+            func.count(UserSchemeStatsModel.user_id).over(partition_by=cohort).label("attempted"),
+        )
+        .join(UserModel, UserModel.uuid == user_scheme_association.c.user_table_id)
+        .outerjoin(UserSchemeStatsModel, and_(
+            UserSchemeStatsModel.user_id == user_scheme_association.c.user_table_id,
+            UserSchemeStatsModel.scheme_name == user_scheme_association.c.scheme_table_name
+        ))
+        .where(*filters)
+        .subquery()
+    )
+    questions = (
+        select(QuestionModel.scheme_name, func.count(QuestionModel.question_id).label("questions"))
+        .group_by(QuestionModel.scheme_name)
+        .subquery()
+    )
+
+    return (
+        select(
+            members.c.dept,
+            members.c.scheme_name,
+            func.count().label("members"),
+            func.count(members.c.attempted_user_id).label("users_attempted"),
+            func.coalesce(func.max(questions.c.questions), 0).label("questions"),
+            func.coalesce(func.sum(members.c.questions_attempted), 0).label("questions_attempted"),
+            func.avg(members.c.precision_score_avg).label("precision_score_avg"),
+            func.avg(members.c.accuracy_score_avg).label("accuracy_score_avg"),
+            func.avg(members.c.tone_score_avg).label("tone_score_avg"),
+            *[
+                func.min(case(
+                    (and_(members.c.attempted_user_id.is_not(None), members.c.rank >= members.c.attempted * (percentile / 100.0)), members.c.overall)
+                )).label(f"p{percentile}")
+                for percentile in COHORT_PERCENTILES
+            ],
+            *[
+                func.sum(case((func.round(members.c.overall) == score, 1), else_=0)).label(f"score_{score}")
+                for score in range(1, 6)
+            ],
+        )
+        .outerjoin(questions, questions.c.scheme_name == members.c.scheme_name)
+        .group_by(members.c.dept, members.c.scheme_name)
+        .order_by(members.c.dept, members.c.scheme_name)
+    )
+
+def cohort_row_to_dict(row):
+    possible = row.members * row.questions
+    return {
+        "dept": row.dept,
+        "scheme_name": row.scheme_name,
+        "members": row.members,
+        "users_attempted": row.users_attempted,
+        "questions": row.questions,
+        # Share of (member, question) pairs with at least one attempt
+        "completion_rate": round(row.questions_attempted / possible, 4) if possible else 0.0,
+        "precision_score_avg": float(row.precision_score_avg) if row.precision_score_avg is not None else None,
+        "accuracy_score_avg": float(row.accuracy_score_avg) if row.accuracy_score_avg is not None else None,
+        "tone_score_avg": float(row.tone_score_avg) if row.tone_score_avg is not None else None,
+        "score_percentiles": {
+            f"p{percentile}": float(row._mapping[f"p{percentile}"]) if row._mapping[f"p{percentile}"] is not None else None
+            for percentile in COHORT_PERCENTILES
+        },
+        # Members who attempted, by overall score rounded to the nearest point
+        "score_distribution": {str(score): int(row._mapping[f"score_{score}"] or 0) for score in range(1, 6)},
+    }
+
+
+def main():
+    from config import Base
+    from session import engine, SessionFactory
+    Base.metadata.create_all(bind=engine, tables=[UserSchemeStatsModel.__table__])
+
+    db = SessionFactory()
+    try:
+        lock_stats(db)
+        count = refresh_stats(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt {count} user_scheme_stats rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,206 @@
-from contextlib import contextmanager
-from typing import Iterator
-from sqlalchemy import create_engine
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker, create_async_engine)
 from sqlalchemy.orm import (Session, sessionmaker)
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from config import config
+from cache import redis, redis_client
+import metrics
 
-engine = create_engine(config.database.dsn)
+metrics.describe_histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.")
+metrics.describe("db_pool_timeouts_total", "Connection checkouts that timed out because the pool was exhausted.")
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that reports how long checkouts wait for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.inc("db_pool_timeouts_total")
+            raise
+        finally:
+            metrics.observe("db_pool_checkout_wait_seconds", time.perf_counter() - start)
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """TimedQueuePool for the asyncio engine."""
+
+
+def async_dsn(dsn):
+    # The same database through the asyncio driver of its dialect
+    drivers = {"mysql": "mysql+aiomysql", "mysql+pymysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite", "sqlite+pysqlite": "sqlite+aiosqlite"}
+    dialect, separator, rest = dsn.partition("://")
+    return drivers.get(dialect, dialect) + separator + rest
+
+
+def engine_options(database, poolclass=TimedQueuePool, dsn=None):
+    # In-memory SQLite uses a single shared connection, so there is no pool to tune
+    dsn = dsn or database.dsn
+    if dsn.startswith("sqlite") and (":memory:" in dsn or dsn.rstrip("/") == "sqlite:"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": database.pool_size,
+        "max_overflow": database.max_overflow,
+        "pool_timeout": database.pool_timeout,
+        "pool_recycle": database.pool_recycle,
+        "pool_pre_ping": database.pool_pre_ping,
+    }
+
+
+engine = create_engine(config.database.dsn, **engine_options(config.database))
+
+# Used by the handlers that depend on create_async_session, so their queries do not block
+# the event loop. An in-memory SQLite DSN gives this engine a database of its own.
+async_engine = create_async_engine(
+    config.database.async_dsn or async_dsn(config.database.dsn), **engine_options(config.database, TimedAsyncQueuePool)
+)
+
+# Read-only queries of the dashboard routes go to the replica when one is configured
+if config.database.read_dsn:
+    read_engine = create_engine(config.database.read_dsn, **engine_options(config.database, dsn=config.database.read_dsn))
+    async_read_engine = create_async_engine(
+        async_dsn(config.database.read_dsn), **engine_options(config.database, TimedAsyncQueuePool, config.database.read_dsn)
+    )
+else:
+    read_engine = engine
+    async_read_engine = async_engine
+
+if isinstance(engine.pool, QueuePool):
+    metrics.register_gauge(
+        "db_pool_connections",
+        lambda: [
+            ({"state": "checked_out"}, engine.pool.checkedout()),
+            ({"state": "idle"}, engine.pool.checkedin()),
+            ({"state": "overflow"}, max(engine.pool.overflow(), 0)),
+        ],
+        "Pooled database connections, by state."
+    )
+
+# Log the query count and most repeated statements of every request
+SQL_QUERY_DEBUG = os.getenv("SQL_QUERY_DEBUG", "false").lower() == "true"
+
+# A statement executed this many times in one request is reported as a likely N+1
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 10))
+
+metrics.describe("sql_repeated_statement_requests_total", "Requests that repeated one SQL statement at least SQL_N_PLUS_ONE_THRESHOLD times, by route.")
+
+# Stats of the active query_budget() blocks
+_budgets = []
+_budgets_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    metrics.observe("stage_duration_seconds", elapsed, stage="db")
+
+    # Attributed to the request being handled, if any, and to the active query budgets
+    stats = [metrics.request_stats.get()]
+    with _budgets_lock:
+        stats.extend(_budgets)
+    for stat in stats:
+        if stat is not None:
+            stat.queries += 1
+            stat.query_seconds += elapsed
+            stat.statements[statement] += 1
+
+
+@event.listens_for(engine, "checkout")
+def _track_checkout(dbapi_connection, connection_record, connection_proxy):
+    stats = metrics.request_stats.get()
+    if stats is not None:
+        stats.connections += 1
+        connection_record.info["request_stats"] = stats
+
+
+@event.listens_for(engine, "checkin")
+def _track_checkin(dbapi_connection, connection_record):
+    # Checked in against the request that checked it out, whichever thread returns it
+    stats = connection_record.info.pop("request_stats", None)
+    if stats is not None:
+        stats.connections -= 1
+
+
+@event.listens_for(engine, "handle_error")
+def _discard_query_timer(context):
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+# The other engines report to the same metrics, request stats and query budgets
+for _engine in {async_engine.sync_engine, read_engine, async_read_engine.sync_engine} - {engine}:
+    for _identifier, _listener in [
+        ("before_cursor_execute", _start_query_timer),
+        ("after_cursor_execute", _record_query),
+        ("checkout", _track_checkout),
+        ("checkin", _track_checkin),
+        ("handle_error", _discard_query_timer),
+    ]:
+        event.listen(_engine, _identifier, _listener)
+
+
+@contextmanager
+def query_budget(limit):
+    """Fail if more than ``limit`` SQL statements are executed inside the block.
+
+    Every statement executed by the process while the block is active counts, whichever
+    thread runs it, so it can wrap calls through a test client.
+
+    Raises:
+        QueryBudgetExceeded: The block executed more than ``limit`` statements.
+    """
+
+    stats = metrics.RequestStats()
+    with _budgets_lock:
+        _budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        with _budgets_lock:
+            _budgets.remove(stats)
+
+    if stats.queries > limit:
+        statement, count = stats.statements.most_common(1)[0]
+        raise QueryBudgetExceeded(
+            f"{stats.queries} queries executed, budget is {limit}. "
+            f"Most repeated ({count}x): {' '.join(statement.split())[:200]}"
+        )
+
+
+def repeated_statements(stats, threshold=SQL_N_PLUS_ONE_THRESHOLD):
+    return [(statement, count) for statement, count in stats.statements.most_common() if count >= threshold]
+
+
+def report_queries(stats, route):
+    """Flag likely N+1 query patterns of a finished request (and log all queries in debug mode)."""
+
+    repeated = repeated_statements(stats)
+    if repeated:
+        statement, count = repeated[0]
+        metrics.inc("sql_repeated_statement_requests_total", route=route)
+        logging.warning(f"Possible N+1 query in {route}: executed {count} times: {' '.join(statement.split())[:200]}")
+
+    if SQL_QUERY_DEBUG:
+        logging.info(f"{route}: {stats.queries} queries in {stats.query_seconds * 1000:.1f}ms")
+        for statement, count in stats.statements.most_common(5):
+            logging.info(f"  {count}x {' '.join(statement.split())[:200]}")
 
 # create session factory to generate new database sessions
 SessionFactory = sessionmaker(
@@ -34,6 +230,132 @@ def create_session() -> Iterator[Session]:
         session.close()
 
 
+# create session factory to generate new asyncio database sessions
+AsyncSessionFactory = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+async def create_async_session() -> AsyncIterator[AsyncSession]:
+    """Create new asyncio database session.
+
+    Relationships are not lazy loaded on an AsyncSession, so queries must load what they
+    use (select the columns, join, or use selectinload()).
+
+    Yields:
+        Asyncio database session.
+    """
+
+    session = AsyncSessionFactory()
+
+    try:
+        yield session
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+# create session factories for read-only queries (the primary if there is no replica)
+ReadSessionFactory = sessionmaker(
+    bind=read_engine,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+)
+AsyncReadSessionFactory = async_sessionmaker(
+    bind=async_read_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# Users who wrote within the last READ_YOUR_WRITES_SECONDS read from the primary, so they
+# see their own changes before the replica has caught up. With several workers or tasks a
+# user's write and their next read can be handled by different processes, so the markers
+# are kept in Redis (CACHE_REDIS_URL) when it is configured, and in process otherwise.
+_recent_writes = {}
+_recent_writes_lock = threading.Lock()
+
+if read_engine is not engine and redis_client is None:
+    logging.warning(
+        "Read-your-writes is tracked per process as CACHE_REDIS_URL is not set; with more than "
+        "one worker a user's reads may reach the replica before it has their writes"
+    )
+
+
+def _recent_write_key(user_id):
+    return f"recent_write:{user_id}"
+
+
+def record_write(user_id):
+    if redis_client is not None:
+        try:
+            redis_client.set(_recent_write_key(user_id), 1, px=int(config.database.read_your_writes_seconds * 1000))
+            return
+        except redis.RedisError as e:
+            # Other workers will not see this write; this one still does
+            logging.error(f"Recording a write in Redis failed: {e}")
+    with _recent_writes_lock:
+        _recent_writes[user_id] = time.monotonic()
+
+
+def reads_from_primary(user_id):
+    if read_engine is engine:
+        return True
+    if redis_client is not None:
+        try:
+            if redis_client.exists(_recent_write_key(user_id)):
+                return True
+        except redis.RedisError as e:
+            # Without the markers the replica may not have the user's writes yet
+            logging.warning(f"Checking for recent writes in Redis failed, reading from the primary: {e}")
+            return True
+    with _recent_writes_lock:
+        written = _recent_writes.get(user_id)
+        if written is not None and time.monotonic() - written >= config.database.read_your_writes_seconds:
+            del _recent_writes[user_id]
+            written = None
+    return written is not None
+
+
+@contextmanager
+def read_session(user_id) -> Iterator[Session]:
+    """Create new database session for read-only queries of a user.
+
+    Yields:
+        Database session on the read replica, or on the primary if there is no replica or
+        the user wrote recently.
+    """
+
+    session = (SessionFactory if reads_from_primary(user_id) else ReadSessionFactory)()
+
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@asynccontextmanager
+async def async_read_session(user_id) -> AsyncIterator[AsyncSession]:
+    """Create new asyncio database session for read-only queries of a user.
+
+    Yields:
+        Asyncio database session on the read replica, or on the primary if there is no
+        replica or the user wrote recently.
+    """
+
+    session = (AsyncSessionFactory if reads_from_primary(user_id) else AsyncReadSessionFactory)()
+
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
 @contextmanager
 def open_session() -> Iterator[Session]:
     """Create new database session with context manager.
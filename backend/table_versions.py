@@ -0,0 +1,109 @@
+"""Per-table version counters for the ETags of the read routes.
+
+Every session write to one of VERSIONED_TABLES bumps that table's table_version row in the
+same transaction. The written tables are collected in session.info, from ORM flushes
+(including relationship changes stored in association tables) by an after_flush listener
+and from insert/update/delete statements run through a session by a do_orm_execute
+listener, and are bumped once by a before_commit listener, in table name order. The row
+locks are then only held while the transaction commits, and two transactions always take
+them in the same order. A route's ETag is a hash of the versions of the tables it reads, so
+it changes with every committed write to them and stays the same otherwise. Writes that
+bypass sessions (e.g. mock_db/generate_dataset.py) are not counted.
+"""
+import hashlib
+from datetime import datetime
+from sqlalchemy import event, inspect, insert, select, update
+from sqlalchemy.orm import Session
+from models.table_version import TableVersionModel
+
+# Only tables behind ETags (or version checks, see get_active_prompt): each bump locks the
+# row until the transaction ends
+VERSIONED_TABLES = ("question", "scheme", "user_scheme_association", "systems", "prompt")
+
+WRITTEN_TABLES = "written_versioned_tables"
+
+
+def record_writes(session: Session, table_names):
+    written = set(table_names) & set(VERSIONED_TABLES)
+    if written:
+        session.info.setdefault(WRITTEN_TABLES, set()).update(written)
+
+def bump_versions(session: Session, table_names):
+    table_names = sorted(set(table_names) & set(VERSIONED_TABLES))
+    if table_names:
+        # On the connection rather than session.execute(), which would re-enter do_orm_execute
+        session.connection().execute(
+            update(TableVersionModel.__table__)
+            .where(TableVersionModel.table_name.in_(table_names))
+            .values(version=TableVersionModel.version + 1, updated=datetime.now())
+        )
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed_tables(session, flush_context):
+    table_names = set()
+    for instance in [*session.new, *session.dirty, *session.deleted]:
+        state = inspect(instance)
+        table_names.update(table.name for table in state.mapper.tables)
+        for relationship in state.mapper.relationships:
+            # Deleting an object also deletes its association rows
+            if relationship.secondary is not None and (state.deleted or state.attrs[relationship.key].history.has_changes()):
+                table_names.add(relationship.secondary.name)
+    record_writes(session, table_names)
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_statement_table(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        record_writes(orm_execute_state.session, [orm_execute_state.statement.table.name])
+
+@event.listens_for(Session, "before_commit")
+def _bump_written_tables(session):
+    # Savepoints are bumped with the transaction that contains them
+    if session.in_nested_transaction():
+        return
+    # Runs before commit() flushes, so the pending changes are recorded first
+    session.flush()
+    bump_versions(session, session.info.pop(WRITTEN_TABLES, ()))
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_written_tables(session, transaction):
+    # A rolled back transaction leaves nothing to bump
+    if transaction.parent is None:
+        session.info.pop(WRITTEN_TABLES, None)
+
+
+def ensure_versions(db: Session):
+    """Add the missing table_version rows; run at startup, the caller commits.
+
+    Workers starting together may add the same rows, so existing rows are ignored rather
+    than failing the insert.
+    """
+
+    existing = set(db.execute(select(TableVersionModel.table_name)).scalars())
+    missing = [name for name in VERSIONED_TABLES if name not in existing]
+    if missing:
+        now = datetime.now()
+        db.execute(
+            insert(TableVersionModel).prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite"),
+            [{"table_name": name, "version": 0, "updated": now} for name in missing]
+        )
+
+def table_etag(db: Session, table_names, *extra):
+    """Weak ETag of a response built from ``table_names`` (and any ``extra`` inputs)."""
+
+    versions = db.execute(
+        select(TableVersionModel.table_name, TableVersionModel.version, TableVersionModel.updated)
+        .where(TableVersionModel.table_name.in_(table_names))
+        .order_by(TableVersionModel.table_name)
+    ).all()
+    digest = hashlib.sha256(repr([tuple(row) for row in versions] + list(extra)).encode()).hexdigest()[:32]
+    # Weak, as the compression middleware changes the bytes of the body
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match, etag):
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags